@@ -65,8 +65,129 @@ def parse_openai_models() -> Dict:
 OPENAI_MODELS = parse_openai_models()
 DEFAULT_MODEL = min(OPENAI_MODELS.items(), key=lambda x: x[1]['priority'])[0]
 
+# Ollama configuration
+OLLAMA_BASE_URL = get_env_variable("OLLAMA_BASE_URL", required=False, default="http://localhost:11434")
+OLLAMA_HEALTH_TTL = int(get_env_variable("OLLAMA_HEALTH_TTL", required=False, default="30"))
+OLLAMA_KEEP_ALIVE = get_env_variable("OLLAMA_KEEP_ALIVE", required=False, default="30m")
+OLLAMA_PRELOAD_MODELS = [
+    model.strip() for model in get_env_variable("OLLAMA_PRELOAD_MODELS", required=False, default="").split(',')
+    if model.strip()
+]
+OLLAMA_NUM_CTX = int(get_env_variable("OLLAMA_NUM_CTX", required=False, default="0")) or None
+OLLAMA_NUM_THREAD = int(get_env_variable("OLLAMA_NUM_THREAD", required=False, default="0")) or None
+
 # Database configuration
 MYSQL_USER = get_env_variable("MYSQL_USER")
 MYSQL_PASSWORD = get_env_variable("MYSQL_PASSWORD")
 MYSQL_HOST = get_env_variable("MYSQL_HOST")
-MYSQL_DATABASE = get_env_variable("MYSQL_DATABASE")
\ No newline at end of file
+MYSQL_DATABASE = get_env_variable("MYSQL_DATABASE")
+
+# Pipeline configuration
+PIPELINE_MAX_WORKERS = int(get_env_variable("PIPELINE_MAX_WORKERS", required=False, default="4"))
+# Background LLM jobs (suggestion refreshes, memory summaries) get their own pool so they never delay request stages
+PIPELINE_BACKGROUND_WORKERS = int(get_env_variable("PIPELINE_BACKGROUND_WORKERS", required=False, default="2"))
+CHATBOT_ASYNC_MODE = get_env_variable("CHATBOT_ASYNC_MODE", required=False, default="false").lower() == "true"
+BATCH_CONCURRENCY = int(get_env_variable("BATCH_CONCURRENCY", required=False, default="4"))
+
+
+# Cache configuration
+CACHE_DIR = get_env_variable("CACHE_DIR", required=False, default=".cache")
+SCHEMA_CACHE_TTL = int(get_env_variable("SCHEMA_CACHE_TTL", required=False, default="300"))
+SUGGESTIONS_LANGUAGE = get_env_variable("SUGGESTIONS_LANGUAGE", required=False, default="Spanish")
+
+# Embeddings backend: 'openai', 'ollama', 'local' (sentence-transformers on CPU) or 'auto'
+EMBEDDINGS_PROVIDER = get_env_variable("EMBEDDINGS_PROVIDER", required=False, default="auto").lower()
+EMBEDDINGS_MODEL = get_env_variable("EMBEDDINGS_MODEL", required=False, default="")
+EMBEDDINGS_DIMENSIONS = int(get_env_variable("EMBEDDINGS_DIMENSIONS", required=False, default="0")) or None
+EMBEDDINGS_BATCH_SIZE = int(get_env_variable("EMBEDDINGS_BATCH_SIZE", required=False, default="64"))
+EMBEDDINGS_MAX_CONCURRENCY = int(get_env_variable("EMBEDDINGS_MAX_CONCURRENCY", required=False, default="4"))
+EMBEDDINGS_CACHE_ENABLED = get_env_variable("EMBEDDINGS_CACHE_ENABLED", required=False, default="true").lower() == "true"
+
+# RAG index: chunking parameters and directory of the persisted FAISS index
+RAG_CHUNK_SIZE = int(get_env_variable("RAG_CHUNK_SIZE", required=False, default="1000"))
+RAG_CHUNK_OVERLAP = int(get_env_variable("RAG_CHUNK_OVERLAP", required=False, default="200"))
+RAG_INDEX_DIR = get_env_variable("RAG_INDEX_DIR", required=False, default=os.path.join(CACHE_DIR, "rag_index"))
+# Retrieval: 'hybrid' (BM25 + vectors fused by reciprocal rank), 'vector' or 'lexical' (BM25 only)
+RAG_RETRIEVAL_MODE = get_env_variable("RAG_RETRIEVAL_MODE", required=False, default="hybrid").lower()
+RAG_TOP_K = int(get_env_variable("RAG_TOP_K", required=False, default="3"))
+RAG_RRF_K = int(get_env_variable("RAG_RRF_K", required=False, default="60"))
+# Process-wide LRU cache of retrieved chunks per (question, index version); 0 disables it
+RAG_RETRIEVAL_CACHE_SIZE = int(get_env_variable("RAG_RETRIEVAL_CACHE_SIZE", required=False, default="1024"))
+# Worker processes that load and chunk documents in parallel (0 = one per core, 1 = inline)
+RAG_LOAD_WORKERS = int(get_env_variable("RAG_LOAD_WORKERS", required=False, default="0")) or None
+# Background watcher of docs/: updates and hot-swaps the index once changes settle
+RAG_WATCH_ENABLED = get_env_variable("RAG_WATCH_ENABLED", required=False, default="true").lower() == "true"
+RAG_WATCH_INTERVAL = float(get_env_variable("RAG_WATCH_INTERVAL", required=False, default="2"))
+RAG_WATCH_DEBOUNCE = float(get_env_variable("RAG_WATCH_DEBOUNCE", required=False, default="5"))
+
+# Query result summarization
+RESULT_ROW_LIMIT = int(get_env_variable("RESULT_ROW_LIMIT", required=False, default="50"))
+RESULT_TOKEN_BUDGET = int(get_env_variable("RESULT_TOKEN_BUDGET", required=False, default="2000"))
+RESULT_TOP_K = int(get_env_variable("RESULT_TOP_K", required=False, default="5"))
+RESULT_MAX_FETCH_ROWS = int(get_env_variable("RESULT_MAX_FETCH_ROWS", required=False, default="100000"))
+
+# Conversation memory: 'summary' (bounded window + rolling summary) or 'buffer' (full history)
+MEMORY_MODE = get_env_variable("MEMORY_MODE", required=False, default="summary").lower()
+MEMORY_MAX_TOKENS = int(get_env_variable("MEMORY_MAX_TOKENS", required=False, default="1000"))
+MEMORY_SUMMARY_MAX_TOKENS = int(get_env_variable("MEMORY_SUMMARY_MAX_TOKENS", required=False, default="300"))
+
+# Intent fast path
+INTENT_FAST_PATH_ENABLED = get_env_variable("INTENT_FAST_PATH_ENABLED", required=False, default="true").lower() == "true"
+
+# Answer output mode: 'structured' (JSON answer + chart series) or 'text' (DATA: line)
+ANSWER_OUTPUT_MODE = get_env_variable("ANSWER_OUTPUT_MODE", required=False, default="structured").lower()
+
+# SQL validation
+SQL_VALIDATION_ENABLED = get_env_variable("SQL_VALIDATION_ENABLED", required=False, default="true").lower() == "true"
+SQL_VALIDATION_RETRIES = int(get_env_variable("SQL_VALIDATION_RETRIES", required=False, default="1"))
+
+# SQL model cascade
+MODEL_CASCADE_ENABLED = get_env_variable("MODEL_CASCADE_ENABLED", required=False, default="false").lower() == "true"
+# Empty results are often the right answer ("any incidents on X?"), so they only escalate when enabled
+MODEL_CASCADE_ESCALATE_EMPTY = get_env_variable("MODEL_CASCADE_ESCALATE_EMPTY", required=False, default="false").lower() == "true"
+
+def parse_model_cascade() -> List[Dict[str, str]]:
+    cascade_str = get_env_variable("MODEL_CASCADE", required=False, default=(
+        "openai|gpt-4o-mini;"
+        "openai|gpt-4o"
+    ))
+    
+    levels = []
+    for level_str in cascade_str.split(';'):
+        if not level_str:
+            continue
+        try:
+            provider, model = level_str.split('|')
+            levels.append({'provider': provider.strip(), 'model': model.strip()})
+        except ValueError:
+            logger.error(f"Error parsing model cascade configuration: {level_str}")
+            continue
+    
+    return levels
+
+MODEL_CASCADE = parse_model_cascade()
+
+# Prompt token budgets per model
+def parse_prompt_budgets() -> Dict[str, int]:
+    budgets_str = get_env_variable("PROMPT_TOKEN_BUDGETS", required=False, default=(
+        "default|8000;"
+        "gpt-4o-mini|16000;"
+        "gpt-4o|16000;"
+        "llama3:8b-instruct-q8_0|6000"
+    ))
+    
+    budgets = {}
+    for budget_str in budgets_str.split(';'):
+        if not budget_str:
+            continue
+        try:
+            model, tokens = budget_str.split('|')
+            budgets[model.strip()] = int(tokens)
+        except ValueError:
+            logger.error(f"Error parsing prompt budget configuration: {budget_str}")
+            continue
+    
+    budgets.setdefault('default', 8000)
+    return budgets
+
+PROMPT_TOKEN_BUDGETS = parse_prompt_budgets()
\ No newline at end of file
@@ -0,0 +1,73 @@
+#scripts\batch_questions.py
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Get the project root directory (parent of scripts directory)
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.append(str(PROJECT_ROOT))
+
+import streamlit as st
+from config.config import OPENAI_API_KEY, DEFAULT_MODEL, BATCH_CONCURRENCY
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('batch_questions.log'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run a file of questions through the chatbot pipeline and write results to JSONL"
+    )
+    parser.add_argument("input", type=Path, help="JSONL or CSV file with 'question' and 'tables'")
+    parser.add_argument("-o", "--output", type=Path, default=Path("batch_results.jsonl"),
+                        help="Output JSONL file (default: batch_results.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help=f"Questions in flight at the same time (default: {BATCH_CONCURRENCY})")
+    parser.add_argument("--provider", choices=["openai", "ollama"], default="openai")
+    parser.add_argument("--model", default=None, help="Model name (default: provider default)")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--rag", action="store_true", help="Enable RAG using the documents in docs/")
+    parser.add_argument("--no-prewarm", action="store_true",
+                        help="Skip loading schemas and suggestions before running the questions")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    from src.services.batch_processing import load_questions, prewarm, run_batch
+    from src.utils.chatbot.async_runtime import AsyncRuntime
+
+    # Fuera de Streamlit, session_state es un estado global compartido por el lote
+    st.session_state['OPENAI_API_KEY'] = OPENAI_API_KEY
+    st.session_state['llm_provider'] = args.provider
+    st.session_state['llm_model_name'] = args.model or (DEFAULT_MODEL if args.provider == 'openai' else 'llama3:8b-instruct-q8_0')
+    st.session_state['llm_temperature'] = args.temperature
+    st.session_state['rag_enabled'] = args.rag
+
+    if args.rag:
+        from src.services.rag_service import RAGService
+        RAGService.initialize_components()
+
+    questions = load_questions(args.input)
+    if not questions:
+        logger.error("No questions to process")
+        sys.exit(1)
+
+    if not args.no_prewarm:
+        prewarm(questions, args.concurrency)
+
+    summary = AsyncRuntime.run(run_batch(questions, args.output, args.concurrency))
+    print(json.dumps(summary, indent=2))
+    if summary['errors']:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
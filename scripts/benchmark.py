@@ -0,0 +1,98 @@
+#scripts\benchmark.py
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Get the project root directory (parent of scripts directory)
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.append(str(PROJECT_ROOT))
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the chatbot pipeline offline with a simulated LLM and a local SQLite database"
+    )
+    parser.add_argument("-n", "--iterations", type=int, default=5,
+                        help="Measured passes over the benchmark questions (default: 5)")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("-c", "--concurrency", type=int, default=1,
+                        help="Questions in flight at the same time in async mode (default: 1)")
+    parser.add_argument("--profile", default="instant",
+                        help="LLM latency profile: instant, gpt-4o-mini or llama3-8b-cpu (default: instant)")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured passes before measuring (default: 1)")
+    parser.add_argument("--months", type=int, default=12, help="Synthetic monthly tables (default: 12)")
+    parser.add_argument("--rows-per-month", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", type=Path, default=PROJECT_ROOT / ".benchmark",
+                        help="Directory for the SQLite database and caches (default: .benchmark)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also report the Python heap peak (slower)")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="Write the summary to a JSON file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log the pipeline at INFO level")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    # El benchmark no usa MySQL ni la caché de la aplicación: se configuran antes
+    # de importar config para que no hagan falta credenciales reales
+    for var in ("MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_HOST", "MYSQL_DATABASE"):
+        os.environ.setdefault(var, "benchmark")
+    os.environ["CACHE_DIR"] = str(args.workdir / "cache")
+
+    import streamlit as st
+    from src.services.benchmark import (
+        BENCHMARK_PROVIDER, BENCHMARK_QUESTIONS, LATENCY_PROFILES, BenchmarkLLM, seed_database, run_benchmark
+    )
+    from src.utils.database import configure_database
+    from src.utils.llm_provider import LLMProvider
+
+    # Fuera de `streamlit run` cada acceso a session_state avisa de que no hay ScriptRunContext
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+    if args.profile not in LATENCY_PROFILES:
+        print(f"Unknown profile '{args.profile}', choose one of: {', '.join(LATENCY_PROFILES)}")
+        sys.exit(1)
+
+    db_path = args.workdir / "benchmark.sqlite"
+    tables = seed_database(db_path, months=args.months, rows_per_month=args.rows_per_month, seed=args.seed)
+    configure_database(f"sqlite:///{db_path}")
+
+    sql_by_question = {item['question']: item['sql'] for item in BENCHMARK_QUESTIONS}
+    LLMProvider.register_provider(
+        BENCHMARK_PROVIDER,
+        lambda model_name=None, **kwargs: BenchmarkLLM(profile=model_name or "instant", sql_by_question=sql_by_question)
+    )
+
+    # Fuera de Streamlit, session_state es un estado global compartido por el benchmark
+    st.session_state['llm_provider'] = BENCHMARK_PROVIDER
+    st.session_state['llm_model_name'] = args.profile
+    st.session_state['llm_temperature'] = 0.0
+    st.session_state['rag_enabled'] = False
+
+    questions = [item for item in BENCHMARK_QUESTIONS if all(table in tables for table in item['tables'])]
+    summary = run_benchmark(
+        questions,
+        iterations=args.iterations,
+        concurrency=args.concurrency,
+        mode=args.mode,
+        warmup=args.warmup,
+        trace_memory=args.trace_memory
+    )
+    summary['profile'] = args.profile
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(summary, indent=2), encoding='utf-8')
+    if summary['errors']:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
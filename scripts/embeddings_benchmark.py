@@ -0,0 +1,82 @@
+#scripts\embeddings_benchmark.py
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Get the project root directory (parent of scripts directory)
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.append(str(PROJECT_ROOT))
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare the embedding throughput of the RAG embeddings backends on the docs/ chunks"
+    )
+    parser.add_argument("-p", "--providers", default="local,ollama,openai",
+                        help="Comma separated backends to measure (default: local,ollama,openai)")
+    parser.add_argument("--model", default=None, help="Model name, the backend default when omitted")
+    parser.add_argument("-b", "--batch-sizes", default="16,64",
+                        help="Comma separated batch sizes to measure (default: 16,64)")
+    parser.add_argument("--dimensions", type=int, default=0, help="Output dimensions (default: model default)")
+    parser.add_argument("--repeat", type=int, default=3, help="Measured passes over the chunks (default: 3)")
+    parser.add_argument("--queries", type=int, default=20, help="Query embeddings timed one by one (default: 20)")
+    parser.add_argument("--docs", type=Path, default=PROJECT_ROOT / "docs", help="Documents directory")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="Write the results to a JSON file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log at INFO level")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    # No hace falta MySQL para medir embeddings
+    for var in ("MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_HOST", "MYSQL_DATABASE"):
+        os.environ.setdefault(var, "benchmark")
+
+    import streamlit as st
+    from config.config import OPENAI_API_KEY, RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP
+    from src.services.benchmark import run_embeddings_benchmark
+    from src.utils.embeddings import EmbeddingsProvider
+    from src.utils.rag_utils import chunk_documents, load_documents
+
+    # Fuera de `streamlit run` cada acceso a session_state avisa de que no hay ScriptRunContext
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    st.session_state['OPENAI_API_KEY'] = OPENAI_API_KEY
+
+    chunks, _ = chunk_documents(load_documents(args.docs), RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP, args.docs)
+    texts = [chunk.page_content for chunk in chunks]
+    if not texts:
+        print(f"No documents to embed in {args.docs}")
+        sys.exit(1)
+
+    results = []
+    for provider in [name.strip() for name in args.providers.split(',') if name.strip()]:
+        for batch_size in [int(size) for size in args.batch_sizes.split(',') if size.strip()]:
+            try:
+                embeddings = EmbeddingsProvider.get_embeddings(
+                    provider=provider,
+                    model_name=args.model,
+                    dimensions=args.dimensions or None,
+                    batch_size=batch_size,
+                    # Sin caché: cada pasada mide el backend, no SQLite
+                    use_cache=False
+                )
+                result = run_embeddings_benchmark(embeddings, texts, args.repeat, args.queries)
+            except Exception as e:
+                # Un backend no disponible no impide medir los demás
+                result = {'model': provider, 'batch_size': batch_size, 'error': str(e)}
+            result['provider'] = provider
+            results.append(result)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+if __name__ == "__main__":
+    main()
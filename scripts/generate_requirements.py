@@ -30,6 +30,7 @@ def generate_requirements() -> None:
             "pydantic",
             "sqlalchemy",
             "tiktoken",  # Necesario para OpenAI
+            "sqlglot",  # Validación local de SQL
         ],
         "Database": [
             "mysql-connector-python",
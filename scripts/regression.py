@@ -0,0 +1,147 @@
+#scripts\regression.py
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Get the project root directory (parent of scripts directory)
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.append(str(PROJECT_ROOT))
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Record or replay LLM cassettes of the golden questions and flag token, call, query and latency regressions"
+    )
+    parser.add_argument("command", choices=["record", "check"])
+    parser.add_argument("-d", "--dataset", default="incidentes",
+                        help="Golden set under regression/ (default: incidentes)")
+    parser.add_argument("--provider", choices=["benchmark", "openai", "ollama"], default="benchmark",
+                        help="Model the cassettes are recorded from (record only, default: benchmark)")
+    parser.add_argument("--model", default=None, help="Model name (record only)")
+    parser.add_argument("--repeat", type=int, default=3, help="Replays per question for stage times (default: 3)")
+    parser.add_argument("--token-tolerance", type=float, default=0.02,
+                        help="Allowed relative growth of prompt tokens (default: 0.02)")
+    parser.add_argument("--time-tolerance", type=float, default=0.5,
+                        help="Allowed relative growth of a stage time (default: 0.5)")
+    parser.add_argument("--min-time-delta-ms", type=float, default=25.0,
+                        help="Stage slowdowns below this are ignored (default: 25)")
+    parser.add_argument("--update", action="store_true",
+                        help="Accept the current DB query counts and stage times as the new baseline (check only)")
+    parser.add_argument("--workdir", type=Path, default=PROJECT_ROOT / ".benchmark",
+                        help="Directory for the SQLite database and caches (default: .benchmark)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log the pipeline at INFO level")
+    return parser.parse_args()
+
+def build_rag_store(provider: str):
+    """Vector store for the RAG questions: the real one when embeddings are available, else keyword ranking"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from config.config import RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP
+    from src.services.regression import KeywordStore
+    from src.utils.rag_utils import load_documents
+    from src.utils.vector_store import SharedVectorStore
+
+    if provider == "openai":
+        from src.services.rag_service import RAGService
+        RAGService.initialize_components()
+        if SharedVectorStore.get() is not None:
+            return SharedVectorStore.get()
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=RAG_CHUNK_SIZE, chunk_overlap=RAG_CHUNK_OVERLAP)
+    return KeywordStore(splitter.split_documents(load_documents(PROJECT_ROOT / "docs")))
+
+def main():
+    args = parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    # Igual que el benchmark: SQLite local y caché propia, sin credenciales reales
+    for var in ("MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_HOST", "MYSQL_DATABASE"):
+        os.environ.setdefault(var, "benchmark")
+    os.environ["CACHE_DIR"] = str(args.workdir / "cache")
+
+    import streamlit as st
+    from config.config import OPENAI_API_KEY
+    from src.services.benchmark import BenchmarkLLM, seed_database
+    from src.services.regression import (
+        baseline_metrics, cassette_path, compare, load_golden_set, record, replay
+    )
+    from src.utils.database import configure_database
+    from src.utils.llm_provider import LLMProvider
+
+    # Fuera de `streamlit run` cada acceso a session_state avisa de que no hay ScriptRunContext
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+    golden = load_golden_set(args.dataset)
+    questions = golden['questions']
+    dataset = golden['dataset']
+    db_path = args.workdir / f"regression_{args.dataset}.sqlite"
+    seed_database(
+        db_path,
+        csv_path=PROJECT_ROOT / dataset['csv'],
+        months=dataset['months'],
+        rows_per_month=dataset['rows_per_month'],
+        seed=dataset['seed']
+    )
+    configure_database(f"sqlite:///{db_path}")
+
+    st.session_state['OPENAI_API_KEY'] = OPENAI_API_KEY
+    st.session_state['llm_temperature'] = 0.0
+    path = cassette_path(args.dataset)
+
+    if args.command == "record":
+        if args.provider == "benchmark":
+            sql_by_question = {item['question']: item['sql'] for item in questions if item.get('sql')}
+            inner_factory = lambda: BenchmarkLLM(sql_by_question=sql_by_question)
+        else:
+            inner_factory = lambda: LLMProvider.get_llm(provider=args.provider, model_name=args.model, temperature=0)
+        store = build_rag_store(args.provider) if any(item.get('rag') for item in questions) else None
+
+        cassettes = record(questions, inner_factory, args.model or args.provider, store)
+        cassettes['provider'] = args.provider
+        # La línea base de consultas y tiempos sale de reproducir lo recién grabado
+        for question_id, metrics in replay(questions, cassettes, args.repeat).items():
+            cassettes['questions'][question_id]['baseline'] = {
+                "db_queries": metrics['db_queries'],
+                "stage_ms": metrics['stage_ms']
+            }
+        path.write_text(json.dumps(cassettes, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Recorded {len(cassettes['questions'])} questions to {path}")
+        return
+
+    if not path.exists():
+        print(f"No cassettes at {path}, run 'record' first")
+        sys.exit(1)
+    cassettes = json.loads(path.read_text(encoding='utf-8'))
+    results = replay(questions, cassettes, args.repeat)
+
+    report = {}
+    for question_id, current in results.items():
+        recorded = cassettes['questions'][question_id]
+        baseline = baseline_metrics(recorded, cassettes.get('model'))
+        regressions = compare(
+            baseline, current, args.token_tolerance, args.time_tolerance, args.min_time_delta_ms
+        )
+        report[question_id] = {
+            "llm_calls": current['llm_calls'],
+            "prompt_tokens": current['prompt_tokens'],
+            "db_queries": current['db_queries'],
+            "changed_prompts": current['changed_prompts'],
+            "regressions": regressions
+        }
+        if args.update:
+            recorded['baseline'] = {"db_queries": current['db_queries'], "stage_ms": current['stage_ms']}
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.update:
+        path.write_text(json.dumps(cassettes, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Baseline updated in {path}")
+    elif any(entry['regressions'] for entry in report.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,73 @@
 # src/components/debug_panel.py
 import streamlit as st
+import matplotlib.pyplot as plt
+import pandas as pd
+import json
 import logging
 
+def display_trace_waterfall(trace):
+    """Display the spans of a request trace as a waterfall and offer its OTLP export"""
+    try:
+        rows = trace.waterfall()
+        if not rows:
+            return
+
+        st.markdown(f"**Trace** `{trace.trace_id}`")
+
+        fig, ax = plt.subplots(figsize=(10, max(2, 0.35 * len(rows) + 1)))
+        labels = ["  " * row["depth"] + row["name"] for row in rows]
+        colors = ["#d62728" if row["status"] == "error" else "#1f77b4" for row in rows]
+        ax.barh(range(len(rows)), [row["duration_ms"] for row in rows],
+                left=[row["start_ms"] for row in rows], color=colors)
+        ax.set_yticks(range(len(rows)))
+        ax.set_yticklabels(labels, fontfamily="monospace")
+        ax.invert_yaxis()
+        ax.set_xlabel("ms since question")
+        for idx, row in enumerate(rows):
+            ax.text(row["start_ms"] + row["duration_ms"], idx, f" {row['duration_ms']:.0f} ms", va="center", fontsize=8)
+        plt.tight_layout()
+        st.pyplot(fig)
+        plt.close(fig)
+
+        st.dataframe(pd.DataFrame([
+            {
+                "span": "  " * row["depth"] + row["name"],
+                "start_ms": row["start_ms"],
+                "duration_ms": row["duration_ms"],
+                "status": row["status"],
+                "attributes": json.dumps(row["attributes"], ensure_ascii=False, default=str)
+            }
+            for row in rows
+        ]), use_container_width=True)
+
+        st.download_button(
+            "Export trace (OTLP JSON)",
+            data=json.dumps(trace.to_otlp(), ensure_ascii=False, indent=2),
+            file_name=f"trace-{trace.trace_id}.json",
+            mime="application/json",
+            key=f"otlp_{trace.trace_id}"
+        )
+    except Exception as e:
+        logging.error(f"Error displaying trace waterfall: {str(e)}")
+        st.error("Error displaying trace")
+
 def display_debug_section():
     """Display debug information in a separate section"""
     try:
         st.header("Debug Information")
-        
+
         # Asegurar que debug_logs existe
         if 'debug_logs' not in st.session_state:
             st.session_state['debug_logs'] = []
-            
+
         if st.session_state['debug_logs']:
             for idx, log in enumerate(st.session_state['debug_logs'], 1):
                 with st.expander(f"Debug Log {idx}", expanded=False):
-                    st.json(log)
+                    if log.get('trace') is not None:
+                        display_trace_waterfall(log['trace'])
+                    st.json({key: value for key, value in log.items() if key != 'trace'})
         else:
             st.info("No debug logs available yet. Make some queries to see the debug information.")
     except Exception as e:
         logging.error(f"Error displaying debug section: {str(e)}")
-        st.error("Error loading debug information")
\ No newline at end of file
+        st.error("Error loading debug information")
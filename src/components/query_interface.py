@@ -2,11 +2,15 @@
 
 import streamlit as st
 import pandas as pd
+from contextlib import nullcontext
 from src.services.data_processing import handle_query_and_response
 from src.components.visualization import create_visualization
 from src.utils.database import get_all_tables
 from typing import List
 from src.utils.llm_provider import LLMProvider
+from src.utils.ollama_manager import OllamaManager
+from src.utils.chatbot.suggestions import SuggestionStore
+from config.config import MODEL_CASCADE, MODEL_CASCADE_ENABLED
 
 def display_table_selection() -> List[str]:
     """Display table selection interface and return selected tables"""
@@ -45,6 +49,8 @@ def display_table_selection() -> List[str]:
         # Mostrar contador de selección
         if selected_tables:
             st.sidebar.success(f"✅ Selected {len(selected_tables)} tables")
+            # Precalcular sugerencias para esta selección antes de la primera pregunta
+            SuggestionStore.prefetch(selected_tables)
         else:
             st.sidebar.warning("⚠️ No tables selected")
             
@@ -112,8 +118,12 @@ def process_query(question: str, selected_tables: List[str]):
                         if response.get('visualization_data'):
                             viz_expander = st.expander("📊 Data Visualization", expanded=True)
                             with viz_expander:
-                                df = pd.DataFrame(response['visualization_data'])
-                                create_visualization(df)
+                                # El renderizado se añade a la traza de la pregunta
+                                trace = response.get('trace')
+                                points = len(response['visualization_data'])
+                                with trace.span("chart_rendering", **{"chart.points": points}) if trace else nullcontext():
+                                    df = pd.DataFrame(response['visualization_data'])
+                                    create_visualization(df)
                         
                         # SQL Query section
                         if response.get('query'):
@@ -175,6 +185,9 @@ def display_model_settings():
         key='model_select'
     )
     st.session_state['llm_model_name'] = model_name
+    if provider == 'ollama':
+        # Load the selected model in the background before the first question
+        OllamaManager.warm_up([model_name])
     
     # Temperature setting
     temperature = st.sidebar.slider(
@@ -187,8 +200,23 @@ def display_model_settings():
     )
     st.session_state['llm_temperature'] = temperature
     
+    # Model cascade: SQL is generated with the cheapest model and escalated on failure
+    cascade = st.sidebar.checkbox(
+        "Model cascade for SQL",
+        value=st.session_state.get('llm_cascade', MODEL_CASCADE_ENABLED),
+        help="Generate SQL with the cheapest model first and escalate only when it fails",
+        key='cascade_checkbox'
+    )
+    st.session_state['llm_cascade'] = cascade
+    
     # Display current configuration
     with st.sidebar.expander("Current Configuration"):
         st.write(f"Provider: {provider}")
         st.write(f"Model: {model_name}")
-        st.write(f"Temperature: {temperature}")
\ No newline at end of file
+        st.write(f"Temperature: {temperature}")
+        if cascade:
+            st.write("SQL cascade: " + " → ".join(level['model'] for level in MODEL_CASCADE))
+    
+    if provider == 'ollama' and (latency := OllamaManager.get_latency_report().get(model_name)):
+        with st.sidebar.expander("Ollama Latency"):
+            st.json(latency)
\ No newline at end of file
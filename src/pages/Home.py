@@ -62,6 +62,7 @@ try:
     # Import components
     from src.utils.database import get_all_tables, test_database_connection
     from src.utils.chatbot.chains import ChainBuilder
+    from src.utils.ollama_manager import OllamaManager
     from src.services.data_processing import handle_query_and_response
     #from src.services.rag_service import initialize_rag_components
     from src.services.rag_service import RAGService
@@ -82,6 +83,9 @@ def main():
         # Inicializar session state
         initialize_session_state()
         
+        # Precargar los modelos de Ollama en segundo plano (una vez por proceso)
+        OllamaManager.warm_up()
+        
         # Header principal
         display_header()
         
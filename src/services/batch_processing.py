@@ -0,0 +1,102 @@
+# src/services/batch_processing.py
+import asyncio
+import csv
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+from src.utils.chatbot.query import QueryProcessor
+from src.utils.chatbot.suggestions import SuggestionStore
+from src.utils.database import get_schema
+
+logger = logging.getLogger(__name__)
+
+def load_questions(input_path: Path) -> List[Dict[str, Any]]:
+    """
+    Load batch questions from a JSONL or CSV file
+
+    JSONL lines look like {"question": "...", "tables": ["t1", "t2"]}; CSV files
+    need 'question' and 'tables' columns, with table names separated by ';'.
+    """
+    questions = []
+    with open(input_path, encoding='utf-8') as f:
+        if input_path.suffix.lower() == '.csv':
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    for idx, row in enumerate(rows):
+        tables = row.get('tables') or []
+        if isinstance(tables, str):
+            tables = [table.strip() for table in tables.split(';') if table.strip()]
+        if not row.get('question'):
+            logger.warning(f"Skipping entry {idx}: no question")
+            continue
+        questions.append({'id': row.get('id', idx), 'question': row['question'], 'tables': tables})
+
+    logger.info(f"Loaded {len(questions)} questions from {input_path}")
+    return questions
+
+def prewarm(questions: List[Dict[str, Any]], concurrency: int) -> None:
+    """Load the schema once per table set and batch the suggestion LLM calls"""
+    table_sets = {tuple(sorted(q['tables'])) for q in questions}
+    for tables in table_sets:
+        get_schema(list(tables))
+    refreshed = SuggestionStore.refresh_many([list(tables) for tables in table_sets], max_concurrency=concurrency)
+    logger.info(f"Prewarmed {len(table_sets)} table sets ({refreshed} suggestion sets generated)")
+
+async def run_batch(questions: List[Dict[str, Any]], output_path: Path, concurrency: int) -> Dict[str, Any]:
+    """
+    Run the questions through the async pipeline with bounded concurrency
+
+    Each result is appended to output_path as one JSON line as soon as it finishes.
+
+    Returns:
+        Dict[str, Any]: Batch summary (counts, errors and wall time)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    errors = 0
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    with open(output_path, 'w', encoding='utf-8') as out:
+        async def process(item: Dict[str, Any]):
+            nonlocal errors
+            async with semaphore:
+                question_start = time.perf_counter()
+                response = await QueryProcessor.aprocess_query_and_response(item['question'], item['tables'])
+                elapsed = round(time.perf_counter() - question_start, 3)
+
+            failed = response.get('query') is None
+            record = {
+                'id': item['id'],
+                'question': item['question'],
+                'tables': item['tables'],
+                'query': response.get('query'),
+                'response': response.get('response'),
+                'visualization_data': response.get('visualization_data'),
+                'failed': failed,
+                'elapsed_seconds': elapsed,
+                'stage_timings': response.get('stage_timings', {}),
+                'token_usage': response.get('token_usage', {}),
+                'trace_id': response['trace'].trace_id if response.get('trace') else None
+            }
+            async with write_lock:
+                errors += failed
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                out.flush()
+            logger.info(f"Question {item['id']} finished in {elapsed:.3f}s")
+
+        await asyncio.gather(*(process(item) for item in questions))
+
+    wall_time = round(time.perf_counter() - start, 3)
+    return {
+        'questions': len(questions),
+        'errors': errors,
+        'wall_time_seconds': wall_time,
+        'questions_per_second': round(len(questions) / wall_time, 3) if wall_time else None,
+        'output': str(output_path)
+    }
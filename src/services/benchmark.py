@@ -0,0 +1,348 @@
+# src/services/benchmark.py
+import asyncio
+import calendar
+import json
+import logging
+import math
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, get_buffer_string
+from langchain_core.outputs import ChatGeneration, ChatResult
+from sqlalchemy import create_engine
+from src.utils.chatbot.query import QueryProcessor
+from src.utils.chatbot.usage import LLM_STAGE_TAGS
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PROVIDER = "benchmark"
+BASE_TABLE = "dataset_registro_de_incidentes"
+DEFAULT_CSV = Path(__file__).resolve().parents[2] / "ref" / "DATASET_REGISTRO_DE_INCIDENTES.csv"
+# Caracteres por token para estimar el tamaño de los prompts sin tokenizador
+CHARS_PER_TOKEN = 4
+
+# Latencia simulada por etapa: primer token, evaluación del prompt y generación
+LATENCY_PROFILES: Dict[str, Dict[str, Dict[str, float]]] = {
+    "instant": {
+        "llm": {"first_token_ms": 0, "ms_per_prompt_token": 0, "ms_per_token": 0}
+    },
+    "gpt-4o-mini": {
+        "sql_generation": {"first_token_ms": 350, "ms_per_prompt_token": 0, "ms_per_token": 12},
+        "answer_generation": {"first_token_ms": 450, "ms_per_prompt_token": 0, "ms_per_token": 12},
+        "llm": {"first_token_ms": 400, "ms_per_prompt_token": 0, "ms_per_token": 12}
+    },
+    "llama3-8b-cpu": {
+        "sql_generation": {"first_token_ms": 200, "ms_per_prompt_token": 1.5, "ms_per_token": 90},
+        "answer_generation": {"first_token_ms": 200, "ms_per_prompt_token": 1.5, "ms_per_token": 90},
+        "llm": {"first_token_ms": 200, "ms_per_prompt_token": 1.5, "ms_per_token": 90}
+    }
+}
+
+# Preguntas del benchmark con la consulta que devuelve el LLM simulado
+BENCHMARK_QUESTIONS: List[Dict[str, Any]] = [
+    {
+        "question": "¿Cuántos incidentes hay por provincia?",
+        "tables": [BASE_TABLE],
+        "sql": f"SELECT provincia, COUNT(*) AS total FROM {BASE_TABLE} GROUP BY provincia ORDER BY total DESC"
+    },
+    {
+        "question": "¿Cuántos patrullajes hubo por turno?",
+        "tables": [BASE_TABLE],
+        "sql": f"SELECT turno, COUNT(*) AS total FROM {BASE_TABLE} GROUP BY turno ORDER BY total DESC"
+    },
+    {
+        "question": "¿Qué distritos registran más hurtos a vivienda?",
+        "tables": [BASE_TABLE],
+        "sql": (
+            f"SELECT distrito, SUM(hurto_vivienda) AS hurtos FROM {BASE_TABLE} "
+            "GROUP BY distrito ORDER BY hurtos DESC LIMIT 10"
+        )
+    },
+    {
+        "question": "¿Cuántos accidentes de tránsito hubo por modalidad de patrullaje en enero de 2024?",
+        "tables": ["incidentes_2024_01"],
+        "sql": (
+            "SELECT modalidad_patrullaje, SUM(accidentes_transito) AS accidentes FROM incidentes_2024_01 "
+            "GROUP BY modalidad_patrullaje ORDER BY accidentes DESC"
+        )
+    },
+    {
+        "question": "Compara el número de patrullajes entre enero y febrero de 2024",
+        "tables": ["incidentes_2024_01", "incidentes_2024_02"],
+        "sql": (
+            "SELECT '2024-01' AS mes, COUNT(*) AS total FROM incidentes_2024_01 "
+            "UNION ALL SELECT '2024-02' AS mes, COUNT(*) AS total FROM incidentes_2024_02"
+        )
+    },
+    {
+        "question": "¿Qué sectores tuvieron personas sospechosas en marzo de 2024?",
+        "tables": ["incidentes_2024_03"],
+        "sql": (
+            "SELECT sector_patrullado, SUM(persona_sospechosa) AS total FROM incidentes_2024_03 "
+            "GROUP BY sector_patrullado HAVING total > 0 ORDER BY total DESC"
+        )
+    }
+]
+
+BENCHMARK_ANSWER = json.dumps({
+    "answer": "Resultado del benchmark: la categoría A concentra la mayor parte de los registros.",
+    "chart_data": [{"category": "A", "value": 10}, {"category": "B", "value": 6}, {"category": "C", "value": 3}]
+}, ensure_ascii=False)
+BENCHMARK_SUGGESTIONS = "\n".join(f"{idx}. ¿Pregunta de ejemplo {idx}?" for idx in range(1, 6))
+
+class BenchmarkLLM(BaseChatModel):
+    """
+    Deterministic chat model for offline benchmarks
+
+    Answers with the scripted SQL of the question found in the prompt, a fixed
+    structured answer or fixed suggestions, after sleeping for the latency of
+    its profile, and reports estimated token usage like a real provider.
+    """
+
+    profile: str = "instant"
+    sql_by_question: Dict[str, str] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark"
+
+    @staticmethod
+    def _stage(run_manager) -> str:
+        tags = getattr(run_manager, "tags", None) or []
+        for tag in LLM_STAGE_TAGS:
+            if tag in tags:
+                return tag
+        return "llm"
+
+    def _respond(self, messages: List[BaseMessage], run_manager) -> Tuple[str, float, Dict[str, int]]:
+        """Get the response text, the simulated latency in seconds and the token usage"""
+        prompt = get_buffer_string(messages)
+        stage = self._stage(run_manager)
+        if stage == "sql_generation":
+            # El prompt de reparación repite la pregunta, así que también se encuentra
+            content = next(
+                (sql for question, sql in self.sql_by_question.items() if question in prompt),
+                "SELECT 1"
+            )
+        elif stage == "answer_generation":
+            content = BENCHMARK_ANSWER
+        else:
+            content = BENCHMARK_SUGGESTIONS
+
+        profile = LATENCY_PROFILES[self.profile]
+        latency = profile.get(stage, profile["llm"])
+        prompt_tokens = math.ceil(len(prompt) / CHARS_PER_TOKEN)
+        completion_tokens = math.ceil(len(content) / CHARS_PER_TOKEN)
+        seconds = (
+            latency["first_token_ms"]
+            + prompt_tokens * latency["ms_per_prompt_token"]
+            + completion_tokens * latency["ms_per_token"]
+        ) / 1000
+        usage = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        return content, seconds, usage
+
+    @staticmethod
+    def _result(content: str, usage: Dict[str, int]) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content, seconds, usage = self._respond(messages, run_manager)
+        time.sleep(seconds)
+        return self._result(content, usage)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content, seconds, usage = self._respond(messages, run_manager)
+        await asyncio.sleep(seconds)
+        return self._result(content, usage)
+
+def seed_database(db_path: Path, csv_path: Path = DEFAULT_CSV, months: int = 12,
+                  rows_per_month: int = 2000, seed: int = 42) -> List[str]:
+    """
+    Create the benchmark SQLite database
+
+    The incidents CSV is loaded as is (columns cleaned like scripts/mysql/load.py)
+    and each synthetic monthly table of 2024 resamples it with a fixed seed, so
+    the same arguments always produce the same data.
+
+    Returns:
+        List[str]: Created table names
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+
+    df = pd.read_csv(csv_path, encoding='latin1', sep=';')
+    df.columns = [col.replace(" ", "_").replace("-", "_").lower() for col in df.columns]
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    tables = [BASE_TABLE]
+    try:
+        df.to_sql(BASE_TABLE, engine, index=False)
+        for month in range(1, months + 1):
+            days = calendar.monthrange(2024, month)[1]
+            sample = df.sample(n=rows_per_month, replace=True, random_state=seed + month).reset_index(drop=True)
+            sample["fecha_patrullaje"] = [20240000 + month * 100 + (idx % days) + 1 for idx in range(len(sample))]
+            table = f"incidentes_2024_{month:02d}"
+            sample.to_sql(table, engine, index=False)
+            tables.append(table)
+    finally:
+        engine.dispose()
+
+    logger.info(f"Benchmark database seeded at {db_path} ({len(df)} base rows, {months} monthly tables)")
+    return tables
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return round(ordered[rank - 1], 3)
+
+def stage_durations_ms(response: Dict[str, Any], wall_seconds: float) -> Dict[str, float]:
+    """Total milliseconds per span name of one request (a stage may run more than once)"""
+    stages = {"total": wall_seconds * 1000}
+    trace = response.get('trace')
+    if trace is None:
+        return stages
+    for row in trace.waterfall():
+        if row["depth"] == 0:
+            continue
+        stages[row["name"]] = stages.get(row["name"], 0.0) + row["duration_ms"]
+    return stages
+
+async def _run_async(questions: List[Dict[str, Any]], concurrency: int) -> List[Tuple[Dict[str, Any], float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process(item: Dict[str, Any]):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await QueryProcessor.aprocess_query_and_response(item['question'], item['tables'])
+            return response, time.perf_counter() - start
+
+    return await asyncio.gather(*(process(item) for item in questions))
+
+def _run_sync(questions: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], float]]:
+    results = []
+    for item in questions:
+        start = time.perf_counter()
+        response = QueryProcessor.process_query_and_response(item['question'], item['tables'])
+        results.append((response, time.perf_counter() - start))
+    return results
+
+def run_benchmark(questions: List[Dict[str, Any]], iterations: int = 5, concurrency: int = 1,
+                  mode: str = "sync", warmup: int = 1, trace_memory: bool = False) -> Dict[str, Any]:
+    """
+    Run the benchmark questions through QueryProcessor and summarize the latencies
+
+    Args:
+        questions (List[Dict[str, Any]]): Items with 'question' and 'tables'
+        iterations (int): Measured passes over the questions
+        concurrency (int): Questions in flight at the same time (async mode)
+        mode (str): 'sync' (process_query_and_response) or 'async' (aprocess_query_and_response)
+        warmup (int): Unmeasured passes that fill the schema and metadata caches
+        trace_memory (bool): Also report the Python heap peak (tracemalloc slows the run down)
+
+    Returns:
+        Dict[str, Any]: p50/p95 per stage, throughput, errors and memory peak
+    """
+    from src.utils.chatbot.async_runtime import AsyncRuntime
+
+    def run_pass(items):
+        if mode == "async":
+            return AsyncRuntime.run(_run_async(items, concurrency))
+        return _run_sync(items)
+
+    for _ in range(warmup):
+        run_pass(questions)
+
+    if trace_memory:
+        tracemalloc.start()
+    measured = questions * iterations
+    start = time.perf_counter()
+    results = run_pass(measured)
+    wall_time = time.perf_counter() - start
+    python_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    samples: Dict[str, List[float]] = {}
+    errors = 0
+    for response, seconds in results:
+        errors += response.get('query') is None
+        for stage, value in stage_durations_ms(response, seconds).items():
+            samples.setdefault(stage, []).append(value)
+
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+    return {
+        'mode': mode,
+        'questions': len(measured),
+        'concurrency': concurrency if mode == "async" else 1,
+        'errors': errors,
+        'wall_time_seconds': round(wall_time, 3),
+        'questions_per_second': round(len(measured) / wall_time, 3) if wall_time else None,
+        'stages': {
+            stage: {
+                'count': len(values),
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95)
+            }
+            for stage, values in sorted(samples.items())
+        },
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'python_peak_mb': round(python_peak / (1024 * 1024), 1) if python_peak is not None else None
+    }
+
+def run_embeddings_benchmark(embeddings, texts: List[str], repeat: int = 3, queries: int = 20) -> Dict[str, Any]:
+    """
+    Measure document and query embedding throughput of an embeddings backend
+
+    Args:
+        embeddings: Embeddings to measure (already batched by EmbeddingsProvider)
+        texts (List[str]): Chunks embedded as documents on each pass
+        repeat (int): Measured passes over the chunks, after one unmeasured warm-up
+        queries (int): Single-text query embeddings timed one by one
+
+    Returns:
+        Dict[str, Any]: Chunks and characters per second, dimensions and query latency
+    """
+    # La primera llamada carga el modelo (local/Ollama) o abre la conexión (OpenAI)
+    dimensions = len(embeddings.embed_query(texts[0])) if texts else 0
+
+    pass_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        embeddings.embed_documents(texts)
+        pass_seconds.append(time.perf_counter() - start)
+
+    query_ms = []
+    for text in (texts * math.ceil(queries / max(1, len(texts))))[:queries]:
+        start = time.perf_counter()
+        embeddings.embed_query(text[:200])
+        query_ms.append((time.perf_counter() - start) * 1000)
+
+    best = min(pass_seconds) if pass_seconds else 0
+    chars = sum(len(text) for text in texts)
+    return {
+        'model': getattr(embeddings, 'model', type(embeddings).__name__),
+        'batch_size': getattr(embeddings, 'batch_size', None),
+        'dimensions': dimensions,
+        'chunks': len(texts),
+        'pass_seconds_p50': percentile(pass_seconds, 50),
+        'chunks_per_second': round(len(texts) / best, 1) if best else None,
+        'chars_per_second': round(chars / best, 1) if best else None,
+        'query_p50_ms': percentile(query_ms, 50),
+        'query_p95_ms': percentile(query_ms, 95)
+    }
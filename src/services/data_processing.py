@@ -6,10 +6,12 @@ from typing import Optional, Dict, List, Any
 #from src.utils.chatbot import generate_sql_chain, generate_response_chain
 from src.utils.chatbot.chains import ChainBuilder
 from src.utils.chatbot.query import QueryProcessor
+from src.utils.chatbot.async_runtime import AsyncRuntime
 from src.utils.chatbot.response import ResponseProcessor
 from src.services.state_management import store_debug_log
 #from src.services.rag_service import process_query_with_rag
 from src.services.rag_service import RAGService
+from config.config import CHATBOT_ASYNC_MODE
 
 # Configuración de logging
 logging.basicConfig(
@@ -31,7 +33,12 @@ def handle_query_and_response(question: str, selected_tables: List[str]) -> Dict
             st.session_state['debug_logs'] = []
             
         # Usar QueryProcessor para manejar toda la lógica de procesamiento
-        response_data = QueryProcessor.process_query_and_response(question, selected_tables)
+        if CHATBOT_ASYNC_MODE:
+            response_data = AsyncRuntime.run(
+                QueryProcessor.aprocess_query_and_response(question, selected_tables)
+            )
+        else:
+            response_data = QueryProcessor.process_query_and_response(question, selected_tables)
         
         # Almacenar en debug_logs
         store_debug_log({
@@ -42,7 +49,18 @@ def handle_query_and_response(question: str, selected_tables: List[str]) -> Dict
             'has_visualization': response_data.get('visualization_data') is not None,
             'rag_enabled': st.session_state.get('rag_initialized', False),
             'selected_tables': selected_tables,
-            'rag_context': response_data.get('rag_context', [])
+            'rag_context': response_data.get('rag_context', []),
+            'stage_timings': response_data.get('stage_timings', {}),
+            'result_summary': response_data.get('result_summary'),
+            'token_usage': response_data.get('token_usage', {}),
+            'sql_validation': response_data.get('sql_validation', []),
+            'sql_model': response_data.get('sql_model'),
+            'model_escalations': response_data.get('model_escalations', []),
+            'llm_calls': response_data.get('llm_calls', []),
+            'intent': response_data.get('intent'),
+            'trace_id': response_data['trace'].trace_id if response_data.get('trace') else None,
+            # Se guarda el objeto: el panel de debug lo muestra como cascada y lo exporta a OTLP
+            'trace': response_data.get('trace')
         })
         
         return response_data
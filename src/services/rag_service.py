@@ -4,9 +4,14 @@ import logging
 import streamlit as st
 from langchain.memory import ConversationBufferMemory
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
-from ..utils.rag_utils import initialize_embeddings, load_documents, create_vector_store
+from ..utils.rag_utils import initialize_embeddings
+from ..utils.vector_store import SharedVectorStore
+from ..utils.docs_watcher import DocsWatcher
 from ..utils.database import get_all_tables
 from ..utils.chatbot.chains import ChainBuilder
+from ..utils.chatbot.memory import SummaryWindowMemory
+from ..utils.chatbot.tracing import Trace
+from config.config import MEMORY_MODE, RAG_TOP_K, RAG_RETRIEVAL_MODE, RAG_WATCH_ENABLED
 
 logger = logging.getLogger(__name__)
 
@@ -15,23 +20,17 @@ class RAGService:
     
     @staticmethod
     def initialize_components():
-        """Initialize RAG components in session state"""
+        """Initialize the per-session RAG state on top of the process-wide vector store"""
         if 'rag_initialized' not in st.session_state:
             try:
-                api_key = RAGService._get_api_key()
-                if not api_key:
-                    return
-                    
-                embeddings = initialize_embeddings(api_key)
-                documents = RAGService._load_documents()
-                if not documents:
-                    return
-                    
-                vector_store = create_vector_store(documents, embeddings)
+                # Las embeddings solo se crean si hay que construir el índice compartido;
+                # sin clave de OpenAI se usa el backend local u Ollama (EMBEDDINGS_PROVIDER)
+                api_key = st.session_state.get('OPENAI_API_KEY')
+                vector_store, sources = RAGService._load_vector_store(lambda: initialize_embeddings(api_key))
                 if not vector_store:
                     return
                     
-                RAGService._initialize_memory_and_state(vector_store, documents)
+                RAGService._initialize_memory_and_state(sources)
                 logger.info("RAG components initialized successfully")
                     
             except Exception as e:
@@ -39,13 +38,15 @@ class RAGService:
                 st.session_state['rag_initialized'] = False
     
     @staticmethod
-    def process_query(question: str, selected_tables: Optional[List[str]] = None) -> Dict:
+    def process_query(question: str, selected_tables: Optional[List[str]] = None,
+                      stage_runner=None) -> Dict:
         """
         Process query using RAG enhancement
         
         Args:
             question (str): The user's question
             selected_tables (Optional[List[str]]): List of selected tables to query
+            stage_runner (Optional[StageRunner]): Request stage runner collecting timings and token usage
         
         Returns:
             Dict: Processed query result with context
@@ -54,14 +55,18 @@ class RAGService:
             if not st.session_state.get('rag_initialized'):
                 return {'question': question, 'error': 'RAG not initialized'}
             
-            context = RAGService._get_relevant_context(question)
+            if stage_runner is not None:
+                context = stage_runner.run("retrieval", RAGService._get_relevant_context, question)
+            else:
+                context = RAGService._get_relevant_context(question)
             chat_history = RAGService._get_chat_history()
             
             query = RAGService._generate_enhanced_query(
                 question, 
                 context, 
                 chat_history, 
-                selected_tables
+                selected_tables,
+                stage_runner
             )
             
             RAGService._update_memory(question, query)
@@ -81,17 +86,49 @@ class RAGService:
             }
     
     @staticmethod
-    def _get_api_key() -> Optional[str]:
-        """Get OpenAI API key from session state"""
-        api_key = st.session_state.get('OPENAI_API_KEY')
-        if not api_key:
-            logger.warning("OpenAI API key not found in session state")
-            st.session_state['rag_initialized'] = False
-        return api_key
+    async def aprocess_query(question: str, selected_tables: Optional[List[str]] = None,
+                             stage_runner=None) -> Dict:
+        """Async variant of process_query; retrieval runs off the event loop and the LLM call is awaited"""
+        try:
+            from ..utils.chatbot.stages import StageRunner
+            
+            if not st.session_state.get('rag_initialized'):
+                return {'question': question, 'error': 'RAG not initialized'}
+            
+            if stage_runner is not None:
+                context = await stage_runner.arun_blocking("retrieval", RAGService._get_relevant_context, question)
+            else:
+                context = await StageRunner.run_in_pool(RAGService._get_relevant_context, question)
+            chat_history = RAGService._get_chat_history()
+            
+            sql_chain = ChainBuilder.build_sql_chain()
+            query = await sql_chain.ainvoke({
+                "question": question,
+                "context": [doc.page_content for doc in context],
+                "chat_history": chat_history,
+                "selected_tables": selected_tables,
+                "stage_runner": stage_runner
+            }, stage_runner.llm_config() if stage_runner else None)
+            
+            RAGService._update_memory(question, query)
+            
+            return {
+                'question': question,
+                'query': query,
+                'context_used': [doc.page_content for doc in context],
+                'chat_history': chat_history
+            }
+            
+        except Exception as e:
+            logger.error(f"Error processing RAG query: {e}")
+            return {
+                'question': question,
+                'error': str(e)
+            }
     
     @staticmethod
-    def _load_documents():
-        """Load documents from the docs directory"""
+    def _load_vector_store(embeddings_factory):
+        """Get the shared vector store, loading or building it on first use in the process"""
         try:
             cwd = Path.cwd()
             docs_path = Path("docs")
@@ -99,43 +136,61 @@ class RAGService:
                 docs_path = cwd / "docs"
             
             logger.info(f"Looking for documents in: {docs_path}")
-            documents = load_documents(docs_path)
+            progress_bar = None
+
+            def _progress(done: int, total: int, name: str):
+                # Solo aparece si hay que cargar documentos para construir el índice
+                nonlocal progress_bar
+                if progress_bar is None:
+                    progress_bar = st.progress(0.0)
+                progress_bar.progress(done / total, text=f"Indexing documents {done}/{total}: {name}")
+
+            vector_store, sources = SharedVectorStore.ensure_loaded(embeddings_factory, docs_path, _progress)
+            if progress_bar is not None:
+                progress_bar.empty()
             
-            if not documents:
-                logger.warning("No documents found, RAG will be disabled")
+            if not vector_store:
+                logger.warning("No documents indexed, RAG will be disabled")
                 st.session_state['rag_initialized'] = False
-                return None
-                
-            return documents
+                return None, []
+
+            # Los cambios posteriores en docs/ se indexan en segundo plano
+            if RAG_WATCH_ENABLED:
+                DocsWatcher.start(docs_path, embeddings_factory)
+            return vector_store, sources
             
         except Exception as e:
-            logger.error(f"Error loading documents: {e}")
+            logger.error(f"Error loading vector store: {e}")
             st.session_state['rag_initialized'] = False
-            return None
+            return None, []
     
     @staticmethod
-    def _initialize_memory_and_state(vector_store, documents):
+    def _initialize_memory_and_state(sources: List[str]):
         """Initialize memory and session state variables"""
-        msgs = StreamlitChatMessageHistory(key="langchain_messages")
-        memory = ConversationBufferMemory(
-            chat_memory=msgs,
-            memory_key="chat_history",
-            return_messages=True
-        )
+        if MEMORY_MODE == "summary":
+            memory = SummaryWindowMemory()
+        else:
+            msgs = StreamlitChatMessageHistory(key="langchain_messages")
+            memory = ConversationBufferMemory(
+                chat_memory=msgs,
+                memory_key="chat_history",
+                return_messages=True
+            )
         
-        st.session_state['vector_store'] = vector_store
         st.session_state['conversation_memory'] = memory
         st.session_state['rag_initialized'] = True
-        st.session_state['docs_loaded'] = [
-            str(doc.metadata.get('source', 'Unknown')) 
-            for doc in documents
-        ]
+        st.session_state['docs_loaded'] = sources
     
     @staticmethod
     def _get_relevant_context(question: str):
         """Get relevant context from vector store"""
-        vector_store = st.session_state.get('vector_store')
-        return vector_store.similarity_search(question, k=3) if vector_store else []
+        documents = SharedVectorStore.similarity_search(question, k=RAG_TOP_K)
+        Trace.annotate(**{
+            "retrieval.k": RAG_TOP_K,
+            "retrieval.mode": RAG_RETRIEVAL_MODE,
+            "retrieval.documents": len(documents)
+        })
+        return documents
     
     @staticmethod
     def _get_chat_history():
@@ -145,23 +200,19 @@ class RAGService:
     
     @staticmethod
     def _generate_enhanced_query(question: str, context: List, 
-                               chat_history: str, selected_tables: Optional[List[str]]) -> str:
+                               chat_history: str, selected_tables: Optional[List[str]],
+                               stage_runner=None) -> str:
         """Generate enhanced SQL query using context"""
-        enhanced_prompt = f"""
-        Based on:
-        - Previous conversation: {chat_history}
-        - Context: {[doc.page_content for doc in context]}
-        - Selected tables: {selected_tables if selected_tables else 'all tables'}
-        - Question: {question}
-        
-        Generate an appropriate SQL query using only the selected tables.
-        """
-        
+        # Context and history are passed as separate segments so the SQL chain
+        # can account for their tokens and trim them to the prompt budget
         sql_chain = ChainBuilder.build_sql_chain()
         return sql_chain.invoke({
-            "question": enhanced_prompt,
-            "selected_tables": selected_tables
-        })
+            "question": question,
+            "context": [doc.page_content for doc in context],
+            "chat_history": chat_history,
+            "selected_tables": selected_tables,
+            "stage_runner": stage_runner
+        }, stage_runner.llm_config() if stage_runner else None)
     
     @staticmethod
     def _update_memory(question: str, query: str):
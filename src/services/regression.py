@@ -0,0 +1,349 @@
+# src/services/regression.py
+import json
+import logging
+import re
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import streamlit as st
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, get_buffer_string
+from langchain_core.outputs import ChatGeneration, ChatResult
+from sqlalchemy import event
+from src.services.benchmark import stage_durations_ms
+from src.utils import database
+from src.utils.chatbot.budget import PromptBudget
+from src.utils.chatbot.memory import SummaryWindowMemory
+from src.utils.chatbot.query import QueryProcessor
+from src.utils.chatbot.suggestions import SuggestionStore
+from src.utils.chatbot.usage import LLM_STAGE_TAGS
+from src.utils.vector_store import SharedVectorStore
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_PROVIDER = "cassette"
+REGRESSION_DIR = Path(__file__).resolve().parents[2] / "regression"
+
+class Cassette:
+    """Recorded LLM calls of one question, replayed in order per stage"""
+
+    def __init__(self, calls: Optional[List[Dict[str, Any]]] = None):
+        self.calls = list(calls or [])
+        self.played: List[Dict[str, Any]] = []
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, prompt: str, response: str, usage: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            call = {"stage": stage, "prompt": prompt, "response": response, "usage": usage}
+            self.calls.append(call)
+            self.played.append(call)
+
+    def play(self, stage: str, prompt: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Get the next recorded response of a stage; calls beyond the recording reuse the last one"""
+        with self._lock:
+            recorded = [call for call in self.calls if call["stage"] == stage]
+            index = self._cursor.get(stage, 0)
+            self._cursor[stage] = index + 1
+            call = recorded[min(index, len(recorded) - 1)] if recorded else None
+            self.played.append({
+                "stage": stage,
+                "prompt": prompt,
+                "recorded": index < len(recorded),
+                "prompt_changed": call is None or call["prompt"] != prompt
+            })
+        if call is None:
+            logger.warning(f"No recorded LLM call for stage '{stage}'")
+            return "", None
+        return call["response"], call["usage"]
+
+class CassetteLLM(BaseChatModel):
+    """
+    Chat model that records or replays LLM calls
+
+    With an inner model every call is forwarded to it and recorded in the
+    cassette; without one the recorded responses are replayed.
+    """
+
+    cassette: Any = None
+    inner: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    @staticmethod
+    def _stage(run_manager) -> str:
+        tags = getattr(run_manager, "tags", None) or []
+        for tag in LLM_STAGE_TAGS:
+            if tag in tags:
+                return tag
+        return "llm"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        stage = self._stage(run_manager)
+        prompt = get_buffer_string(messages)
+        if self.inner is not None:
+            # La etiqueta se reenvía para que el modelo interno sepa la etapa
+            result = self.inner.invoke(messages, config={"tags": [stage]}, stop=stop)
+            content = getattr(result, "content", result)
+            usage = getattr(result, "usage_metadata", None)
+            self.cassette.record(stage, prompt, str(content), dict(usage) if usage else None)
+        else:
+            content, usage = self.cassette.play(stage, prompt)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=str(content), usage_metadata=usage))])
+
+class KeywordStore:
+    """Minimal vector store stand-in that ranks documents by shared words with the question"""
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+
+    @staticmethod
+    def _words(text: str) -> set:
+        return set(re.findall(r"\w{3,}", text.lower()))
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        words = self._words(query)
+        ranked = sorted(self.documents, key=lambda doc: -len(words & self._words(doc.page_content)))
+        return ranked[:k]
+
+class RecordedStore:
+    """Vector store stand-in that returns the context recorded for the question being replayed"""
+
+    def __init__(self, context: List[str]):
+        self.context = context
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [Document(page_content=text) for text in self.context[:k]]
+
+class QueryCounter:
+    """
+    Counts the distinct SQL statements sent through the database module's engines
+
+    Distinct, because stages running concurrently on a cold cache may both issue
+    the same metadata query, which would make a plain count flaky.
+    """
+
+    def __init__(self):
+        self._statements: set = set()
+        self._lock = threading.Lock()
+        self._engines = []
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return len(self._statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self._statements.add((statement, repr(parameters)))
+
+    def attach(self) -> None:
+        engines = [database.engine, getattr(database.db, "_engine", None)]
+        for engine in {id(engine): engine for engine in engines if engine is not None}.values():
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+            self._engines.append(engine)
+
+    def detach(self) -> None:
+        for engine in self._engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+        self._engines = []
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements = set()
+
+def load_golden_set(dataset: str) -> Dict[str, Any]:
+    """Load regression/<dataset>/questions.json"""
+    path = REGRESSION_DIR / dataset / "questions.json"
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def cassette_path(dataset: str) -> Path:
+    return REGRESSION_DIR / dataset / "cassettes.json"
+
+def prompt_tokens(calls: List[Dict[str, Any]], model_name: Optional[str]) -> int:
+    """Tokens of the prompts of a list of calls, counted with the current tokenizer"""
+    return sum(PromptBudget.count_tokens(call["prompt"], model_name) for call in calls)
+
+def run_question(item: Dict[str, Any], cassette: Cassette, counter: QueryCounter,
+                 store: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Run one golden question from a cold state and collect its metrics
+
+    Metadata caches, stored suggestions and conversation memory are reset first,
+    so the metrics of a question don't depend on the ones that ran before it.
+    """
+    database.clear_metadata_caches()
+    SuggestionStore.clear()
+    st.session_state['conversation_memory'] = SummaryWindowMemory()
+    st.session_state['rag_initialized'] = bool(item.get('rag'))
+    st.session_state['rag_enabled'] = bool(item.get('rag'))
+    SharedVectorStore.swap(store)
+    counter.reset()
+
+    start = time.perf_counter()
+    response = QueryProcessor.process_query_and_response(item['question'], item['tables'])
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        "response": response,
+        "llm_calls": len(cassette.played),
+        "prompt_tokens": prompt_tokens(cassette.played, st.session_state.get('llm_model_name')),
+        "db_queries": counter.count,
+        "stage_ms": stage_durations_ms(response, wall_seconds),
+        "failed": response.get('query') is None and not response.get('intent')
+    }
+
+def replay(questions: List[Dict[str, Any]], cassettes: Dict[str, Any], repeat: int = 3) -> Dict[str, Dict[str, Any]]:
+    """
+    Replay every golden question through the pipeline
+
+    Each question runs `repeat` times; counts come from the first run and stage
+    times are the median of all runs, to smooth out scheduling noise.
+    """
+    from src.utils.llm_provider import LLMProvider
+
+    counter = QueryCounter()
+    counter.attach()
+    current: Dict[str, Cassette] = {}
+    LLMProvider.register_provider(
+        CASSETTE_PROVIDER,
+        lambda model_name=None, **kwargs: CassetteLLM(cassette=current["cassette"])
+    )
+    st.session_state['llm_provider'] = CASSETTE_PROVIDER
+    st.session_state['llm_model_name'] = cassettes.get('model')
+
+    results = {}
+    try:
+        # Una pasada sin medir paga los costes únicos del proceso (imports, tokenizer)
+        warmup = next((item for item in questions if item['id'] in cassettes['questions']), None)
+        if warmup is not None:
+            current["cassette"] = Cassette(cassettes['questions'][warmup['id']]['calls'])
+            run_question(warmup, current["cassette"], counter)
+
+        for item in questions:
+            recorded = cassettes['questions'].get(item['id'])
+            if recorded is None:
+                logger.warning(f"Question '{item['id']}' has no cassette, record it first")
+                continue
+
+            runs = []
+            for _ in range(repeat):
+                current["cassette"] = Cassette(recorded['calls'])
+                store = RecordedStore(recorded.get('context', [])) if item.get('rag') else None
+                runs.append((run_question(item, current["cassette"], counter, store), current["cassette"]))
+
+            metrics, cassette = runs[0]
+            stages = {name for run, _ in runs for name in run["stage_ms"]}
+            results[item['id']] = {
+                "llm_calls": metrics["llm_calls"],
+                "prompt_tokens": metrics["prompt_tokens"],
+                "db_queries": metrics["db_queries"],
+                "stage_ms": {
+                    name: round(statistics.median(run["stage_ms"].get(name, 0.0) for run, _ in runs), 3)
+                    for name in sorted(stages)
+                },
+                "unrecorded_calls": sum(not call["recorded"] for call in cassette.played),
+                "changed_prompts": sum(call["prompt_changed"] for call in cassette.played),
+                "failed": metrics["failed"]
+            }
+    finally:
+        counter.detach()
+    return results
+
+def record(questions: List[Dict[str, Any]], inner_factory, model_name: Optional[str],
+           store: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Record the LLM calls (and retrieved context) of every golden question
+
+    Args:
+        questions (List[Dict[str, Any]]): Golden questions
+        inner_factory: Callable returning the real model calls are forwarded to
+        model_name (Optional[str]): Model name, used for prompt budgets when replaying
+        store (Optional[Any]): Vector store for the RAG questions
+    """
+    from src.utils.llm_provider import LLMProvider
+
+    counter = QueryCounter()
+    counter.attach()
+    current: Dict[str, Cassette] = {}
+    LLMProvider.register_provider(
+        CASSETTE_PROVIDER,
+        lambda model_name=None, **kwargs: CassetteLLM(cassette=current["cassette"], inner=inner_factory())
+    )
+    st.session_state['llm_provider'] = CASSETTE_PROVIDER
+    st.session_state['llm_model_name'] = model_name
+
+    recorded = {}
+    try:
+        for item in questions:
+            current["cassette"] = Cassette()
+            metrics = run_question(item, current["cassette"], counter, store if item.get('rag') else None)
+            if metrics["failed"]:
+                logger.error(f"Question '{item['id']}' failed while recording: {metrics['response'].get('response')}")
+            recorded[item['id']] = {
+                "question": item['question'],
+                "calls": current["cassette"].calls,
+                "context": metrics["response"].get('rag_context', [])
+            }
+            logger.info(f"Recorded {len(current['cassette'].calls)} LLM calls for '{item['id']}'")
+    finally:
+        counter.detach()
+
+    return {
+        "model": model_name,
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "questions": recorded
+    }
+
+def baseline_metrics(recorded: Dict[str, Any], model_name: Optional[str]) -> Dict[str, Any]:
+    """
+    Baseline metrics of a recorded question
+
+    LLM calls and prompt tokens come from the recorded calls themselves (tokens
+    are counted with the current tokenizer, so both sides use the same one); DB
+    queries and stage times from the replay stored when the cassette was recorded.
+    """
+    stored = recorded.get("baseline") or {}
+    return {
+        "llm_calls": len(recorded["calls"]),
+        "prompt_tokens": prompt_tokens(recorded["calls"], model_name),
+        "db_queries": stored.get("db_queries", 0),
+        "stage_ms": stored.get("stage_ms", {})
+    }
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], token_tolerance: float = 0.02,
+            time_tolerance: float = 0.5, min_time_delta_ms: float = 25.0) -> List[Dict[str, Any]]:
+    """
+    Compare the replay metrics of a question against its baseline
+
+    Any extra LLM call or DB query is a regression; prompt tokens may grow up to
+    token_tolerance, and a stage only regresses when it is both time_tolerance
+    slower and at least min_time_delta_ms slower than the baseline.
+    """
+    regressions = []
+
+    def flag(metric: str, before: Any, after: Any):
+        regressions.append({"metric": metric, "baseline": before, "current": after})
+
+    if current.get("failed"):
+        flag("failed", False, True)
+    for metric in ("llm_calls", "db_queries"):
+        if current[metric] > baseline[metric]:
+            flag(metric, baseline[metric], current[metric])
+    if current["prompt_tokens"] > baseline["prompt_tokens"] * (1 + token_tolerance):
+        flag("prompt_tokens", baseline["prompt_tokens"], current["prompt_tokens"])
+    if current.get("unrecorded_calls"):
+        flag("unrecorded_calls", 0, current["unrecorded_calls"])
+
+    for stage, ms in current["stage_ms"].items():
+        before = baseline["stage_ms"].get(stage)
+        if before is None:
+            flag(f"stage_ms.{stage}", None, ms)
+        elif ms > before * (1 + time_tolerance) and ms - before >= min_time_delta_ms:
+            flag(f"stage_ms.{stage}", before, ms)
+    return regressions
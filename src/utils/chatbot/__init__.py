@@ -3,11 +3,17 @@ from .prompts import ChatbotPrompts
 from .insights import InsightGenerator
 from .response import ResponseProcessor
 from .query import QueryProcessor
+from .suggestions import SuggestionStore
+from .async_runtime import AsyncRuntime
+from .memory import SummaryWindowMemory
 
 __all__ = [
     'ChainBuilder',
     'ChatbotPrompts',
     'InsightGenerator',
     'ResponseProcessor',
-    'QueryProcessor'
+    'QueryProcessor',
+    'SuggestionStore',
+    'AsyncRuntime',
+    'SummaryWindowMemory'
 ]
\ No newline at end of file
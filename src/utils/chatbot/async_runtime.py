@@ -0,0 +1,34 @@
+from typing import Any, Awaitable
+import asyncio
+import logging
+import threading
+import weakref
+
+logger = logging.getLogger(__name__)
+
+class AsyncRuntime:
+    """Keeps one event loop per worker thread to run the async chatbot pipeline"""
+
+    _local = threading.local()
+
+    @classmethod
+    def get_loop(cls) -> asyncio.AbstractEventLoop:
+        """Get the event loop of the current worker thread, creating it on first use"""
+        loop = getattr(cls._local, "loop", None)
+        if loop is None or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            cls._local.loop = loop
+            # Close the loop together with the thread that owns it
+            weakref.finalize(threading.current_thread(), loop.close)
+            logger.info(f"Created event loop for worker thread '{threading.current_thread().name}'")
+        return loop
+
+    @classmethod
+    def run(cls, awaitable: Awaitable[Any]) -> Any:
+        """
+        Run a coroutine to completion on the worker's event loop
+
+        Many questions can be in flight on the same loop by gathering them in a
+        single coroutine; this is the entry point for synchronous callers.
+        """
+        return cls.get_loop().run_until_complete(awaitable)
@@ -0,0 +1,167 @@
+from typing import Any, Dict, Optional, Tuple
+import logging
+import threading
+from config.config import OPENAI_MODELS, PROMPT_TOKEN_BUDGETS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Prioridad de cada segmento del prompt: los de menor prioridad se recortan primero.
+# Los segmentos con prioridad >= PROTECTED_PRIORITY nunca se recortan.
+SEGMENT_PRIORITIES = {
+    "question": 100,
+    "query": 90,
+    "response": 70,
+    "schema": 60,
+    "chat_history": 50,
+    "context": 40,
+    "insights": 30,
+    "suggestions": 20
+}
+PROTECTED_PRIORITY = 90
+TRUNCATION_MARKER = " [...]"
+
+class PromptBudget:
+    """Measures prompt segments with the model tokenizer and trims them to the model budget"""
+
+    _encodings: Dict[str, Any] = {}
+    _template_tokens: Dict[str, int] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _resolve_model(model_name: Optional[str]) -> str:
+        """Map a configured model key to the provider model id"""
+        if model_info := OPENAI_MODELS.get(model_name or ""):
+            return model_info["model"]
+        return model_name or ""
+
+    @classmethod
+    def _get_encoding(cls, model_name: Optional[str]):
+        """Get the tokenizer for a model, falling back to cl100k_base for unknown models"""
+        if tiktoken is None:
+            return None
+
+        model = cls._resolve_model(model_name)
+        with cls._lock:
+            if model not in cls._encodings:
+                try:
+                    try:
+                        cls._encodings[model] = tiktoken.encoding_for_model(model)
+                    except KeyError:
+                        cls._encodings[model] = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    # tiktoken descarga los encodings la primera vez; sin red usamos la aproximación
+                    logger.warning(f"Tokenizer unavailable for model '{model}', estimating tokens: {str(e)}")
+                    cls._encodings[model] = None
+            return cls._encodings[model]
+
+    @classmethod
+    def count_tokens(cls, text: str, model_name: Optional[str] = None) -> int:
+        """Count the tokens of a text for the given model"""
+        if not text:
+            return 0
+        encoding = cls._get_encoding(model_name)
+        if encoding is None:
+            # Sin tokenizer: aproximación de ~4 caracteres por token
+            return len(text) // 4 + 1
+        return len(encoding.encode(text, disallowed_special=()))
+
+    @classmethod
+    def _truncate(cls, text: str, max_tokens: int, model_name: Optional[str]) -> str:
+        """Cut a text to at most max_tokens tokens"""
+        if max_tokens <= 0:
+            return ""
+        encoding = cls._get_encoding(model_name)
+        if encoding is None:
+            return text[:max_tokens * 4] + TRUNCATION_MARKER
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:max_tokens]) + TRUNCATION_MARKER
+
+    @classmethod
+    def truncate(cls, text: str, max_tokens: int, model_name: Optional[str] = None) -> str:
+        """Cut a text to max_tokens tokens, leaving it untouched if it already fits"""
+        if cls.count_tokens(text, model_name) <= max_tokens:
+            return text
+        return cls._truncate(text, max_tokens - cls.count_tokens(TRUNCATION_MARKER, model_name), model_name)
+
+    @staticmethod
+    def get_model_budget(model_name: Optional[str]) -> int:
+        """Get the prompt token budget configured for a model"""
+        model = PromptBudget._resolve_model(model_name)
+        for key in (model_name, model):
+            if key and key in PROMPT_TOKEN_BUDGETS:
+                return PROMPT_TOKEN_BUDGETS[key]
+        return PROMPT_TOKEN_BUDGETS.get("default", 8000)
+
+    @classmethod
+    def get_template_tokens(cls, prompt_name: str, prompt, model_name: Optional[str] = None) -> int:
+        """Count the fixed part of a prompt template (everything but the variables)"""
+        key = f"{prompt_name}:{cls._resolve_model(model_name)}"
+        if key not in cls._template_tokens:
+            empty = prompt.format(**{var: "" for var in prompt.input_variables})
+            cls._template_tokens[key] = cls.count_tokens(empty, model_name)
+        return cls._template_tokens[key]
+
+    @classmethod
+    def fit(cls, prompt_name: str, segments: Dict[str, Any], template_tokens: int = 0,
+            model_name: Optional[str] = None, budget: Optional[int] = None) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """
+        Measure every prompt segment and trim the lowest-priority ones to fit the budget
+
+        Args:
+            prompt_name (str): Name used in logs and reports
+            segments (Dict[str, Any]): Segment name to content (converted to text)
+            template_tokens (int): Tokens used by the fixed template text
+            model_name (Optional[str]): Model whose tokenizer and budget apply
+            budget (Optional[int]): Override for the model budget
+
+        Returns:
+            Tuple containing:
+            - Dict[str, str]: The segments, trimmed where needed
+            - Dict[str, Any]: Token report with per-segment counts and trims
+        """
+        budget = budget or cls.get_model_budget(model_name)
+        texts = {name: value if isinstance(value, str) else str(value) for name, value in segments.items()}
+        counts = {name: cls.count_tokens(text, model_name) for name, text in texts.items()}
+        total = template_tokens + sum(counts.values())
+
+        trims = []
+        excess = total - budget
+        if excess > 0:
+            trimmable = sorted(
+                (name for name in texts if SEGMENT_PRIORITIES.get(name, 0) < PROTECTED_PRIORITY),
+                key=lambda name: SEGMENT_PRIORITIES.get(name, 0)
+            )
+            for name in trimmable:
+                if excess <= 0:
+                    break
+                if counts[name] == 0:
+                    continue
+                keep = max(counts[name] - excess - cls.count_tokens(TRUNCATION_MARKER, model_name), 0)
+                texts[name] = cls._truncate(texts[name], keep, model_name)
+                new_count = cls.count_tokens(texts[name], model_name)
+                trims.append({"segment": name, "from": counts[name], "to": new_count})
+                excess -= counts[name] - new_count
+                counts[name] = new_count
+
+        report = {
+            "prompt": prompt_name,
+            "model": cls._resolve_model(model_name),
+            "budget": budget,
+            "template_tokens": template_tokens,
+            "segments": counts,
+            "total_tokens": template_tokens + sum(counts.values()),
+            "trims": trims
+        }
+
+        logger.info(f"Prompt '{prompt_name}' tokens: {report['total_tokens']}/{budget} {counts}")
+        if trims:
+            logger.warning(f"Prompt '{prompt_name}' over budget, trimmed: {trims}")
+        if report["total_tokens"] > budget:
+            logger.warning(f"Prompt '{prompt_name}' still exceeds its budget after trimming")
+
+        return texts, report
@@ -0,0 +1,58 @@
+from typing import Any, Dict, List, Optional
+import logging
+from config.config import MODEL_CASCADE, MODEL_CASCADE_ENABLED, MODEL_CASCADE_ESCALATE_EMPTY
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+class ModelCascade:
+    """Decides which model generates the SQL and when to escalate to a stronger one"""
+
+    @staticmethod
+    def get_levels() -> List[Dict[str, str]]:
+        """Get the configured cascade levels, cheapest first"""
+        return MODEL_CASCADE
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Check whether the cascade is on for this session and has something to escalate to"""
+        return bool(st.session_state.get('llm_cascade', MODEL_CASCADE_ENABLED)) and len(MODEL_CASCADE) > 1
+
+    @staticmethod
+    def can_escalate(runner) -> bool:
+        """Check whether the query of this request came from a cascade level below the last one"""
+        current = getattr(runner, "sql_model", None)
+        return current is not None and current["level"] + 1 < len(MODEL_CASCADE)
+
+    @staticmethod
+    def check_confidence(result: Dict[str, Any]) -> Optional[str]:
+        """
+        Flag query results that suggest a wrong query
+
+        A single all-NULL row (e.g. an aggregate over a bad filter) is flagged. No rows
+        at all is a legitimate answer to many questions, so it is only flagged with
+        MODEL_CASCADE_ESCALATE_EMPTY.
+
+        Returns:
+            Optional[str]: Reason for the low confidence, or None
+        """
+        rows = result.get("rows", [])
+        if not rows:
+            return "The query returned no rows" if MODEL_CASCADE_ESCALATE_EMPTY else None
+        if len(rows) == 1 and all(value is None for value in rows[0]):
+            return "The query returned only NULL values"
+        return None
+
+    @staticmethod
+    def record_escalation(runner, from_level: int, reason: str, details: List[str]):
+        """Record an escalation in the request's stage runner"""
+        levels = MODEL_CASCADE
+        escalation = {
+            "from": levels[from_level],
+            "to": levels[from_level + 1] if from_level + 1 < len(levels) else None,
+            "reason": reason,
+            "details": details
+        }
+        logger.warning(f"Escalating SQL generation: {escalation}")
+        if runner is not None:
+            runner.model_escalations.append(escalation)
@@ -1,9 +1,19 @@
-from typing import Any, Dict
-from langchain_core.runnables import RunnablePassthrough
+from typing import Any, AsyncIterator, Dict
+from contextlib import nullcontext
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 import logging
-from ...utils.database import get_schema, run_query
+from ...utils.database import get_schema, fetch_query_result
 from .prompts import ChatbotPrompts
+from .stages import StageRunner
+from .tracing import Trace
+from .summarizer import ResultSummarizer
+from .budget import PromptBudget
+from .layout import PromptLayout
+from .structured import ANSWER_JSON_SCHEMA, AnswerOutputParser
+from .validation import SQLValidator, SQLValidationError
+from .cascade import ModelCascade
+from config.config import SQL_VALIDATION_ENABLED, SQL_VALIDATION_RETRIES, ANSWER_OUTPUT_MODE
 from ...utils.llm_provider import LLMProvider
 import streamlit as st
 
@@ -27,29 +37,171 @@ class ChainBuilder:
         
         return query
 
+    @staticmethod
+    def _build_generate_chain(provider: str, model_name: str):
+        """Build the chain that writes the SQL query with the given model"""
+        prompt = ChatbotPrompts.get_sql_prompt()
+        llm = LLMProvider.get_llm(
+            provider=provider,
+            model_name=model_name,
+            temperature=st.session_state.get('llm_temperature', 0.7)
+        )
+        
+        return (
+            RunnablePassthrough()
+            | RunnableLambda(ChainBuilder._format_sql_input, afunc=ChainBuilder._aformat_sql_input)
+            | prompt
+            | llm.bind(stop=["\nSQLResult:"]).with_config(tags=["sql_generation"])
+            | StrOutputParser()
+            | ChainBuilder._clean_sql_query  # Añadimos el paso de limpieza
+        )
+
     @staticmethod
     def build_sql_chain():
         """Build the SQL generation chain"""
         try:
-            prompt = ChatbotPrompts.get_sql_prompt()
-            llm = LLMProvider.get_llm(
-                provider=st.session_state.get('llm_provider', 'openai'),
-                model_name=st.session_state.get('llm_model_name'),
-                temperature=st.session_state.get('llm_temperature', 0.7)
+            if ModelCascade.is_enabled():
+                # Cheapest model first; the levels' LLMs are only created when reached
+                return RunnableLambda(
+                    ChainBuilder._generate_with_cascade,
+                    afunc=ChainBuilder._agenerate_with_cascade
+                )
+            
+            generate_chain = ChainBuilder._build_generate_chain(
+                st.session_state.get('llm_provider', 'openai'),
+                st.session_state.get('llm_model_name')
             )
+            if not SQL_VALIDATION_ENABLED:
+                return generate_chain
             
-            return (
-                RunnablePassthrough()
-                | ChainBuilder._format_sql_input
-                | prompt
-                | llm.bind(stop=["\nSQLResult:"])
-                | StrOutputParser()
-                | ChainBuilder._clean_sql_query  # Añadimos el paso de limpieza
+            # Validate locally before the query reaches the database
+            return RunnableLambda(
+                lambda vars: ChainBuilder._generate_valid_sql(vars, generate_chain),
+                afunc=lambda vars: ChainBuilder._agenerate_valid_sql(vars, generate_chain)
             )
         except Exception as e:
             logger.error(f"Error building SQL chain: {str(e)}")
             raise
     
+    @staticmethod
+    def _cascade_level_inputs(vars: Dict[str, Any], level: int):
+        """Get the generation chain and inputs for a cascade level"""
+        model = ModelCascade.get_levels()[level]
+        chain = ChainBuilder._build_generate_chain(model["provider"], model["model"])
+        return chain, {**vars, "llm_model_name": model["model"]}
+    
+    @staticmethod
+    def _cascade_failure(vars: Dict[str, Any], level: int, error: Exception) -> None:
+        """Record the escalation after a failed level, or re-raise the error at the last level"""
+        if level + 1 >= len(ModelCascade.get_levels()):
+            raise error
+        if isinstance(error, SQLValidationError):
+            reason, details = "validation", [e["message"] for e in error.errors]
+        else:
+            reason, details = "generation_error", [str(error)]
+        ModelCascade.record_escalation(vars.get("stage_runner"), level, reason, details)
+    
+    @staticmethod
+    def _cascade_success(vars: Dict[str, Any], level: int) -> None:
+        """Remember which level produced the query, so execution failures can escalate from it"""
+        runner = vars.get("stage_runner")
+        if runner is not None:
+            runner.sql_model = {**ModelCascade.get_levels()[level], "level": level}
+    
+    @staticmethod
+    def _generate_with_cascade(vars: Dict[str, Any]) -> str:
+        """Generate a valid query with the cheapest cascade level that manages it"""
+        for level in range(vars.get("model_level", 0), len(ModelCascade.get_levels())):
+            try:
+                chain, level_vars = ChainBuilder._cascade_level_inputs(vars, level)
+                query = ChainBuilder._generate_valid_sql(level_vars, chain)
+            except Exception as e:
+                ChainBuilder._cascade_failure(vars, level, e)
+                continue
+            ChainBuilder._cascade_success(vars, level)
+            return query
+        raise ValueError("No model cascade level available")
+    
+    @staticmethod
+    async def _agenerate_with_cascade(vars: Dict[str, Any]) -> str:
+        """Async variant of _generate_with_cascade"""
+        for level in range(vars.get("model_level", 0), len(ModelCascade.get_levels())):
+            try:
+                chain, level_vars = ChainBuilder._cascade_level_inputs(vars, level)
+                query = await ChainBuilder._agenerate_valid_sql(level_vars, chain)
+            except Exception as e:
+                ChainBuilder._cascade_failure(vars, level, e)
+                continue
+            ChainBuilder._cascade_success(vars, level)
+            return query
+        raise ValueError("No model cascade level available")
+    
+    @staticmethod
+    def _escalation_inputs(vars: Dict[str, Any], query: str, reason: str) -> Dict[str, Any]:
+        """Record an escalation after executing the query and build the inputs for the next level"""
+        runner = vars.get("stage_runner")
+        level = runner.sql_model["level"]
+        ModelCascade.record_escalation(runner, level, "execution", [reason])
+        inputs = ChainBuilder._repair_inputs(vars, query, {"errors": [{"message": reason}]})
+        inputs["model_level"] = level + 1
+        return inputs
+    
+    @staticmethod
+    def _validate_sql(query: str, vars: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate a generated query and record the result in the request's stage runner"""
+        runner = vars.get("stage_runner")
+        selected_tables = vars.get("selected_tables", [])
+        if runner is None:
+            return SQLValidator.validate(query, selected_tables)
+        
+        with runner.timed("sql_validation") as span:
+            validation = SQLValidator.validate(query, selected_tables)
+            span.set_attributes({"sql.valid": validation["valid"], "sql.errors": len(validation["errors"])})
+        runner.sql_validation.append({"query": query, **validation})
+        return validation
+    
+    @staticmethod
+    def _repair_inputs(vars: Dict[str, Any], query: str, validation: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the inputs to regenerate a query, feeding back the validation errors"""
+        question = ChatbotPrompts.get_sql_repair_prompt().format(
+            question=vars["question"],
+            query=query,
+            errors=SQLValidator.format_errors(validation["errors"])
+        )
+        return {**vars, "question": question}
+    
+    @staticmethod
+    def _generate_valid_sql(vars: Dict[str, Any], generate_chain) -> str:
+        """Generate a query and regenerate it with the validation errors until it is valid"""
+        query = generate_chain.invoke(vars)
+        if not SQL_VALIDATION_ENABLED:
+            return query
+        for attempt in range(SQL_VALIDATION_RETRIES + 1):
+            validation = ChainBuilder._validate_sql(query, vars)
+            if validation["valid"]:
+                return query
+            if attempt == SQL_VALIDATION_RETRIES:
+                break
+            logger.info(f"Regenerating invalid SQL query (attempt {attempt + 1}/{SQL_VALIDATION_RETRIES})")
+            query = generate_chain.invoke(ChainBuilder._repair_inputs(vars, query, validation))
+        raise SQLValidationError(query, validation["errors"])
+    
+    @staticmethod
+    async def _agenerate_valid_sql(vars: Dict[str, Any], generate_chain) -> str:
+        """Async variant of _generate_valid_sql; validation may read column metadata, so it runs on the pool"""
+        query = await generate_chain.ainvoke(vars)
+        if not SQL_VALIDATION_ENABLED:
+            return query
+        for attempt in range(SQL_VALIDATION_RETRIES + 1):
+            validation = await StageRunner.run_in_pool(ChainBuilder._validate_sql, query, vars)
+            if validation["valid"]:
+                return query
+            if attempt == SQL_VALIDATION_RETRIES:
+                break
+            logger.info(f"Regenerating invalid SQL query (attempt {attempt + 1}/{SQL_VALIDATION_RETRIES})")
+            query = await generate_chain.ainvoke(ChainBuilder._repair_inputs(vars, query, validation))
+        raise SQLValidationError(query, validation["errors"])
+    
     @staticmethod
     def build_response_chain(sql_chain):
         """Build the response generation chain"""
@@ -61,14 +213,24 @@ class ChainBuilder:
                 temperature=st.session_state.get('llm_temperature', 0.7)
             )
             
+            if ANSWER_OUTPUT_MODE == "structured":
+                # 'answer' is a dict with the narrative and the chart series; the schema is
+                # bound to the raw model, before with_config wraps it
+                llm = LLMProvider.bind_json_schema(llm, "analyst_answer", ANSWER_JSON_SCHEMA)
+                answer_chain = prompt | llm.with_config(tags=["answer_generation"]) | AnswerOutputParser()
+            else:
+                answer_chain = prompt | llm.with_config(tags=["answer_generation"]) | StrOutputParser()
+            
+            # Returns the prompt variables (including the executed query) plus the 'answer'
             return (
-                RunnablePassthrough.assign(query=sql_chain)
-                .assign(schema=ChainBuilder._get_schema)
-                .assign(response=ChainBuilder._run_query)
-                | ChainBuilder._process_response
-                | prompt
-                | llm
-                | StrOutputParser()
+                RunnableLambda(
+                    lambda vars: ChainBuilder._run_stages(vars, sql_chain),
+                    afunc=lambda vars: ChainBuilder._arun_stages(vars, sql_chain)
+                )
+                | RunnableLambda(ChainBuilder._process_response, afunc=ChainBuilder._aprocess_response)
+                | RunnablePassthrough.assign(
+                    answer=ChainBuilder._timed_stage("answer_generation", answer_chain)
+                )
             )
         except Exception as e:
             logger.error(f"Error building response chain: {str(e)}")
@@ -80,55 +242,218 @@ class ChainBuilder:
         try:
             selected_tables = vars.get("selected_tables", [])
             schema = get_schema(selected_tables)
-            table_list = "'" + "','".join(selected_tables) + "'" if selected_tables else "''"
-            return {
+            # Sorted so the same table set always renders the same prompt prefix
+            table_list = "'" + "','".join(sorted(selected_tables)) + "'" if selected_tables else "''"
+            
+            segments = PromptLayout.render({
                 "schema": schema,
-                "question": vars["question"],
-                "table_list": table_list
-            }
+                "context": vars.get("context"),
+                "chat_history": vars.get("chat_history"),
+                "question": vars["question"]
+            })
+            segments = ChainBuilder._fit_budget("sql", ChatbotPrompts.get_sql_prompt(), segments, vars)
+            
+            return {"table_list": table_list, **segments}
         except Exception as e:
             logger.error(f"Error formatting SQL input: {str(e)}")
             raise
     
+    @staticmethod
+    async def _aformat_sql_input(vars: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of _format_sql_input; the schema lookup runs off the event loop"""
+        return await StageRunner.run_in_pool(ChainBuilder._format_sql_input, vars)
+    
+    @staticmethod
+    def _fit_budget(prompt_name: str, prompt, segments: Dict[str, Any], vars: Dict[str, Any]) -> Dict[str, str]:
+        """Fit prompt segments to the model token budget and record the token report"""
+        model_name = vars.get("llm_model_name") or st.session_state.get('llm_model_name')
+        template_tokens = PromptBudget.get_template_tokens(prompt_name, prompt, model_name)
+        segments, report = PromptBudget.fit(prompt_name, segments, template_tokens, model_name)
+        
+        runner = vars.get("stage_runner")
+        if runner is not None:
+            runner.token_usage[prompt_name] = report
+        return segments
+    
     @staticmethod
     def _get_schema(vars: Dict[str, Any]) -> str:
         """Get schema information for selected tables"""
         try:
-            return get_schema(vars.get("selected_tables", []))
+            schema = get_schema(vars.get("selected_tables", []))
+            Trace.annotate(**{"schema.tables": len(vars.get("selected_tables") or []), "schema.chars": len(schema)})
+            return schema
         except Exception as e:
             logger.error(f"Error getting schema: {str(e)}")
             raise
     
     @staticmethod
-    def _run_query(vars: Dict[str, Any]) -> Any:
-        """Execute SQL query"""
+    def _run_query(vars: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute SQL query and return its columns and rows"""
         try:
             query = vars.get("query")
             if not query:
                 raise ValueError("No query provided")
-            return run_query(query)
+            result = fetch_query_result(query)
+            Trace.annotate(**{
+                "db.rows": len(result["rows"]),
+                "db.bytes": sum(len(str(value).encode("utf-8")) for row in result["rows"] for value in row),
+                "db.truncated": result["truncated"]
+            })
+            return result
         except Exception as e:
             logger.error(f"Error running query: {str(e)}")
             raise
     
     @staticmethod
-    def _process_response(vars: Dict[str, Any]) -> Dict[str, Any]:
-        """Process response before final prompt"""
+    def _timed_stage(name: str, runnable) -> RunnableLambda:
+        """Wrap a runnable so its run is recorded by the request's stage runner"""
+        def _run(vars: Dict[str, Any]) -> Any:
+            runner = vars.get("stage_runner")
+            if runner is None:
+                return runnable.invoke(vars)
+            return runner.run(name, runnable.invoke, vars)
+        
+        async def _astream(vars: Dict[str, Any]) -> AsyncIterator[Any]:
+            # An async generator keeps token streaming working through astream
+            runner = vars.get("stage_runner")
+            with runner.timed(name) if runner is not None else nullcontext():
+                async for chunk in runnable.astream(vars):
+                    yield chunk
+        
+        return RunnableLambda(_run, afunc=_astream)
+    
+    @staticmethod
+    def _run_stages(vars: Dict[str, Any], sql_chain) -> Dict[str, Any]:
+        """
+        Run the stages feeding the response prompt concurrently
+        
+        Only SQL generation and execution are on the critical path; schema and
+        insights don't depend on the query result, so they run alongside it.
+        """
         try:
             from .insights import InsightGenerator
+            from .suggestions import SuggestionStore
+            
+            runner = vars.get("stage_runner") or StageRunner()
+            # Sorted so the insights render in the same order for the same table set
+            selected_tables = sorted(vars.get("selected_tables", []))
+            
+            def sql_stage():
+                # Reuse the query generated upstream instead of asking the LLM again
+                query = vars.get("query") or runner.run("sql_generation", sql_chain.invoke, vars)
+                while True:
+                    try:
+                        response = runner.run("sql_execution", ChainBuilder._run_query, {"query": query})
+                        reason = ModelCascade.check_confidence(response)
+                    except Exception as e:
+                        if not ModelCascade.can_escalate(runner):
+                            raise
+                        reason = f"Execution error: {str(e)}"
+                    if reason is None or not ModelCascade.can_escalate(runner):
+                        return query, response
+                    query = runner.run(
+                        "sql_escalation", sql_chain.invoke, ChainBuilder._escalation_inputs(vars, query, reason)
+                    )
             
-            schema_data = InsightGenerator.get_default_insights(vars.get("selected_tables", []))
-            schema_suggestions = InsightGenerator.generate_schema_suggestions(schema_data)
+            def insights_stage():
+                insights = runner.run("insights", InsightGenerator.get_default_insights, selected_tables)
+                suggestions = runner.run("suggestions", SuggestionStore.get_suggestions, selected_tables, insights)
+                return insights, suggestions
             
-            vars["insights"] = schema_data
-            vars["suggestions"] = schema_suggestions
+            results = runner.run_parallel({
+                "sql": sql_stage,
+                "schema": lambda: ChainBuilder._get_schema(vars),
+                "insights_and_suggestions": insights_stage
+            })
+            return ChainBuilder._merge_stage_results(vars, results)
+        except Exception as e:
+            logger.error(f"Error running pipeline stages: {str(e)}")
+            raise
+    
+    @staticmethod
+    async def _arun_stages(vars: Dict[str, Any], sql_chain) -> Dict[str, Any]:
+        """Async variant of _run_stages: LLM calls are awaited, blocking calls run on the shared pool"""
+        try:
+            from .insights import InsightGenerator
+            from .suggestions import SuggestionStore
             
-            if isinstance(vars["response"], str):
-                try:
-                    vars["response"] = eval(vars["response"])
-                except:
-                    pass
+            runner = vars.get("stage_runner") or StageRunner()
+            # Sorted so the insights render in the same order for the same table set
+            selected_tables = sorted(vars.get("selected_tables", []))
+            
+            async def sql_stage():
+                query = vars.get("query") or await runner.arun("sql_generation", sql_chain.ainvoke(vars))
+                while True:
+                    try:
+                        response = await runner.arun_blocking("sql_execution", ChainBuilder._run_query, {"query": query})
+                        reason = ModelCascade.check_confidence(response)
+                    except Exception as e:
+                        if not ModelCascade.can_escalate(runner):
+                            raise
+                        reason = f"Execution error: {str(e)}"
+                    if reason is None or not ModelCascade.can_escalate(runner):
+                        return query, response
+                    query = await runner.arun(
+                        "sql_escalation", sql_chain.ainvoke(ChainBuilder._escalation_inputs(vars, query, reason))
+                    )
+            
+            async def insights_stage():
+                insights = await runner.arun_blocking("insights", InsightGenerator.get_default_insights, selected_tables)
+                suggestions = await runner.arun_blocking(
+                    "suggestions", SuggestionStore.get_suggestions, selected_tables, insights
+                )
+                return insights, suggestions
+            
+            results = await runner.arun_parallel({
+                "sql": sql_stage,
+                "schema": lambda: StageRunner.run_in_pool(ChainBuilder._get_schema, vars),
+                "insights_and_suggestions": insights_stage
+            })
+            return ChainBuilder._merge_stage_results(vars, results)
+        except Exception as e:
+            logger.error(f"Error running pipeline stages: {str(e)}")
+            raise
+    
+    @staticmethod
+    def _merge_stage_results(vars: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge the stage results into the prompt variables"""
+        query, response = results["sql"]
+        insights, suggestions = results["insights_and_suggestions"]
+        return {
+            **vars,
+            "query": query,
+            "response": response,
+            "schema": results["schema"],
+            "insights": insights,
+            "suggestions": suggestions
+        }
+    
+    @staticmethod
+    def _process_response(vars: Dict[str, Any]) -> Dict[str, Any]:
+        """Process response before final prompt"""
+        try:
+            if isinstance(vars["response"], dict):
+                # Keep the prompt size independent of the number of rows returned
+                runner = vars.get("stage_runner") or StageRunner()
+                summary = runner.run("result_summary", ResultSummarizer.summarize, vars["response"])
+                vars["response"] = summary["text"]
+                vars["result_summary"] = {k: v for k, v in summary.items() if k != "text"}
+            
+            segment_names = ["question", "query", "response", "schema", "insights", "suggestions"]
+            segments = ChainBuilder._fit_budget(
+                "response",
+                ChatbotPrompts.get_response_prompt(),
+                PromptLayout.render({name: vars.get(name, "") for name in segment_names}),
+                vars
+            )
+            vars.update(segments)
+            vars["selected_tables"] = ", ".join(sorted(vars.get("selected_tables") or [])) or "(none)"
             return vars
         except Exception as e:
             logger.error(f"Error processing response: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    @staticmethod
+    async def _aprocess_response(vars: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of _process_response (CPU only, runs on the event loop thread)"""
+        return ChainBuilder._process_response(vars)
\ No newline at end of file
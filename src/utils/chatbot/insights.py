@@ -1,8 +1,9 @@
 from typing import List, Dict, Any
 import logging
-from ...utils.database import run_query
+from ...utils.database import get_table_columns, get_table_row_counts
 from .prompts import ChatbotPrompts
 from ...utils.llm_provider import LLMProvider
+from config.config import SUGGESTIONS_LANGUAGE
 import streamlit as st
 
 logger = logging.getLogger(__name__)
@@ -16,56 +17,25 @@ class InsightGenerator:
         Get basic information about selected tables and generate initial summary
         """
         try:
-            columns_data = []
-            for table in selected_tables:
-                try:
-                    query = f"""
-                    SELECT 
-                        COUNT(*) as count,
-                        COALESCE(
-                            (
-                                SELECT GROUP_CONCAT(COLUMN_NAME)
-                                FROM INFORMATION_SCHEMA.COLUMNS
-                                WHERE TABLE_NAME = '{table}'
-                                AND TABLE_SCHEMA = DATABASE()
-                            ),
-                            ''
-                        ) as columns
-                    FROM {table}
-                    """
-                    result = run_query(query)
-                    if result and len(result) > 0:
-                        row = result[0]
-                        count = row[0] if len(row) > 0 else 0
-                        columns = row[1] if len(row) > 1 else ''
-                        
-                        columns_data.append({
-                            "table": table,
-                            "count": count,
-                            "columns": columns.split(',') if columns else []
-                        })
-                    else:
-                        columns_data.append({
-                            "table": table,
-                            "count": 0,
-                            "columns": []
-                        })
-                except Exception as e:
-                    logger.error(f"Error getting info for table {table}: {str(e)}")
-                    columns_data.append({
-                        "table": table,
-                        "count": 0,
-                        "columns": []
-                    })
+            # Metadatos cacheados: evita una consulta COUNT + INFORMATION_SCHEMA por tabla en cada pregunta
+            columns = get_table_columns(selected_tables)
+            counts = get_table_row_counts(selected_tables)
             
-            return columns_data
+            return [
+                {
+                    "table": table,
+                    "count": counts.get(table, 0),
+                    "columns": [column["name"] for column in columns.get(table, [])]
+                }
+                for table in selected_tables
+            ]
 
         except Exception as e:
             logger.error(f"Error getting default insights: {str(e)}")
             return []
 
     @staticmethod
-    def generate_schema_suggestions(schema_data: List[Dict]) -> str:
+    def generate_schema_suggestions(schema_data: List[Dict], language: str = SUGGESTIONS_LANGUAGE) -> str:
         """Generate query suggestions based on schema"""
         try:
             prompt = ChatbotPrompts.get_schema_suggestions_prompt()
@@ -79,12 +49,46 @@ class InsightGenerator:
             from langchain_core.output_parsers import StrOutputParser
             chain = prompt | llm | StrOutputParser()
             
-            suggestions = chain.invoke({"schema_data": str(schema_data)})
+            suggestions = chain.invoke({"schema_data": str(schema_data), "language": language})
             return suggestions
         except Exception as e:
             logger.error(f"Error generating suggestions: {str(e)}")
             return ""
     
+    @staticmethod
+    def generate_schema_suggestions_batch(schema_data_list: List[List[Dict]], language: str = SUGGESTIONS_LANGUAGE,
+                                          max_concurrency: int = 4) -> List[str]:
+        """Generate suggestions for several table sets in one batched LLM call"""
+        try:
+            prompt = ChatbotPrompts.get_schema_suggestions_prompt()
+            
+            llm = LLMProvider.get_llm(
+                provider=st.session_state.get('llm_provider', 'openai'),
+                model_name=st.session_state.get('llm_model_name'),
+                temperature=st.session_state.get('llm_temperature', 0.7)
+            )
+            
+            from langchain_core.output_parsers import StrOutputParser
+            chain = prompt | llm | StrOutputParser()
+            
+            # batch usa el batching nativo del proveedor cuando existe
+            results = chain.batch(
+                [{"schema_data": str(schema_data), "language": language} for schema_data in schema_data_list],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True
+            )
+            suggestions = []
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error generating suggestions: {str(result)}")
+                    suggestions.append("")
+                else:
+                    suggestions.append(result)
+            return suggestions
+        except Exception as e:
+            logger.error(f"Error generating suggestions batch: {str(e)}")
+            return ["" for _ in schema_data_list]
+    
     @staticmethod
     def format_schema_overview(schema_data: List[Dict]) -> str:
         """Format schema information in a readable way"""
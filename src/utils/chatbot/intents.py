@@ -0,0 +1,152 @@
+from typing import Any, Dict, List, Optional
+import logging
+import re
+import unicodedata
+from ...utils.database import get_table_columns, get_table_row_counts
+from .insights import InsightGenerator
+
+logger = logging.getLogger(__name__)
+
+_TABLE = r"(?: (?:(?:en|de|of|in) )?(?:la |the )?(?:tabla |table )?(?P<table>[\w.]+))?"
+
+# (intención, idioma, patrón); el patrón debe cubrir la pregunta completa ya normalizada
+INTENT_PATTERNS = [
+    ("greeting", "es", r"(?:hola|buenas|buenos dias|buenas tardes|buenas noches|saludos)(?: quipu)?(?: que tal| como estas)?"),
+    ("greeting", "en", r"(?:hi|hey|hello|good morning|good afternoon|good evening)(?: quipu)?(?: how are you)?"),
+    ("overview", "es", r"(?:que|cuales) datos (?:hay|tengo|tienes|tenemos)|que puedo (?:preguntar|consultar)|ayuda"),
+    ("overview", "en", r"what data (?:is there|do you have|do i have)|what can i ask|help"),
+    ("list_tables", "es", r"(?:que|cuales) tablas (?:hay|tengo|tienes|existen|estan disponibles|puedo consultar)"
+                          r"|(?:lista|listar|muestra|muestrame|mostrar)(?: las| todas las)? tablas(?: disponibles)?"),
+    ("list_tables", "en", r"(?:what|which) tables (?:are there|are available|do i have|exist|can i query)"
+                          r"|(?:list|show)(?: me)?(?: the| all)?(?: the)? tables"),
+    ("list_columns", "es", r"(?:que|cuales) (?:columnas|campos) (?:hay|tiene|tienen|existen)" + _TABLE),
+    ("list_columns", "es", r"(?:lista|listar|muestra|muestrame|mostrar)(?: las)? (?:columnas|campos)" + _TABLE),
+    ("list_columns", "en", r"(?:what|which) (?:columns|fields) (?:are there|exist|does it have)" + _TABLE),
+    ("list_columns", "en", r"(?:list|show)(?: me)?(?: the)? (?:columns|fields)" + _TABLE),
+    ("list_columns", "en", r"(?:what|which) (?:columns|fields) does(?: the)?(?: table)? (?P<table>[\w.]+) have"),
+    ("row_count", "es", r"cuant[oa]s (?:registros|filas|datos) (?:hay|tiene|tienen|contiene|existen)" + _TABLE),
+    ("row_count", "es", r"(?:numero|cantidad|total) de (?:registros|filas)" + _TABLE),
+    ("row_count", "en", r"how many (?:rows|records) (?:are there|does it have|exist)" + _TABLE),
+    ("row_count", "en", r"(?:number|count) of (?:rows|records)" + _TABLE),
+    ("row_count", "en", r"how many (?:rows|records) does(?: the)?(?: table)? (?P<table>[\w.]+) have"),
+]
+_COMPILED_PATTERNS = [(intent, language, re.compile(pattern)) for intent, language, pattern in INTENT_PATTERNS]
+
+class IntentRouter:
+    """Answers greetings and metadata questions from cached metadata, without the SQL LLM"""
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Lowercase, strip accents and punctuation, and collapse whitespace"""
+        text = unicodedata.normalize("NFKD", question.lower())
+        text = "".join(char for char in text if not unicodedata.combining(char))
+        text = re.sub(r"[^\w\s.]|(?<!\w)\.|\.(?!\w)", " ", text)
+        return " ".join(text.split())
+
+    @staticmethod
+    def classify(question: str, selected_tables: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Match a question against the metadata intent patterns
+
+        Only questions that are entirely a known intent match; anything with
+        extra filters or conditions goes through the normal SQL pipeline.
+
+        Returns:
+            Optional[Dict[str, Any]]: {'intent', 'language', 'tables'} or None
+        """
+        normalized = IntentRouter.normalize(question)
+        for intent, language, pattern in _COMPILED_PATTERNS:
+            match = pattern.fullmatch(normalized)
+            if not match:
+                continue
+
+            tables = list(selected_tables)
+            table = match.groupdict().get("table")
+            if table:
+                known = {t.lower(): t for t in selected_tables}
+                if table not in known:
+                    # Tabla no seleccionada: que la resuelva el pipeline normal
+                    return None
+                tables = [known[table]]
+
+            logger.info(f"Question matched intent '{intent}' ({language})")
+            return {"intent": intent, "language": language, "tables": tables}
+        return None
+
+    @staticmethod
+    def answer(question: str, selected_tables: List[str], match: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the response for a matched intent from cached metadata
+
+        Returns:
+            Dict[str, Any]: Response in the same format as the SQL pipeline
+        """
+        intent, language, tables = match["intent"], match["language"], match["tables"]
+        spanish = language == "es"
+        table_list = "'" + "','".join(tables) + "'" if tables else "''"
+        query = (
+            "SELECT table_name, column_name, data_type FROM information_schema.columns "
+            f"WHERE table_schema = DATABASE() AND table_name IN ({table_list})"
+        )
+        visualization_data = None
+
+        if not tables:
+            response = (
+                "No hay tablas seleccionadas. Selecciona al menos una tabla para empezar."
+                if spanish else "No tables are selected. Select at least one table to get started."
+            )
+        elif intent in ("greeting", "overview"):
+            from .suggestions import SuggestionStore
+
+            schema_data = InsightGenerator.get_default_insights(tables)
+            suggestions = SuggestionStore.get_suggestions(tables, schema_data)
+            overview = InsightGenerator.format_schema_overview(schema_data)
+            if spanish:
+                intro = "¡Hola! " if intent == "greeting" else ""
+                response = f"{intro}Aquí está un resumen de los datos disponibles:\n{overview}"
+                response += f"\nAlgunas preguntas que podrías hacer:\n{suggestions}" if suggestions else ""
+            else:
+                intro = "Hello! " if intent == "greeting" else ""
+                response = f"{intro}Here is an overview of the available data:\n{overview}"
+                response += f"\nSome questions you could ask:\n{suggestions}" if suggestions else ""
+            visualization_data = [
+                {"Categoría": table["table"], "Cantidad": float(table["count"])} for table in schema_data
+            ]
+        elif intent == "list_tables":
+            header = "Tablas seleccionadas:" if spanish else "Selected tables:"
+            response = header + "\n" + "\n".join(f"- {table}" for table in tables)
+            query = "SHOW TABLES"
+        elif intent == "list_columns":
+            columns = get_table_columns(tables)
+            lines = []
+            for table in tables:
+                lines.append(f"{'Tabla' if spanish else 'Table'}: {table}")
+                lines.extend(f"- {column['name']} ({column['type']})" for column in columns.get(table, []))
+            response = "\n".join(lines)
+            visualization_data = [
+                {"Categoría": table, "Cantidad": float(len(columns.get(table, [])))} for table in tables
+            ]
+        else:
+            counts = get_table_row_counts(tables)
+            missing = [table for table in tables if table not in counts]
+            if missing:
+                # Un conteo fallido no es un 0: que lo responda el pipeline SQL
+                raise RuntimeError(f"Could not count rows of {', '.join(missing)}")
+            label = "registros" if spanish else "rows"
+            response = "\n".join(f"- {table}: {counts[table]:,} {label}" for table in tables)
+            query = " UNION ALL ".join(
+                f"SELECT '{table}' AS table_name, COUNT(*) AS row_count FROM `{table}`" for table in tables
+            )
+            visualization_data = [
+                {"Categoría": table, "Cantidad": float(counts[table])} for table in tables
+            ]
+
+        return {
+            'question': question,
+            'response': response,
+            'query': query,
+            'visualization_data': visualization_data,
+            'selected_tables': selected_tables,
+            'schema_overview': None,
+            'intent': intent
+        }
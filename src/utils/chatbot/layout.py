@@ -0,0 +1,76 @@
+from typing import Any, Dict, List, Tuple
+import logging
+import re
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.prompts import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+# Orden de las secciones del prompt, de la más estable a la menos estable. Los
+# proveedores (OpenAI, llama.cpp/Ollama) reutilizan el prefijo común más largo,
+# así que todo lo que cambia en cada pregunta va al final.
+SECTION_ORDER = [
+    "table_list",
+    "selected_tables",
+    "schema",
+    "insights",
+    "suggestions",
+    "context",
+    "chat_history",
+    "query",
+    "response",
+    "question"
+]
+EMPTY_SECTION = "(none)"
+
+class PromptLayout:
+    """Assembles prompts as static rules followed by sections ordered from most to least stable"""
+
+    @staticmethod
+    def build(rules: str, sections: List[Tuple[str, str]], closing: str = "") -> ChatPromptTemplate:
+        """
+        Build a prompt with a fixed layout
+
+        Args:
+            rules (str): Static instructions, sent as the system message
+            sections (List[Tuple[str, str]]): (variable, title) pairs, reordered by SECTION_ORDER
+            closing (str): Static text after the last section (e.g. "Query:")
+
+        Returns:
+            ChatPromptTemplate: Prompt with a system message and a human message
+        """
+        ordered = sorted(sections, key=lambda section: SECTION_ORDER.index(section[0]))
+        body = "\n\n".join(f"{title}:\n{{{name}}}" for name, title in ordered)
+        if closing:
+            body += f"\n\n{closing}"
+        return ChatPromptTemplate.from_messages([
+            # Las reglas son texto fijo: se escapan las llaves (p.ej. ejemplos JSON)
+            ("system", PromptLayout.normalize(rules).replace("{", "{{").replace("}", "}}")),
+            ("human", body)
+        ])
+
+    @staticmethod
+    def normalize(value: Any) -> str:
+        """
+        Render a section value deterministically
+
+        Line endings, trailing spaces and surrounding blank lines are normalized so
+        the same content always produces the same bytes; lists are joined in order.
+        """
+        if value is None:
+            return EMPTY_SECTION
+        if isinstance(value, (list, tuple)):
+            if value and all(isinstance(item, BaseMessage) for item in value):
+                # El repr de los mensajes incluye ids que cambian en cada llamada
+                value = get_buffer_string(list(value))
+            else:
+                value = "\n\n".join(str(item) for item in value)
+        text = str(value).replace("\r\n", "\n").replace("\r", "\n")
+        text = "\n".join(line.rstrip() for line in text.split("\n"))
+        text = re.sub(r"\n{3,}", "\n\n", text).strip()
+        return text or EMPTY_SECTION
+
+    @staticmethod
+    def render(segments: Dict[str, Any]) -> Dict[str, str]:
+        """Normalize every section value of a prompt"""
+        return {name: PromptLayout.normalize(value) for name, value in segments.items()}
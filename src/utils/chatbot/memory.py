@@ -0,0 +1,114 @@
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import threading
+from langchain_core.output_parsers import StrOutputParser
+from .budget import PromptBudget
+from .prompts import ChatbotPrompts
+from .stages import StageRunner
+from ...utils.llm_provider import LLMProvider
+from config.config import MEMORY_MAX_TOKENS, MEMORY_SUMMARY_MAX_TOKENS
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+class SummaryWindowMemory:
+    """
+    Conversation memory with a token-bounded window of recent turns and a rolling summary
+
+    Turns that no longer fit in the window are folded into the summary by a
+    background task, so loading the history never waits for an LLM call and
+    its size stays bounded however long the session gets.
+    """
+
+    def __init__(self, max_tokens: int = MEMORY_MAX_TOKENS, summary_max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _format_turn(turn: Tuple[str, str]) -> str:
+        question, answer = turn
+        return f"Human: {question}\nAI: {answer}"
+
+    def _split_window(self, model_name: Optional[str]) -> Tuple[List[Tuple[str, str]], int]:
+        """Get the newest turns that fit in the window and the number of older turns (caller holds the lock)"""
+        window, used = [], 0
+        for turn in reversed(self.turns):
+            tokens = PromptBudget.count_tokens(self._format_turn(turn), model_name)
+            if window and used + tokens > self.max_tokens:
+                break
+            window.insert(0, turn)
+            used += tokens
+        return window, len(self.turns) - len(window)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        """Get the chat history: the summary of older turns followed by the recent window"""
+        model_name = st.session_state.get('llm_model_name')
+        with self._lock:
+            window, _ = self._split_window(model_name)
+            summary = self.summary
+
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier conversation: {summary}")
+        parts.extend(
+            PromptBudget.truncate(self._format_turn(turn), self.max_tokens, model_name) for turn in window
+        )
+        return {"chat_history": "\n".join(parts)}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]) -> None:
+        """Add a turn and schedule a summary refresh if older turns fell out of the window"""
+        model_name = st.session_state.get('llm_model_name')
+        with self._lock:
+            self.turns.append((str(inputs.get("question", "")), str(outputs.get("answer", ""))))
+            _, evicted = self._split_window(model_name)
+            if not evicted or self._summarizing:
+                return
+            self._summarizing = True
+            pending = self.turns[:evicted]
+            summary = self.summary
+
+        # El hilo de fondo no tiene contexto de Streamlit: se le pasa el modelo
+        provider = st.session_state.get('llm_provider', 'openai')
+        StageRunner.spawn(self._refresh_summary, summary, pending, provider, model_name)
+
+    def _refresh_summary(
+        self, summary: str, pending: List[Tuple[str, str]], provider: str, model_name: Optional[str]
+    ) -> None:
+        """Fold the evicted turns into the summary (runs on the shared pool)"""
+        try:
+            llm = LLMProvider.get_llm(
+                provider=provider,
+                model_name=model_name,
+                temperature=0
+            )
+            chain = ChatbotPrompts.get_memory_summary_prompt() | llm | StrOutputParser()
+            new_summary = chain.invoke({
+                "summary": summary or "(none)",
+                "new_lines": "\n".join(self._format_turn(turn) for turn in pending),
+                "max_tokens": self.summary_max_tokens
+            }).strip()
+            new_summary = PromptBudget.truncate(new_summary, self.summary_max_tokens, model_name)
+
+            with self._lock:
+                # Solo se agregan turnos al final, así que los resumidos siguen al principio
+                self.summary = new_summary
+                self.turns = self.turns[len(pending):]
+            logger.info(f"Conversation summary refreshed with {len(pending)} turns")
+        except Exception as e:
+            logger.error(f"Error refreshing conversation summary: {str(e)}")
+            with self._lock:
+                # Sin resumen se descartan, para que la memoria siga acotada
+                self.turns = self.turns[len(pending):]
+        finally:
+            with self._lock:
+                self._summarizing = False
+
+    def clear(self) -> None:
+        """Forget the conversation"""
+        with self._lock:
+            self.summary = ""
+            self.turns = []
@@ -1,5 +1,7 @@
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 import logging
+from .layout import PromptLayout
+from config.config import ANSWER_OUTPUT_MODE
 
 logger = logging.getLogger(__name__)
 
@@ -9,45 +11,56 @@ class ChatbotPrompts:
     @staticmethod
     def get_sql_prompt() -> ChatPromptTemplate:
         """Get the SQL generation prompt template"""
-        template = """Based on the provided table schema for the selected tables, analyze if the user's question requires a specific SQL query.
-    If it's a greeting or general question, return this SQL query without any markdown or formatting:
-    SELECT table_name, column_name, data_type FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name IN ({table_list})
+        rules = """Based on the provided table schema for the selected tables, analyze if the user's question requires a specific SQL query.
+If it's a greeting or general question, return this SQL query without any markdown or formatting, with the Selected Tables list inside IN (...):
+SELECT table_name, column_name, data_type FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name IN (<Selected Tables>)
 
-    If it's a specific analytical question, write a SQL query that answers it using only the selected tables.
+If it's a specific analytical question, write a SQL query that answers it using only the selected tables.
+Use the relevant documentation and the previous conversation, when provided, to interpret the question.
 
-    Selected Tables Schema:
-    {schema}
+IMPORTANT: Write only the raw SQL query without any markdown formatting, backticks, or 'sql' tags. Return just the query text."""
+        
+        return PromptLayout.build(
+            rules,
+            [
+                ("table_list", "Selected Tables"),
+                ("schema", "Selected Tables Schema"),
+                ("context", "Relevant Documentation"),
+                ("chat_history", "Previous Conversation"),
+                ("question", "Question")
+            ],
+            closing="Query:"
+        )
+    
+    @staticmethod
+    def get_sql_repair_prompt() -> PromptTemplate:
+        """Get the template that asks to fix a query rejected by validation or execution"""
+        template = """{question}
 
-    Question: {question}
+The previous SQL query was rejected:
+{query}
 
-    IMPORTANT: Write only the raw SQL query without any markdown formatting, backticks, or 'sql' tags. Return just the query text.
+Errors:
+{errors}
 
-    Query:"""
+Write a corrected query that fixes these errors, using only the tables and columns in the schema.
+"""
         
-        return ChatPromptTemplate.from_template(template)
+        return PromptTemplate.from_template(template)
     
     @staticmethod
     def get_response_prompt() -> ChatPromptTemplate:
         """Get the response generation prompt template"""
-        template = """You are Quipu AI, a data analyst specialized in exploring and providing insights.
+        rules = """You are Quipu AI, a data analyst specialized in exploring and providing insights.
 Always maintain a professional, analytical tone and focus on data possibilities.
 
-Context:
-- Question: {question}
-- Selected Tables: {selected_tables}
-- Available Schema: {schema}
-- SQL Query Used: {query}
-- Query Results: {response}
-- Schema Insights: {insights}
-- Suggested Analyses: {suggestions}
-
 Response Guidelines:
 1. Greetings/General Questions:
    - Briefly acknowledge (1 sentence max)
    - Share insights about selected tables
    - Focus on data overview for selected tables
    - Suggest concrete analytical questions for these tables
-   
+
 2. Specific Analysis Questions:
    - Provide direct answer with numerical details
    - Add context and patterns
@@ -59,9 +72,45 @@ Important:
 - Minimize casual conversation
 - Focus on metrics, patterns, and insights
 - ALWAYS respond in the same language as the question
-- If sharing numerical results, add them at the end as:
+- If the query results are marked as TRUNCATED, use the column statistics for totals and distributions
+"""
+        if ANSWER_OUTPUT_MODE == "structured":
+            rules += """
+Output format:
+Respond only with a JSON object with these fields:
+- "answer": the full response text
+- "chart_data": the numerical results worth charting, as a list of {"category": string, "value": number}, or an empty list"""
+        else:
+            rules += """- If sharing numerical results, add them at the end as:
 DATA:[("category1",number1),("category2",number2),...]"""
         
+        return PromptLayout.build(
+            rules,
+            [
+                ("selected_tables", "Selected Tables"),
+                ("schema", "Available Schema"),
+                ("insights", "Schema Insights"),
+                ("suggestions", "Suggested Analyses"),
+                ("query", "SQL Query Used"),
+                ("response", "Query Results"),
+                ("question", "Question")
+            ]
+        )
+    
+    @staticmethod
+    def get_memory_summary_prompt() -> ChatPromptTemplate:
+        """Get the prompt that folds older conversation turns into the running summary"""
+        template = """Progressively summarize the conversation between a data analyst assistant and a user.
+Keep the tables, filters, metrics and conclusions that later questions may refer to. Drop greetings and raw SQL details.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+Return the updated summary in at most {max_tokens} tokens."""
+        
         return ChatPromptTemplate.from_template(template)
     
     @staticmethod
@@ -75,6 +124,6 @@ Generate 3 basic analytical questions that could be answered with this data. Foc
 2. Time-based analysis if date fields are available
 3. Category or group comparisons if categorical fields exist
 
-Return just the numbered list in Spanish."""
+Return just the numbered list in {language}."""
         
         return ChatPromptTemplate.from_template(template)
\ No newline at end of file
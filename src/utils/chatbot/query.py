@@ -1,8 +1,12 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
 import logging
 from .chains import ChainBuilder
 from .response import ResponseProcessor
+from .stages import StageRunner
+from .intents import IntentRouter
+from .structured import StructuredAnswer
 from ..database import get_schema, run_query
+from config.config import INTENT_FAST_PATH_ENABLED
 import streamlit as st
 
 logger = logging.getLogger(__name__)
@@ -23,8 +27,12 @@ class QueryProcessor:
             Dict[str, Any]: Processed response with all components
         """
         try:
+            fast_response = QueryProcessor._answer_from_metadata(question, selected_tables)
+            if fast_response is not None:
+                return fast_response
+            
             # Check RAG availability
-            if st.session_state.get('rag_initialized') and st.session_state.get('rag_enabled', True):
+            if QueryProcessor._use_rag():
                 return QueryProcessor._process_with_rag(question, selected_tables)
             else:
                 return QueryProcessor._process_without_rag(question, selected_tables)
@@ -33,6 +41,175 @@ class QueryProcessor:
             logger.error(f"Error processing query: {str(e)}")
             return ResponseProcessor.handle_error_response(question, str(e), selected_tables)
     
+    @staticmethod
+    async def aprocess_query_and_response(question: str, selected_tables: List[str]) -> Dict[str, Any]:
+        """
+        Async variant of process_query_and_response
+        
+        LLM calls are awaited and blocking DB work runs on the shared pipeline
+        pool, so many questions can be in flight on one event loop.
+        """
+        try:
+            fast_response = await StageRunner.run_in_pool(QueryProcessor._answer_from_metadata, question, selected_tables)
+            if fast_response is not None:
+                return fast_response
+            
+            runner = StageRunner()
+            inputs, rag_context = await QueryProcessor._aprepare_inputs(question, selected_tables, runner)
+            
+            full_chain = ChainBuilder.build_response_chain(ChainBuilder.build_sql_chain())
+            result = await runner.arun("response_chain", full_chain.ainvoke(inputs, runner.llm_config()))
+            
+            return QueryProcessor._finalize_response(question, selected_tables, result, runner, rag_context)
+            
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            return ResponseProcessor.handle_error_response(question, str(e), selected_tables)
+    
+    @staticmethod
+    async def astream_query_and_response(question: str, selected_tables: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the answer while it is generated
+        
+        Yields {'type': 'token', 'content': str} events for the answer text and a
+        final {'type': 'response', 'data': Dict} event with the formatted response.
+        """
+        try:
+            fast_response = await StageRunner.run_in_pool(QueryProcessor._answer_from_metadata, question, selected_tables)
+            if fast_response is not None:
+                yield {"type": "token", "content": fast_response["response"]}
+                yield {"type": "response", "data": fast_response}
+                return
+            
+            runner = StageRunner()
+            inputs, rag_context = await QueryProcessor._aprepare_inputs(question, selected_tables, runner)
+            
+            full_chain = ChainBuilder.build_response_chain(ChainBuilder.build_sql_chain())
+            result = {}
+            answer = None
+            streamed = ""
+            with runner.timed("response_chain"):
+                async for chunk in full_chain.astream(inputs, runner.llm_config()):
+                    if "answer" in chunk:
+                        if isinstance(chunk["answer"], dict):
+                            # Structured answers stream as growing partial objects: emit the new text only
+                            answer = chunk["answer"]
+                            text = StructuredAnswer.get_text(answer)
+                            if text.startswith(streamed) and len(text) > len(streamed):
+                                yield {"type": "token", "content": text[len(streamed):]}
+                            streamed = text
+                        else:
+                            answer = (answer or "") + chunk["answer"]
+                            yield {"type": "token", "content": chunk["answer"]}
+                    result.update({key: value for key, value in chunk.items() if key != "answer"})
+            result["answer"] = answer
+            
+            yield {
+                "type": "response",
+                "data": QueryProcessor._finalize_response(question, selected_tables, result, runner, rag_context)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}")
+            yield {
+                "type": "response",
+                "data": ResponseProcessor.handle_error_response(question, str(e), selected_tables)
+            }
+    
+    @staticmethod
+    def _answer_from_metadata(question: str, selected_tables: List[str]) -> Optional[Dict[str, Any]]:
+        """Answer greetings and metadata questions from cached metadata, or None if the question needs SQL"""
+        if not INTENT_FAST_PATH_ENABLED:
+            return None
+        
+        match = IntentRouter.classify(question, selected_tables)
+        if match is None:
+            return None
+        
+        runner = StageRunner()
+        try:
+            response = runner.run("intent_fast_path", IntentRouter.answer, question, selected_tables, match)
+        except Exception as e:
+            # Si falla la vía rápida, se sigue por el pipeline normal
+            logger.error(f"Error answering from metadata: {str(e)}")
+            return None
+        response['stage_timings'] = runner.timings
+        QueryProcessor._finish_trace(runner, question, selected_tables)
+        response['trace'] = runner.trace
+        return response
+    
+    @staticmethod
+    def _use_rag() -> bool:
+        """Check whether RAG is available and enabled for this session"""
+        return bool(st.session_state.get('rag_initialized') and st.session_state.get('rag_enabled', True))
+    
+    @staticmethod
+    async def _aprepare_inputs(question: str, selected_tables: List[str],
+                               runner: StageRunner) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+        """Build the response chain inputs, generating the RAG enhanced query when enabled"""
+        inputs = {
+            "question": question,
+            "selected_tables": selected_tables,
+            "stage_runner": runner
+        }
+        if not QueryProcessor._use_rag():
+            return inputs, None
+        
+        from ...services.rag_service import RAGService
+        
+        rag_response = await runner.arun(
+            "rag_sql_generation",
+            RAGService.aprocess_query(question, selected_tables, runner)
+        )
+        context_used = rag_response.get('context_used', [])
+        st.session_state['last_context'] = context_used
+        inputs["query"] = rag_response.get('query', '')
+        # Si la consulta se escala a otro modelo, se regenera con el mismo contexto
+        inputs["context"] = context_used
+        inputs["chat_history"] = rag_response.get('chat_history')
+        return inputs, context_used
+    
+    @staticmethod
+    def _finalize_response(question: str, selected_tables: List[str], result: Dict[str, Any],
+                           runner: StageRunner, rag_context: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Format the chain result and attach the request metrics"""
+        answer = StructuredAnswer.get_text(result["answer"])
+        if rag_context is not None:
+            # Add RAG indicator to response
+            answer = "🧠 " + answer
+        
+        formatted_response = ResponseProcessor.format_response(
+            question=question,
+            query=result["query"],
+            response=answer,
+            selected_tables=selected_tables,
+            visualization_data=StructuredAnswer.to_visualization_data(result["answer"])
+        )
+        if rag_context is not None:
+            formatted_response['rag_context'] = rag_context
+        formatted_response['stage_timings'] = runner.timings
+        formatted_response['result_summary'] = result.get('result_summary')
+        formatted_response['token_usage'] = runner.token_usage
+        formatted_response['sql_validation'] = runner.sql_validation
+        formatted_response['sql_model'] = runner.sql_model
+        formatted_response['model_escalations'] = runner.model_escalations
+        formatted_response['llm_calls'] = runner.llm_calls
+        QueryProcessor._finish_trace(runner, question, selected_tables, rag_context is not None)
+        formatted_response['trace'] = runner.trace
+        return formatted_response
+    
+    @staticmethod
+    def _finish_trace(runner: StageRunner, question: str, selected_tables: List[str], rag: bool = False):
+        """Describe the request on the root span and close it"""
+        runner.trace.root.set_attributes({
+            "question": question,
+            "tables": sorted(selected_tables or []),
+            "rag": rag,
+            "llm.provider": st.session_state.get('llm_provider'),
+            "llm.model": st.session_state.get('llm_model_name')
+        })
+        runner.trace.finish()
+    
     @staticmethod
     def _process_with_rag(question: str, selected_tables: List[str]) -> Dict[str, Any]:
         """Process query using RAG enhancement"""
@@ -40,29 +217,26 @@ class QueryProcessor:
             #from ...services.rag_service import process_query_with_rag
             from ...services.rag_service import RAGService
             
+            runner = StageRunner()
+            
             # Get RAG enhanced query
-            rag_response = RAGService.process_query(question, selected_tables)
+            rag_response = runner.run("rag_sql_generation", RAGService.process_query, question, selected_tables, runner)
             query = rag_response.get('query', '')
             context_used = rag_response.get('context_used', [])
             st.session_state['last_context'] = context_used
             
             # Generate response using the enhanced query
             full_chain = ChainBuilder.build_response_chain(ChainBuilder.build_sql_chain())
-            full_response = full_chain.invoke({
+            result = runner.run("response_chain", full_chain.invoke, {
                 "question": question,
                 "query": query,
-                "selected_tables": selected_tables
-            })
+                "context": context_used,
+                "chat_history": rag_response.get('chat_history'),
+                "selected_tables": selected_tables,
+                "stage_runner": runner
+            }, runner.llm_config())
             
-            # Add RAG indicator to response
-            full_response = "🧠 " + str(full_response)
-            
-            return ResponseProcessor.format_response(
-                question=question,
-                query=query,
-                response=full_response,
-                selected_tables=selected_tables
-            )
+            return QueryProcessor._finalize_response(question, selected_tables, result, runner, context_used)
             
         except Exception as e:
             logger.error(f"Error in RAG processing: {str(e)}")
@@ -72,27 +246,19 @@ class QueryProcessor:
     def _process_without_rag(question: str, selected_tables: List[str]) -> Dict[str, Any]:
         """Process query without RAG"""
         try:
-            # Generate SQL query
-            sql_chain = ChainBuilder.build_sql_chain()
-            query = sql_chain.invoke({
-                "question": question,
-                "selected_tables": selected_tables
-            })
+            runner = StageRunner()
             
-            # Generate full response
+            # Generate full response; the SQL is generated inside the chain so
+            # that it overlaps with the stages that don't depend on it
+            sql_chain = ChainBuilder.build_sql_chain()
             full_chain = ChainBuilder.build_response_chain(sql_chain)
-            full_response = full_chain.invoke({
+            result = runner.run("response_chain", full_chain.invoke, {
                 "question": question,
-                "query": query,
-                "selected_tables": selected_tables
-            })
+                "selected_tables": selected_tables,
+                "stage_runner": runner
+            }, runner.llm_config())
             
-            return ResponseProcessor.format_response(
-                question=question,
-                query=query,
-                response=full_response,
-                selected_tables=selected_tables
-            )
+            return QueryProcessor._finalize_response(question, selected_tables, result, runner)
             
         except Exception as e:
             logger.error(f"Error in standard processing: {str(e)}")
@@ -111,9 +277,10 @@ class QueryProcessor:
         """
         try:
             from .insights import InsightGenerator
+            from .suggestions import SuggestionStore
             
             schema_data = InsightGenerator.get_default_insights(selected_tables)
-            suggestions = InsightGenerator.generate_schema_suggestions(schema_data)
+            suggestions = SuggestionStore.get_suggestions(selected_tables, schema_data)
             overview = InsightGenerator.format_schema_overview(schema_data)
             
             response = f"""
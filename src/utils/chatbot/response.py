@@ -1,4 +1,5 @@
 from typing import Dict, Any, Tuple, Optional, List
+import ast
 import pandas as pd
 import logging
 import streamlit as st  # Añadimos esta importación
@@ -25,7 +26,7 @@ class ResponseProcessor:
             if "DATA:" not in response:
                 return response, None
                 
-            main_response, data_str = response.split("DATA:")
+            main_response, data_str = response.rsplit("DATA:", 1)
             main_response = main_response.strip()
             data_str = data_str.strip()
             
@@ -33,7 +34,8 @@ class ResponseProcessor:
                 return main_response, None
             
             try:
-                data_list = eval(data_str)
+                # literal_eval only accepts literals, never executes code
+                data_list = ast.literal_eval(data_str)
                 if not isinstance(data_list, (list, tuple)) or not data_list:
                     return main_response, None
                     
@@ -53,7 +55,8 @@ class ResponseProcessor:
     
     @staticmethod
     def format_response(question: str, query: str, response: str, 
-                       selected_tables: List[str]) -> Dict[str, Any]:
+                       selected_tables: List[str],
+                       visualization_data: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Format the final response with all components
         
@@ -62,13 +65,17 @@ class ResponseProcessor:
             query (str): Generated SQL query
             response (str): Raw response from LLM
             selected_tables (List[str]): List of selected tables
+            visualization_data (Optional[List[Dict[str, Any]]]): Chart data from a structured
+                answer; when missing it is extracted from a DATA: line in the response
             
         Returns:
             Dict[str, Any]: Formatted response
         """
         try:
             # Process visualization data
-            main_response, visualization_data = ResponseProcessor.process_visualization_data(response)
+            main_response = response
+            if visualization_data is None:
+                main_response, visualization_data = ResponseProcessor.process_visualization_data(response)
             
             formatted_response = {
                 'question': question,
@@ -0,0 +1,176 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import threading
+import logging
+import time
+from .tracing import Trace
+from config.config import PIPELINE_BACKGROUND_WORKERS, PIPELINE_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+class StageRunner:
+    """Schedules pipeline stages on a shared bounded thread pool and records their timings"""
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _background_executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.token_usage: Dict[str, Dict[str, Any]] = {}
+        self.sql_validation: List[Dict[str, Any]] = []
+        self.sql_model: Optional[Dict[str, Any]] = None
+        self.model_escalations: List[Dict[str, Any]] = []
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.trace = Trace()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        """Get the process-wide pipeline executor, creating it on first use"""
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=PIPELINE_MAX_WORKERS,
+                    thread_name_prefix="pipeline"
+                )
+            return cls._executor
+
+    @classmethod
+    def get_background_executor(cls) -> ThreadPoolExecutor:
+        """Get the process-wide executor of background jobs, separate from the pipeline stages"""
+        with cls._executor_lock:
+            if cls._background_executor is None:
+                cls._background_executor = ThreadPoolExecutor(
+                    max_workers=PIPELINE_BACKGROUND_WORKERS,
+                    thread_name_prefix="background"
+                )
+            return cls._background_executor
+
+    @staticmethod
+    def _bind_context(func: Callable[[], Any]) -> Callable[[], Any]:
+        """Bind the caller's Streamlit session and context variables to a callable"""
+        script_ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+        context = contextvars.copy_context()
+
+        def _run():
+            if script_ctx is not None:
+                add_script_run_ctx(threading.current_thread(), script_ctx)
+            return context.run(func)
+
+        return _run
+
+    def llm_config(self) -> Dict[str, Any]:
+        """Runnable config that records the provider token usage of every LLM call in this request"""
+        from .usage import LLMUsageCallback
+        return {"callbacks": [LLMUsageCallback(self)]}
+
+    def record_llm_call(self, call: Dict[str, Any]):
+        """Record the usage of one LLM call (called from worker threads too)"""
+        with self._lock:
+            self.llm_calls.append(call)
+
+    @contextmanager
+    def timed(self, name: str):
+        """Record the wall time of a block under the given stage name, as a span of the request trace"""
+        start = time.perf_counter()
+        try:
+            with self.trace.span(name) as span:
+                yield span
+        finally:
+            elapsed = round(time.perf_counter() - start, 3)
+            with self._lock:
+                self.timings[name] = elapsed
+            logger.info(f"Stage '{name}' finished in {elapsed:.3f}s")
+
+    def run(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a stage on the calling thread and record its timing"""
+        with self.timed(name):
+            return func(*args, **kwargs)
+
+    def submit(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """Schedule a stage on the shared pool and record its timing when it finishes"""
+        return StageRunner.get_executor().submit(
+            StageRunner._bind_context(lambda: self.run(name, func, *args, **kwargs))
+        )
+
+    @staticmethod
+    def spawn(func: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Schedule a background task outside of any request timing
+
+        Background jobs are slow LLM calls, so they run on their own small pool: a
+        request's stages never queue behind them.
+        """
+        return StageRunner.get_background_executor().submit(
+            StageRunner._bind_context(lambda: func(*args, **kwargs))
+        )
+
+    def run_parallel(self, stages: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """
+        Run independent stages concurrently and collect their results
+
+        The first stage runs on the calling thread, so it should be the one on
+        the critical path; the rest are scheduled on the shared pool.
+
+        Args:
+            stages (Dict[str, Callable[[], Any]]): Stage name to zero-argument callable
+
+        Returns:
+            Dict[str, Any]: Stage name to stage result
+        """
+        if not stages:
+            return {}
+
+        names = list(stages)
+        futures = {name: self.submit(name, stages[name]) for name in names[1:]}
+
+        results = {}
+        try:
+            results[names[0]] = self.run(names[0], stages[names[0]])
+        except Exception:
+            # Don't leave background stages running unobserved
+            wait(futures.values())
+            raise
+
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"Error in stage '{name}': {str(e)}")
+                raise
+
+        return results
+
+    async def arun(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Await a stage on the event loop and record its timing"""
+        with self.timed(name):
+            return await awaitable
+
+    @staticmethod
+    async def run_in_pool(func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable on the shared pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            StageRunner.get_executor(),
+            StageRunner._bind_context(lambda: func(*args, **kwargs))
+        )
+
+    async def arun_blocking(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking stage (DB, schema...) on the shared pool and record its timing"""
+        return await self.arun(name, StageRunner.run_in_pool(func, *args, **kwargs))
+
+    async def arun_parallel(self, stages: Dict[str, Callable[[], Awaitable[Any]]]) -> Dict[str, Any]:
+        """Async counterpart of run_parallel: await independent stages concurrently"""
+        names = list(stages)
+        results = await asyncio.gather(*(self.arun(name, stages[name]()) for name in names))
+        return dict(zip(names, results))
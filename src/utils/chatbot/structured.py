@@ -0,0 +1,82 @@
+from typing import Any, Dict, List, Optional
+import logging
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import Generation
+from langchain_core.utils.json import parse_json_markdown
+
+logger = logging.getLogger(__name__)
+
+# Esquema de la respuesta estructurada; sirve tanto para OpenAI (json_schema
+# estricto) como para Ollama (format), por eso todos los campos son obligatorios.
+ANSWER_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {"type": "string"},
+        "chart_data": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string"},
+                    "value": {"type": "number"}
+                },
+                "required": ["category", "value"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["answer", "chart_data"],
+    "additionalProperties": False
+}
+
+class AnswerOutputParser(JsonOutputParser):
+    """
+    Tolerant parser for the structured answer
+
+    Parses partial JSON while the answer streams, accepts JSON wrapped in
+    markdown fences, and falls back to treating the output as plain answer
+    text when the model ignored the format.
+    """
+
+    def parse_result(self, result: List[Generation], *, partial: bool = False) -> Any:
+        text = result[0].text.strip()
+        if not text.startswith(("{", "`")):
+            return {"answer": text, "chart_data": None}
+        try:
+            parsed = parse_json_markdown(text)
+        except Exception:
+            if partial:
+                return None
+            logger.warning("Structured answer is not valid JSON, using it as plain text")
+            return {"answer": text, "chart_data": None}
+        if not isinstance(parsed, dict):
+            return None if partial else {"answer": text, "chart_data": None}
+        return parsed
+
+    @property
+    def _type(self) -> str:
+        return "answer_output_parser"
+
+class StructuredAnswer:
+    """Helpers to read the structured answer produced by the response chain"""
+
+    @staticmethod
+    def get_text(answer: Any) -> str:
+        """Get the narrative text of a structured or plain text answer"""
+        if isinstance(answer, dict):
+            return str(answer.get("answer") or "")
+        return str(answer or "")
+
+    @staticmethod
+    def to_visualization_data(answer: Any) -> Optional[List[Dict[str, Any]]]:
+        """Convert the typed chart series to the visualization format, skipping malformed points"""
+        if not isinstance(answer, dict) or not isinstance(answer.get("chart_data"), list):
+            return None
+
+        visualization_data = []
+        for point in answer["chart_data"]:
+            try:
+                visualization_data.append({"Categoría": str(point["category"]), "Cantidad": float(point["value"])})
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Skipping malformed chart point: {point}")
+        return visualization_data or None
@@ -0,0 +1,203 @@
+from typing import Dict, List, Optional, Any
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from ...utils.database import get_schema_version
+from .insights import InsightGenerator
+from .stages import StageRunner
+from config.config import CACHE_DIR, SUGGESTIONS_LANGUAGE
+
+logger = logging.getLogger(__name__)
+
+class SuggestionStore:
+    """Persistent store of the analytical suggestions generated for each table set"""
+
+    _lock = threading.Lock()
+    _entries: Optional[Dict[str, Dict[str, Any]]] = None
+    _refreshing: set = set()
+
+    @staticmethod
+    def _store_path() -> Path:
+        return Path(CACHE_DIR) / "schema_suggestions.json"
+
+    @staticmethod
+    def _make_key(selected_tables: List[str], language: str) -> str:
+        """Build the store key for a table set and language"""
+        raw = ",".join(sorted(selected_tables)) + "|" + language
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _load(cls) -> Dict[str, Dict[str, Any]]:
+        """Load the entries from disk once per process (caller must hold the lock)"""
+        if cls._entries is None:
+            try:
+                path = cls._store_path()
+                cls._entries = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+            except Exception as e:
+                logger.error(f"Error loading suggestion store: {str(e)}")
+                cls._entries = {}
+        return cls._entries
+
+    @classmethod
+    def _save(cls, key: str, entry: Dict[str, Any]):
+        """Persist a single entry, writing the file atomically"""
+        with cls._lock:
+            entries = cls._load()
+            entries[key] = entry
+            try:
+                path = cls._store_path()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.error(f"Error saving suggestion store: {str(e)}")
+
+    @classmethod
+    def _store(cls, selected_tables: List[str], language: str, schema_version: str, suggestions: str):
+        """Store freshly generated suggestions (empty results are not stored)"""
+        if not suggestions:
+            return
+        cls._save(cls._make_key(selected_tables, language), {
+            "tables": sorted(selected_tables),
+            "language": language,
+            "schema_version": schema_version,
+            "suggestions": suggestions,
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+        logger.info(f"Stored suggestions for tables {sorted(selected_tables)} (schema {schema_version})")
+
+    @classmethod
+    def refresh(cls, selected_tables: List[str], language: str = SUGGESTIONS_LANGUAGE,
+                schema_data: Optional[List[Dict]] = None) -> str:
+        """Generate the suggestions for a table set and store them"""
+        schema_version = get_schema_version(selected_tables)
+        if schema_version is None:
+            # Sin el esquema completo las sugerencias saldrían de datos parciales
+            logger.warning(f"Skipping suggestions for tables {sorted(selected_tables)}: schema unavailable")
+            return ""
+        if schema_data is None:
+            schema_data = InsightGenerator.get_default_insights(selected_tables)
+
+        suggestions = InsightGenerator.generate_schema_suggestions(schema_data, language)
+        cls._store(selected_tables, language, schema_version, suggestions)
+        return suggestions
+
+    @classmethod
+    def refresh_many(cls, table_sets: List[List[str]], language: str = SUGGESTIONS_LANGUAGE,
+                     max_concurrency: int = 4) -> int:
+        """Generate and store the missing or outdated suggestions of several table sets in one batch"""
+        pending = []
+        for selected_tables in table_sets:
+            key = cls._make_key(selected_tables, language)
+            with cls._lock:
+                entry = cls._load().get(key)
+            schema_version = get_schema_version(selected_tables)
+            if schema_version is None:
+                continue
+            if entry is None or entry.get("schema_version") != schema_version:
+                pending.append((selected_tables, schema_version))
+
+        if not pending:
+            return 0
+
+        schema_data_list = [InsightGenerator.get_default_insights(tables) for tables, _ in pending]
+        results = InsightGenerator.generate_schema_suggestions_batch(schema_data_list, language, max_concurrency)
+        for (selected_tables, schema_version), suggestions in zip(pending, results):
+            cls._store(selected_tables, language, schema_version, suggestions)
+        return len(pending)
+
+    @classmethod
+    def refresh_in_background(cls, selected_tables: List[str], language: str = SUGGESTIONS_LANGUAGE):
+        """Schedule a refresh unless one is already running for the same key"""
+        key = cls._make_key(selected_tables, language)
+        with cls._lock:
+            if key in cls._refreshing:
+                return
+            cls._refreshing.add(key)
+
+        def _refresh():
+            try:
+                cls.refresh(selected_tables, language)
+            except Exception as e:
+                logger.error(f"Error refreshing suggestions: {str(e)}")
+            finally:
+                with cls._lock:
+                    cls._refreshing.discard(key)
+
+        StageRunner.spawn(_refresh)
+
+    @classmethod
+    def get_suggestions(cls, selected_tables: List[str], schema_data: Optional[List[Dict]] = None,
+                        language: str = SUGGESTIONS_LANGUAGE) -> str:
+        """
+        Get the stored suggestions for a table set
+
+        Up-to-date entries are returned as is. Entries for an older schema version
+        are returned too, while a background refresh replaces them. Only a table set
+        that was never seen before pays for the LLM call, and only if no refresh is
+        already generating it (then there are no suggestions for this answer).
+        """
+        try:
+            if not selected_tables:
+                return ""
+
+            key = cls._make_key(selected_tables, language)
+            with cls._lock:
+                entry = cls._load().get(key)
+                # Ya se están generando (p.ej. el prefetch al seleccionar las tablas): no se repite la llamada
+                generating = entry is None and key in cls._refreshing
+                if entry is None and not generating:
+                    cls._refreshing.add(key)
+
+            if generating:
+                return ""
+            if entry is None:
+                try:
+                    return cls.refresh(selected_tables, language, schema_data)
+                finally:
+                    with cls._lock:
+                        cls._refreshing.discard(key)
+
+            schema_version = get_schema_version(selected_tables)
+            if schema_version is not None and entry.get("schema_version") != schema_version:
+                logger.info(f"Schema changed for tables {sorted(selected_tables)}, refreshing suggestions")
+                cls.refresh_in_background(selected_tables, language)
+
+            return entry.get("suggestions", "")
+        except Exception as e:
+            logger.error(f"Error getting stored suggestions: {str(e)}")
+            return ""
+
+    @classmethod
+    def clear(cls):
+        """Forget every stored suggestion, in memory and on disk"""
+        with cls._lock:
+            cls._entries = {}
+            try:
+                cls._store_path().unlink(missing_ok=True)
+            except Exception as e:
+                logger.error(f"Error clearing suggestion store: {str(e)}")
+
+    @classmethod
+    def prefetch(cls, selected_tables: List[str], language: str = SUGGESTIONS_LANGUAGE):
+        """Make sure suggestions for a table set are computed before the first question"""
+        try:
+            if not selected_tables:
+                return
+
+            key = cls._make_key(selected_tables, language)
+            with cls._lock:
+                entry = cls._load().get(key)
+
+            schema_version = get_schema_version(selected_tables)
+            if schema_version is None:
+                return
+            if entry is None or entry.get("schema_version") != schema_version:
+                cls.refresh_in_background(selected_tables, language)
+        except Exception as e:
+            logger.error(f"Error prefetching suggestions: {str(e)}")
@@ -0,0 +1,136 @@
+from typing import Any, Dict, List
+from collections import Counter
+from decimal import Decimal
+import logging
+from .budget import PromptBudget
+from config.config import RESULT_ROW_LIMIT, RESULT_TOKEN_BUDGET, RESULT_TOP_K
+
+logger = logging.getLogger(__name__)
+
+# Longitud máxima de una celda de texto en el resumen
+MAX_CELL_CHARS = 100
+
+class ResultSummarizer:
+    """Compacts query results into a bounded text block for the answer prompt"""
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Count the tokens of a text with the prompt tokenizer"""
+        return PromptBudget.count_tokens(text)
+
+    @staticmethod
+    def _format_cell(value: Any) -> str:
+        if value is None:
+            return "NULL"
+        text = str(value).replace("\n", " ").replace("|", "/")
+        if len(text) > MAX_CELL_CHARS:
+            text = text[:MAX_CELL_CHARS - 3] + "..."
+        return text
+
+    @staticmethod
+    def _format_table(columns: List[str], rows: List[tuple]) -> str:
+        """Format rows as a compact pipe-separated table"""
+        lines = [" | ".join(columns)]
+        lines.extend(" | ".join(ResultSummarizer._format_cell(v) for v in row) for row in rows)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _is_number(value: Any) -> bool:
+        return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+    @staticmethod
+    def _format_number(value: float) -> str:
+        return f"{value:,.2f}".rstrip("0").rstrip(".")
+
+    @staticmethod
+    def _column_statistics(name: str, values: List[Any], top_k: int) -> str:
+        """Describe one column: totals and distribution for numbers, top values otherwise"""
+        non_null = [v for v in values if v is not None]
+        nulls = len(values) - len(non_null)
+        null_info = f", nulls={nulls}" if nulls else ""
+
+        if not non_null:
+            return f"- {name}: all values NULL"
+
+        if all(ResultSummarizer._is_number(v) for v in non_null):
+            numbers = sorted(float(v) for v in non_null)
+            count = len(numbers)
+            total = sum(numbers)
+            quartiles = [numbers[min(count - 1, int(count * q))] for q in (0.25, 0.5, 0.75)]
+            fmt = ResultSummarizer._format_number
+            return (
+                f"- {name} (numeric): count={count}, total={fmt(total)}, "
+                f"min={fmt(numbers[0])}, max={fmt(numbers[-1])}, mean={fmt(total / count)}, "
+                f"p25={fmt(quartiles[0])}, median={fmt(quartiles[1])}, p75={fmt(quartiles[2])}{null_info}"
+            )
+
+        counts = Counter(ResultSummarizer._format_cell(v) for v in non_null)
+        top_values = ", ".join(f"{value} ({count})" for value, count in counts.most_common(top_k))
+        stats = f"- {name}: distinct={len(counts)}, top {min(top_k, len(counts))}: {top_values}{null_info}"
+        try:
+            stats += f", min={ResultSummarizer._format_cell(min(non_null))}, max={ResultSummarizer._format_cell(max(non_null))}"
+        except TypeError:
+            pass
+        return stats
+
+    @staticmethod
+    def summarize(result: Dict[str, Any], row_limit: int = RESULT_ROW_LIMIT,
+                  token_budget: int = RESULT_TOKEN_BUDGET, top_k: int = RESULT_TOP_K) -> Dict[str, Any]:
+        """
+        Summarize a query result so its size doesn't depend on the number of rows
+
+        Args:
+            result (Dict[str, Any]): Output of fetch_query_result ('columns', 'rows', 'truncated')
+            row_limit (int): Maximum rows sent verbatim
+            token_budget (int): Approximate token budget for the whole text
+            top_k (int): Most frequent values reported per text column
+
+        Returns:
+            Dict[str, Any]: 'text', 'truncated', 'total_rows' and 'shown_rows'
+        """
+        try:
+            columns = result.get("columns", [])
+            rows = result.get("rows", [])
+            total_rows = len(rows)
+            fetch_truncated = result.get("truncated", False)
+
+            if not rows:
+                return {"text": "No rows returned.", "truncated": False, "total_rows": 0, "shown_rows": 0}
+
+            full_table = ResultSummarizer._format_table(columns, rows) if total_rows <= row_limit else None
+            if (full_table is not None and not fetch_truncated
+                    and ResultSummarizer.estimate_tokens(full_table) <= token_budget):
+                return {"text": full_table, "truncated": False, "total_rows": total_rows, "shown_rows": total_rows}
+
+            # Statistics cover every fetched row, the sample only the first ones
+            statistics = "\n".join(
+                ResultSummarizer._column_statistics(name, [row[i] for row in rows], top_k)
+                for i, name in enumerate(columns)
+            )
+            rows_label = f"at least {total_rows}" if fetch_truncated else str(total_rows)
+
+            shown_rows = min(row_limit, total_rows)
+            while True:
+                header = (
+                    f"[TRUNCATED RESULT: showing the first {shown_rows} of {rows_label} rows; "
+                    f"the statistics cover all {total_rows} fetched rows]"
+                )
+                text = "\n".join([
+                    header,
+                    ResultSummarizer._format_table(columns, rows[:shown_rows]),
+                    "",
+                    "Column statistics:",
+                    statistics
+                ])
+                if ResultSummarizer.estimate_tokens(text) <= token_budget or shown_rows == 0:
+                    break
+                shown_rows //= 2
+
+            if ResultSummarizer.estimate_tokens(text) > token_budget:
+                text = text[:token_budget * 4] + "\n[...]"
+
+            return {"text": text, "truncated": True, "total_rows": total_rows, "shown_rows": shown_rows}
+
+        except Exception as e:
+            logger.error(f"Error summarizing query result: {str(e)}")
+            raise
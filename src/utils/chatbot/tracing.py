@@ -0,0 +1,210 @@
+from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+import contextvars
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "chatbot-sql-analyst"
+# Códigos de estado y tipo de span de OTLP
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+SPAN_KIND_INTERNAL = 1
+
+# Span activo en el hilo o tarea actual; StageRunner copia el contexto a los
+# hilos del pool, así que los spans de los workers cuelgan del span que los lanzó
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("chatbot_current_span", default=None)
+
+class Span:
+    """A timed operation of a request trace, with attributes and a parent span"""
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent = parent
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def set_error(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = str(error)
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.perf_counter_ns()
+            if self.status == STATUS_UNSET:
+                self.status = STATUS_OK
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return round((self.end_ns - self.start_ns) / 1e6, 3)
+
+class Trace:
+    """
+    Spans recorded while answering one question
+
+    Every question gets a trace id and a root span; stages open nested spans
+    with Trace.span (or StageRunner.timed) and code deeper in the pipeline adds
+    attributes to whatever span is active with Trace.annotate.
+    """
+
+    def __init__(self, name: str = "question", attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = os.urandom(16).hex()
+        # Marca de tiempo absoluta para exportar; las duraciones usan el reloj monotónico
+        self._epoch_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self.spans: List[Span] = []
+        self.root = self.start_span(name, parent=None, attributes=attributes)
+
+    def start_span(self, name: str, parent: Optional[Span] = None,
+                   attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """Start a span that the caller ends explicitly (e.g. from callbacks)"""
+        span = Span(self, name, parent, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def current_span(self) -> Span:
+        """Get the active span of this trace in the calling context, or the root span"""
+        span = _current_span.get()
+        return span if span is not None and span.trace is self else self.root
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        """Record a block as a child of the active span"""
+        span = self.start_span(name, self.current_span(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            span.end()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Un generador asíncrono puede terminar en otro contexto
+                _current_span.set(span.parent)
+            self._extend_root(span)
+
+    def _extend_root(self, span: Span) -> None:
+        # Spans posteriores al cierre (p.ej. el renderizado del gráfico) amplían la raíz
+        root = self.root
+        if span is not root and root.end_ns is not None and span.end_ns > root.end_ns:
+            root.end_ns = span.end_ns
+
+    def end_span(self, span: Span) -> None:
+        """End a span started with start_span"""
+        span.end()
+        self._extend_root(span)
+
+    def finish(self) -> None:
+        """End the root span"""
+        self.root.end()
+
+    @staticmethod
+    def annotate(**attributes: Any) -> None:
+        """Add attributes to the active span, if any (no-op outside a traced request)"""
+        span = _current_span.get()
+        if span is not None:
+            span.set_attributes(attributes)
+
+    def _unix_ns(self, perf_ns: int) -> int:
+        return self._epoch_ns + (perf_ns - self._perf_ns)
+
+    def waterfall(self) -> List[Dict[str, Any]]:
+        """Spans depth first (children under their parent, in start order) with their offset from the start"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_ns)
+
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in spans:
+            children.setdefault(span.parent.span_id if span.parent is not None else None, []).append(span)
+
+        ordered = []
+        stack = [(span, 0) for span in reversed(children.get(None, []))]
+        while stack:
+            span, depth = stack.pop()
+            ordered.append((span, depth))
+            stack.extend((child, depth + 1) for child in reversed(children.get(span.span_id, [])))
+
+        rows = []
+        for span, depth in ordered:
+            end_ns = span.end_ns if span.end_ns is not None else time.perf_counter_ns()
+            rows.append({
+                "name": span.name,
+                "depth": depth,
+                "start_ms": round((span.start_ns - self.root.start_ns) / 1e6, 3),
+                "duration_ms": round((end_ns - span.start_ns) / 1e6, 3),
+                "status": "error" if span.status == STATUS_ERROR else "ok",
+                "attributes": dict(span.attributes)
+            })
+        return rows
+
+    @staticmethod
+    def _otlp_value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            # OTLP/JSON codifica los enteros de 64 bits como cadenas
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        if isinstance(value, (list, tuple)):
+            return {"arrayValue": {"values": [Trace._otlp_value(item) for item in value]}}
+        return {"stringValue": str(value)}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Export the trace as an OTLP/JSON ExportTraceServiceRequest"""
+        with self._lock:
+            spans = list(self.spans)
+
+        otlp_spans = []
+        for span in spans:
+            end_ns = span.end_ns if span.end_ns is not None else time.perf_counter_ns()
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent.span_id if span.parent is not None else "",
+                "name": span.name,
+                "kind": SPAN_KIND_INTERNAL,
+                "startTimeUnixNano": str(self._unix_ns(span.start_ns)),
+                "endTimeUnixNano": str(self._unix_ns(end_ns)),
+                "attributes": [
+                    {"key": key, "value": Trace._otlp_value(value)}
+                    for key, value in span.attributes.items() if value is not None
+                ],
+                "status": {"code": span.status}
+            }
+            if span.status_message:
+                otlp_span["status"]["message"] = span.status_message
+            otlp_spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]
+                },
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": otlp_spans
+                }]
+            }]
+        }
@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import logging
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Etiquetas con las que ChainBuilder marca sus LLMs
+LLM_STAGE_TAGS = ("sql_generation", "answer_generation")
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """Records the token usage reported by the provider for every LLM call of a request, one span per call"""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self._spans: Dict[UUID, Any] = {}
+
+    @staticmethod
+    def _stage(tags: Optional[List[str]]) -> str:
+        for tag in tags or []:
+            if tag in LLM_STAGE_TAGS:
+                return tag
+        return "llm"
+
+    @staticmethod
+    def extract_usage(response) -> Dict[str, Any]:
+        """
+        Read prompt, completion and cached prompt tokens from an LLM result
+
+        OpenAI reports cached prompt tokens (automatic prefix caching); Ollama
+        only reports the prompt tokens it had to evaluate, which drop when the
+        KV cache of a previous prompt with the same prefix is reused.
+        """
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        message = getattr(generation, "message", None)
+        usage_metadata = getattr(message, "usage_metadata", None)
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        info = getattr(generation, "generation_info", None) or {}
+
+        usage = {"prompt_tokens": None, "completion_tokens": None, "cached_tokens": None}
+        if usage_metadata:
+            usage["prompt_tokens"] = usage_metadata.get("input_tokens")
+            usage["completion_tokens"] = usage_metadata.get("output_tokens")
+            usage["cached_tokens"] = (usage_metadata.get("input_token_details") or {}).get("cache_read")
+        elif token_usage:
+            usage["prompt_tokens"] = token_usage.get("prompt_tokens")
+            usage["completion_tokens"] = token_usage.get("completion_tokens")
+            usage["cached_tokens"] = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        elif "prompt_eval_count" in info:
+            usage["evaluated_prompt_tokens"] = info.get("prompt_eval_count")
+            usage["completion_tokens"] = info.get("eval_count")
+        return usage
+
+    def _start_span(self, serialized: Optional[Dict[str, Any]], run_id: UUID,
+                    tags: Optional[List[str]], invocation_params: Optional[Dict[str, Any]]) -> None:
+        trace = self.runner.trace
+        params = invocation_params or {}
+        self._spans[run_id] = trace.start_span(
+            f"llm.{self._stage(tags)}",
+            trace.current_span(),
+            {
+                "llm.model": params.get("model_name") or params.get("model"),
+                "llm.provider": (serialized or {}).get("name")
+            }
+        )
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID,
+                     tags: Optional[List[str]] = None, invocation_params: Optional[Dict[str, Any]] = None,
+                     **kwargs: Any) -> None:
+        self._start_span(serialized, run_id, tags, invocation_params)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            tags: Optional[List[str]] = None, invocation_params: Optional[Dict[str, Any]] = None,
+                            **kwargs: Any) -> None:
+        self._start_span(serialized, run_id, tags, invocation_params)
+
+    def on_llm_end(self, response, *, run_id: Optional[UUID] = None, tags: Optional[List[str]] = None,
+                   **kwargs: Any) -> None:
+        try:
+            call = {"stage": self._stage(tags), **self.extract_usage(response)}
+            self.runner.record_llm_call(call)
+            span = self._spans.pop(run_id, None)
+            if span is not None:
+                span.set_attributes({f"llm.{key}": value for key, value in call.items() if key != "stage"})
+                self.runner.trace.end_span(span)
+            logger.info(f"LLM call '{call['stage']}' usage: {call}")
+        except Exception as e:
+            logger.debug(f"Unable to record LLM usage: {str(e)}")
+
+    def on_llm_error(self, error: BaseException, *, run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.set_error(error)
+            self.runner.trace.end_span(span)
@@ -0,0 +1,227 @@
+from typing import Any, Dict, List, Optional
+import difflib
+import logging
+import re
+import time
+from ...utils.database import get_table_columns
+
+logger = logging.getLogger(__name__)
+
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:
+    sqlglot = None
+    exp = None
+
+# Esquemas del sistema que se pueden consultar sin seleccionarlos (p.ej. la consulta de saludo)
+SYSTEM_SCHEMAS = {"information_schema", "performance_schema", "mysql", "sys"}
+READ_ONLY_KEYWORDS = {"SELECT", "WITH", "SHOW", "DESCRIBE", "DESC", "EXPLAIN"}
+WRITE_KEYWORDS_PATTERN = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|REPLACE|MERGE|CREATE|DROP|ALTER|TRUNCATE|RENAME|GRANT|REVOKE|LOCK|CALL|SET|LOAD)\b"
+    r"|\bINTO\s+(OUTFILE|DUMPFILE)\b",
+    re.IGNORECASE
+)
+# Lecturas con bloqueo: son SELECT, pero bloquean filas de la base de datos de producción
+LOCKING_READ_PATTERN = re.compile(r"\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b", re.IGNORECASE)
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+
+class SQLValidationError(ValueError):
+    """Raised when a generated query can't be made valid before execution"""
+
+    def __init__(self, query: str, errors: List[Dict[str, Any]]):
+        self.query = query
+        self.errors = errors
+        super().__init__("Invalid SQL query: " + "; ".join(error["message"] for error in errors))
+
+class SQLValidator:
+    """Checks generated SQL against the cached table metadata before it reaches the database"""
+
+    @staticmethod
+    def _error(code: str, message: str, identifier: Optional[str] = None) -> Dict[str, Any]:
+        return {"code": code, "message": message, "identifier": identifier}
+
+    @staticmethod
+    def _did_you_mean(name: str, candidates: List[str]) -> str:
+        """Suggest the closest known identifier, if any"""
+        matches = difflib.get_close_matches(name, candidates, n=1, cutoff=0.6)
+        return f" (did you mean '{matches[0]}'?)" if matches else ""
+
+    @staticmethod
+    def _locking_read_error() -> Dict[str, Any]:
+        return SQLValidator._error(
+            "not_read_only", "Locking reads (FOR UPDATE, FOR SHARE, LOCK IN SHARE MODE) are not allowed"
+        )
+
+    @staticmethod
+    def format_errors(errors: List[Dict[str, Any]]) -> str:
+        """Format validation errors as a bullet list for the repair prompt"""
+        return "\n".join(f"- {error['message']}" for error in errors)
+
+    @staticmethod
+    def validate(query: str, selected_tables: List[str]) -> Dict[str, Any]:
+        """
+        Validate a SQL query locally
+
+        Checks that the query is a single read-only statement, that it parses,
+        and that every table and column it references exists in the selected
+        tables. Column metadata comes from the schema cache, so no query is sent
+        to the database.
+
+        Args:
+            query (str): SQL query to validate
+            selected_tables (List[str]): Tables the query may use
+
+        Returns:
+            Dict[str, Any]: 'valid', 'errors' ({'code', 'message', 'identifier'}),
+            'tables' referenced and 'elapsed_ms'
+        """
+        start = time.perf_counter()
+        if not query or not query.strip().rstrip(";").strip():
+            errors, tables = [SQLValidator._error("empty_query", "The query is empty")], []
+        elif sqlglot is None:
+            errors, tables = SQLValidator._validate_statement_text(query), []
+        else:
+            errors, tables = SQLValidator._validate_parsed(query, selected_tables)
+
+        result = {
+            "valid": not errors,
+            "errors": errors,
+            "tables": tables,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+        if errors:
+            logger.warning(f"SQL validation failed: {[error['message'] for error in errors]}")
+        return result
+
+    @staticmethod
+    def _validate_statement_text(query: str) -> List[Dict[str, Any]]:
+        """Statement-level checks used when sqlglot is not installed (no identifier resolution)"""
+        text = STRING_LITERAL_PATTERN.sub("''", query).strip().rstrip(";")
+        if ";" in text:
+            return [SQLValidator._error("multiple_statements", "Only a single SQL statement is allowed")]
+
+        if LOCKING_READ_PATTERN.search(text):
+            return [SQLValidator._locking_read_error()]
+
+        first_keyword = text.split(None, 1)[0].upper() if text.split() else ""
+        if first_keyword not in READ_ONLY_KEYWORDS or WRITE_KEYWORDS_PATTERN.search(text):
+            return [SQLValidator._error("not_read_only", "Only read-only queries (SELECT) are allowed")]
+        return []
+
+    @staticmethod
+    def _validate_parsed(query: str, selected_tables: List[str]):
+        """Parse the query with sqlglot and resolve its identifiers against the table metadata"""
+        try:
+            statements = [s for s in sqlglot.parse(query, read="mysql") if s is not None]
+        except sqlglot.errors.ParseError as e:
+            message = str(e).splitlines()[0] if str(e) else "Unable to parse the query"
+            return [SQLValidator._error("syntax_error", f"Syntax error: {message}")], []
+
+        if len(statements) != 1:
+            return [SQLValidator._error("multiple_statements", "Only a single SQL statement is allowed")], []
+
+        statement = statements[0]
+        read_only_types = (exp.Select, exp.Union, exp.Intersect, exp.Except, exp.Subquery, exp.Show, exp.Describe)
+        write_types = tuple(
+            getattr(exp, name) for name in
+            ("Insert", "Update", "Delete", "Merge", "Create", "Drop", "Alter", "TruncateTable", "Command", "Into")
+            if hasattr(exp, name)
+        )
+        if not isinstance(statement, read_only_types) or statement.find(*write_types) is not None:
+            return [SQLValidator._error("not_read_only", "Only read-only queries (SELECT) are allowed")], []
+
+        if any(select.args.get("locks") for select in statement.find_all(exp.Select)):
+            return [SQLValidator._locking_read_error()], []
+
+        if isinstance(statement, (exp.Show, exp.Describe)):
+            return [], []
+
+        return SQLValidator._resolve_identifiers(statement, selected_tables)
+
+    @staticmethod
+    def _resolve_identifiers(statement, selected_tables: List[str]):
+        """Check tables and columns; derived tables and CTEs are only checked by name"""
+        errors = []
+        known_tables = {table.lower(): table for table in selected_tables}
+        cte_names = {cte.alias_or_name.lower() for cte in statement.find_all(exp.CTE)}
+
+        # Alias (o nombre) de cada fuente -> tabla real, o None si sus columnas no se conocen
+        sources: Dict[str, Optional[str]] = {}
+        referenced = []
+        for table in statement.find_all(exp.Table):
+            name = table.name
+            alias = (table.alias or name).lower()
+            if table.db and table.db.lower() in SYSTEM_SCHEMAS:
+                sources[alias] = None
+            elif not table.db and name.lower() in cte_names:
+                sources[alias] = None
+            elif name.lower() in known_tables:
+                sources[alias] = known_tables[name.lower()]
+                referenced.append(known_tables[name.lower()])
+            else:
+                errors.append(SQLValidator._error(
+                    "unknown_table",
+                    f"Table '{name}' is not one of the selected tables"
+                    + SQLValidator._did_you_mean(name, selected_tables),
+                    name
+                ))
+                sources[alias] = None
+        for subquery in statement.find_all(exp.Subquery):
+            if subquery.alias:
+                sources[subquery.alias.lower()] = None
+        for name in cte_names:
+            sources.setdefault(name, None)
+
+        referenced = sorted(set(referenced))
+        columns = get_table_columns(referenced)
+        table_columns = {
+            table: {column["name"].lower(): column["name"] for column in columns[table]}
+            for table in referenced if columns.get(table)
+        }
+        has_opaque_sources = any(source is None for source in sources.values())
+        output_aliases = {alias.alias.lower() for alias in statement.find_all(exp.Alias) if alias.alias}
+
+        reported = set()
+        for column in statement.find_all(exp.Column):
+            if isinstance(column.this, exp.Star):
+                continue
+            name = column.name
+            qualifier = column.table.lower()
+            key = (qualifier, name.lower())
+            if not name or key in reported:
+                continue
+
+            if qualifier:
+                if qualifier not in sources:
+                    errors.append(SQLValidator._error(
+                        "unknown_table", f"Table or alias '{column.table}' is not defined in the query", column.table
+                    ))
+                    reported.add(key)
+                    continue
+                table = sources[qualifier]
+                if table is None or table not in table_columns:
+                    continue
+                if name.lower() not in table_columns[table]:
+                    errors.append(SQLValidator._error(
+                        "unknown_column",
+                        f"Column '{name}' does not exist in table '{table}'"
+                        + SQLValidator._did_you_mean(name, list(table_columns[table].values())),
+                        f"{table}.{name}"
+                    ))
+                    reported.add(key)
+                continue
+
+            if name.lower() in output_aliases or has_opaque_sources or not table_columns:
+                continue
+            if not any(name.lower() in names for names in table_columns.values()):
+                candidates = [c for names in table_columns.values() for c in names.values()]
+                errors.append(SQLValidator._error(
+                    "unknown_column",
+                    f"Column '{name}' does not exist in tables {sorted(table_columns)}"
+                    + SQLValidator._did_you_mean(name, candidates),
+                    name
+                ))
+                reported.add(key)
+
+        return errors, referenced
@@ -1,9 +1,15 @@
 # src/utils/database.py
 
-from config.config import MYSQL_USER, MYSQL_PASSWORD, MYSQL_HOST, MYSQL_DATABASE
+from config.config import (
+    MYSQL_USER, MYSQL_PASSWORD, MYSQL_HOST, MYSQL_DATABASE,
+    SCHEMA_CACHE_TTL, RESULT_MAX_FETCH_ROWS
+)
 from langchain_community.utilities import SQLDatabase
 import os
-from typing import List, Dict, Optional
+import time
+import hashlib
+import threading
+from typing import List, Dict, Optional, Any
 from sqlalchemy import text, create_engine, inspect
 import logging
 import mysql.connector
@@ -55,6 +61,29 @@ except Exception as e:
     db = None
     engine = None
 
+def configure_database(uri: str) -> None:
+    """
+    Point the module at another database (e.g. the SQLite database of the benchmark)
+    
+    Replaces the connections used by every helper of this module and clears the
+    metadata caches, which belong to the previous database.
+    """
+    global db, engine
+    db = SQLDatabase.from_uri(uri)
+    engine = create_engine(uri)
+    clear_metadata_caches()
+    logger.info(f"Database connections configured for {engine.url.render_as_string(hide_password=True)}")
+
+def clear_metadata_caches() -> None:
+    """Forget the cached columns, row counts and schemas of every table"""
+    for cache, lock in (
+        (_columns_cache, _columns_cache_lock),
+        (_row_count_cache, _row_count_cache_lock),
+        (_schema_cache, _schema_cache_lock)
+    ):
+        with lock:
+            cache.clear()
+
 def get_ignored_tables() -> List[str]:
     """Get list of tables to ignore from environment variable"""
     ignored_tables = os.getenv('IGNORED_TABLES', '')
@@ -74,6 +103,92 @@ def get_all_tables() -> List[str]:
         logger.error(f"Error getting tables: {str(e)}")
         return []
 
+# Cache de metadatos por tabla: {table: (timestamp, columns)}
+_columns_cache: Dict[str, tuple] = {}
+_columns_cache_lock = threading.Lock()
+
+def get_table_columns(selected_tables: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Get column metadata for the selected tables, cached for SCHEMA_CACHE_TTL seconds
+    
+    Returns:
+    --------
+    Dict[str, List[Dict[str, str]]]
+        Table name to list of {'name', 'type'} column entries
+    """
+    result = {}
+    now = time.time()
+    try:
+        for table in selected_tables:
+            with _columns_cache_lock:
+                cached = _columns_cache.get(table)
+            if cached and now - cached[0] < SCHEMA_CACHE_TTL:
+                result[table] = cached[1]
+                continue
+            
+            if not engine:
+                raise Exception("Database engine not initialized")
+            
+            columns = [
+                {"name": column["name"], "type": str(column["type"])}
+                for column in inspect(engine).get_columns(table)
+            ]
+            with _columns_cache_lock:
+                _columns_cache[table] = (now, columns)
+            result[table] = columns
+        return result
+    except Exception as e:
+        logger.error(f"Error getting table columns: {str(e)}")
+        return result
+
+def get_schema_version(selected_tables: List[str]) -> Optional[str]:
+    """
+    Get a short hash identifying the current structure of the selected tables
+
+    Returns None when the columns of some table could not be read: a hash of the
+    partial metadata would look like a schema change.
+    """
+    columns = get_table_columns(selected_tables)
+    missing = [table for table in selected_tables if table not in columns]
+    if missing:
+        logger.warning(f"Schema version unavailable, could not read columns of {', '.join(missing)}")
+        return None
+    signature = ";".join(
+        f"{table}:" + ",".join(f"{c['name']} {c['type']}" for c in columns.get(table, []))
+        for table in sorted(selected_tables)
+    )
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()[:16]
+
+# Cache de conteo de filas por tabla: {table: (timestamp, count)}
+_row_count_cache: Dict[str, tuple] = {}
+_row_count_cache_lock = threading.Lock()
+
+def get_table_row_counts(selected_tables: List[str]) -> Dict[str, int]:
+    """Get the row count of each selected table, cached for SCHEMA_CACHE_TTL seconds"""
+    result = {}
+    now = time.time()
+    for table in selected_tables:
+        with _row_count_cache_lock:
+            cached = _row_count_cache.get(table)
+        if cached and now - cached[0] < SCHEMA_CACHE_TTL:
+            result[table] = cached[1]
+            continue
+        
+        try:
+            rows = fetch_query_result(f"SELECT COUNT(*) FROM `{table}`", max_rows=1)["rows"]
+            count = int(rows[0][0]) if rows else 0
+        except Exception as e:
+            logger.error(f"Error counting rows for table {table}: {str(e)}")
+            continue
+        with _row_count_cache_lock:
+            _row_count_cache[table] = (now, count)
+        result[table] = count
+    return result
+
+# Cache del esquema por conjunto de tablas: {tables: (timestamp, schema_info)}
+_schema_cache: Dict[str, tuple] = {}
+_schema_cache_lock = threading.Lock()
+
 def get_schema(selected_tables: Optional[List[str]] = None) -> str:
     """
     Get schema information for selected tables
@@ -96,8 +211,17 @@ def get_schema(selected_tables: Optional[List[str]] = None) -> str:
         if not selected_tables:
             return "No tables available for querying."
         
+        # Reutilizar el esquema mientras no expire, p.ej. entre preguntas de un lote
+        cache_key = ",".join(sorted(selected_tables))
+        with _schema_cache_lock:
+            cached = _schema_cache.get(cache_key)
+        if cached and time.time() - cached[0] < SCHEMA_CACHE_TTL:
+            return cached[1]
+        
         logger.info(f"Getting schema for tables: {selected_tables}")
-        schema_info = db.get_table_info(table_names=selected_tables)
+        schema_info = db.get_table_info(table_names=sorted(selected_tables))
+        with _schema_cache_lock:
+            _schema_cache[cache_key] = (time.time(), schema_info)
         return schema_info
     except Exception as e:
         logger.error(f"Error getting schema information: {str(e)}")
@@ -112,6 +236,38 @@ def run_query(query: str) -> List[tuple]:
         result = db.run(query)
         logger.info(f"Query executed successfully")
         return result
+    except Exception as e:
+        logger.error(f"Error executing query: {str(e)}")
+        raise
+
+def fetch_query_result(query: str, max_rows: int = RESULT_MAX_FETCH_ROWS) -> Dict[str, Any]:
+    """
+    Execute SQL query and return its rows with column names
+    
+    Returns:
+    --------
+    Dict[str, Any]
+        'columns', 'rows' and 'truncated' (True when more than max_rows rows were available)
+    """
+    try:
+        if not engine:
+            raise Exception("Database engine not initialized")
+        
+        with engine.connect() as connection:
+            result = connection.execute(text(query))
+            if not result.returns_rows:
+                return {"columns": [], "rows": [], "truncated": False}
+            
+            columns = list(result.keys())
+            rows = [tuple(row) for row in result.fetchmany(max_rows + 1)]
+        
+        truncated = len(rows) > max_rows
+        logger.info(f"Query executed successfully ({len(rows)} rows fetched)")
+        return {
+            "columns": columns,
+            "rows": rows[:max_rows],
+            "truncated": truncated
+        }
     except Exception as e:
         logger.error(f"Error executing query: {str(e)}")
         raise
\ No newline at end of file
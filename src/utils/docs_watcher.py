@@ -0,0 +1,180 @@
+# src/utils/docs_watcher.py
+from typing import Callable, Dict, Optional, Tuple
+from pathlib import Path
+import logging
+import threading
+import time
+from .document_loader import list_document_files
+from .rag_utils import hash_document_files, load_or_create_vector_store, read_manifest
+from .vector_store import SharedVectorStore
+from config.config import RAG_WATCH_DEBOUNCE, RAG_WATCH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class DocsWatcher:
+    """
+    Process-wide background watcher of the documents directory
+
+    A daemon thread polls the file list with modification times and sizes. Once the
+    changes settle for RAG_WATCH_DEBOUNCE seconds it updates the index (incrementally
+    when only documents changed) and swaps it into SharedVectorStore, so the rebuild
+    never runs on a request and queries keep using the previous index until the swap.
+    """
+
+    _lock = threading.Lock()
+    _thread: Optional[threading.Thread] = None
+    _stop = threading.Event()
+    _docs_path: Optional[Path] = None
+    _embeddings_factory: Optional[Callable] = None
+    rebuilds = 0
+    failures = 0
+
+    @staticmethod
+    def _snapshot(docs_path: Path) -> Dict[str, Tuple[int, int]]:
+        """Relative path -> (mtime_ns, size) of the loadable documents"""
+        files = {}
+        for name in list_document_files(docs_path):
+            try:
+                stat = (docs_path / name).stat()
+            except OSError:
+                # Borrado entre el listado y el stat: lo verá la siguiente pasada
+                continue
+            files[name] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    @staticmethod
+    def _matches_index(docs_path: Path) -> bool:
+        """Whether the document contents are the ones recorded in the saved index manifest"""
+        manifest = read_manifest()
+        return manifest is not None and manifest.get("files") == hash_document_files(docs_path)
+
+    @classmethod
+    def start(cls, docs_path: Path, embeddings_factory: Optional[Callable] = None) -> bool:
+        """
+        Start watching docs_path; later calls while the watcher runs do nothing
+
+        Args:
+            docs_path (Path): Documents directory indexed by SharedVectorStore
+            embeddings_factory (Optional[Callable]): Returns the embeddings for a rebuild
+                when the published store has none
+
+        Returns:
+            bool: True if this call started the thread
+        """
+        with cls._lock:
+            if cls._thread is not None and cls._thread.is_alive():
+                return False
+            cls._docs_path = Path(docs_path)
+            cls._embeddings_factory = embeddings_factory
+            cls._stop.clear()
+            cls._thread = threading.Thread(target=cls._run, name="rag-docs-watcher", daemon=True)
+            cls._thread.start()
+        logger.info(f"Watching {docs_path} for document changes every {RAG_WATCH_INTERVAL}s")
+        return True
+
+    @classmethod
+    def stop(cls, timeout: Optional[float] = None):
+        """Stop the watcher thread"""
+        with cls._lock:
+            thread = cls._thread
+            cls._stop.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    @classmethod
+    def is_running(cls) -> bool:
+        with cls._lock:
+            return cls._thread is not None and cls._thread.is_alive()
+
+    @classmethod
+    def _run(cls):
+        docs_path = cls._docs_path
+        # La referencia es el manifiesto del índice publicado, no el arranque del hilo:
+        # lo editado entre la carga del índice y este punto también se indexa
+        seen = cls._snapshot(docs_path)
+        indexed, changed_at = seen, None
+        try:
+            if not cls._matches_index(docs_path):
+                indexed, changed_at = None, time.monotonic() - RAG_WATCH_DEBOUNCE
+        except OSError as e:
+            logger.warning(f"Could not compare {docs_path} with the saved index: {e}")
+        while not cls._stop.wait(RAG_WATCH_INTERVAL):
+            try:
+                current = cls._snapshot(docs_path)
+            except OSError as e:
+                logger.warning(f"Could not scan {docs_path}: {e}")
+                continue
+            # Cada cambio reinicia la espera: una copia de varios ficheros se indexa una sola vez
+            if current != seen:
+                seen, changed_at = current, time.monotonic()
+                continue
+            if current == indexed or changed_at is None:
+                continue
+            if time.monotonic() - changed_at < RAG_WATCH_DEBOUNCE:
+                continue
+            if cls.refresh(docs_path):
+                indexed = current
+            # Si falla se reintenta tras el siguiente cambio o la siguiente espera completa
+            changed_at = time.monotonic()
+
+    @classmethod
+    def refresh(cls, docs_path: Path) -> bool:
+        """
+        Update the index of docs_path and swap it into SharedVectorStore
+
+        The published store is left untouched: the update reads its own copy of the
+        saved index. If the update fails the current store keeps serving.
+
+        Returns:
+            bool: True if the index is up to date: a new index (or the lack of one when no
+            documents are left) was published, or the contents turned out to be unchanged.
+            False if it failed or some file could not be loaded, so the caller retries
+        """
+        store, _, version = SharedVectorStore.snapshot()
+        embeddings = getattr(store, "embedding_function", None)
+        if embeddings is None and cls._embeddings_factory is None:
+            logger.warning("Documents changed but there are no embeddings to rebuild the index with")
+            return False
+
+        start = time.perf_counter()
+        # El mismo lock que ensure_loaded: nunca hay dos construcciones a la vez
+        with SharedVectorStore._build_lock:
+            try:
+                if SharedVectorStore.version() != version:
+                    store = SharedVectorStore.get()
+                    embeddings = getattr(store, "embedding_function", None) or embeddings
+                if embeddings is None:
+                    embeddings = cls._embeddings_factory()
+                manifest = read_manifest()
+                new_store, sources, errors = load_or_create_vector_store(docs_path, embeddings)
+            except Exception as e:
+                cls.failures += 1
+                logger.error(f"Error updating the vector store after document changes, keeping the current one: {e}")
+                return False
+
+            if new_store is None and list_document_files(docs_path):
+                cls.failures += 1
+                logger.error("Vector store update produced no index, keeping the current one")
+                return False
+            if new_store is None and store is None:
+                return True
+            # Un cambio de fecha sin cambio de contenido deja el manifiesto igual: se conserva
+            # el índice publicado con su caché de recuperación y su índice BM25. Un fichero que
+            # no carga también lo deja igual, pero ese caso se reintenta (ver abajo)
+            unchanged = (
+                new_store is not None and store is not None
+                and manifest is not None and read_manifest() == manifest
+            )
+            if not unchanged:
+                new_version = SharedVectorStore.swap(new_store, sources)
+                cls.rebuilds += 1
+                logger.info(f"Vector store updated after document changes in {time.perf_counter() - start:.2f}s "
+                            f"(version {new_version}, {len(sources)} documents)")
+
+        if errors:
+            cls.failures += 1
+            logger.warning(f"Files that failed to load will be retried: {', '.join(sorted(errors))}")
+            return False
+        if unchanged:
+            logger.info("Documents touched but their contents are unchanged, keeping the current vector store")
+        return True
@@ -0,0 +1,139 @@
+# src/utils/document_loader.py
+# Carga y troceado de los documentos de docs/, un fichero por tarea. Lo importan los
+# procesos del pool de carga, así que solo depende de los loaders y del splitter
+# (nada de config, Streamlit ni FAISS).
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import logging
+import multiprocessing
+import os
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Extensiones que se saben cargar
+DOCUMENT_EXTENSIONS = (".pdf", ".txt", ".md")
+
+# Arrancar los procesos (spawn + imports de langchain) cuesta segundos y el texto plano
+# se trocea en milisegundos: solo compensa con varios PDF que sumen este tamaño
+PARALLEL_MIN_PDF_BYTES = 2 * 1024 * 1024
+
+def list_document_files(docs_path: Path) -> List[str]:
+    """Relative paths (POSIX) of the loadable files under docs_path, sorted"""
+    names = []
+    for root, _, files in os.walk(docs_path):
+        for file_name in files:
+            if file_name.lower().endswith(DOCUMENT_EXTENSIONS):
+                names.append((Path(root) / file_name).relative_to(docs_path).as_posix())
+    return sorted(names)
+
+def load_file(path: Path) -> List[Document]:
+    """Load a single document with the loader matching its extension"""
+    if path.suffix.lower() == ".pdf":
+        return PyPDFLoader(str(path)).load()
+    return TextLoader(str(path)).load()
+
+def relative_source(doc: Document, docs_path: Optional[Path]) -> str:
+    """Path of the document's source file relative to the docs directory"""
+    source = Path(str(doc.metadata.get('source', '')))
+    if docs_path is not None:
+        try:
+            return source.relative_to(docs_path).as_posix()
+        except ValueError:
+            pass
+    return source.as_posix()
+
+def split_documents(documents: List, chunk_size: int, chunk_overlap: int,
+                    docs_path: Optional[Path] = None) -> Tuple[List[Document], List[str]]:
+    """
+    Split documents into chunks with stable IDs
+
+    The ID hashes the source file, page and chunk text, so an unchanged chunk keeps
+    its ID when other parts of the file or other files change.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        is_separator_regex=False
+    )
+    chunks = text_splitter.split_documents(documents)
+
+    ids = []
+    occurrences: Dict[str, int] = {}
+    for chunk in chunks:
+        raw = f"{relative_source(chunk, docs_path)}\0{chunk.metadata.get('page', '')}\0{chunk.page_content}"
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+        # El mismo texto repetido en una página recibe un sufijo por orden de aparición
+        count = occurrences.get(digest, 0)
+        occurrences[digest] = count + 1
+        ids.append(f"{digest}-{count}" if count else digest)
+    return chunks, ids
+
+def _process_file(docs_path: str, name: str, chunk_size: Optional[int],
+                  chunk_overlap: int) -> Tuple[List[Document], List[str]]:
+    """Worker task: load one file and, if chunk_size is given, chunk it"""
+    documents = load_file(Path(docs_path) / name)
+    if chunk_size is None:
+        return documents, []
+    return split_documents(documents, chunk_size, chunk_overlap, Path(docs_path))
+
+def process_files(docs_path: Path, names: List[str], chunk_size: Optional[int] = None,
+                  chunk_overlap: int = 0, max_workers: Optional[int] = None,
+                  progress: Optional[Callable[[int, int, str], None]] = None
+                  ) -> Tuple[Dict[str, Tuple[List[Document], List[str]]], Dict[str, str]]:
+    """
+    Load (and optionally chunk) files in parallel, one process per file at a time
+
+    Args:
+        docs_path (Path): Documents directory
+        names (List[str]): Paths relative to docs_path
+        chunk_size (Optional[int]): Chunk the documents when given, else return them whole
+        chunk_overlap (int): Overlap between chunks
+        max_workers (Optional[int]): Worker processes, all cores when None; 1 runs inline,
+            as do file sets with fewer than two PDFs or under PARALLEL_MIN_PDF_BYTES of them
+        progress (Optional[Callable]): Called as progress(done, total, name) after each file
+
+    Returns:
+        Tuple[Dict, Dict[str, str]]: name -> (documents or chunks, chunk IDs) for the files
+        that loaded, and name -> error message for the ones that failed. A failing file
+        never stops the others.
+    """
+    results: Dict[str, Tuple[List[Document], List[str]]] = {}
+    errors: Dict[str, str] = {}
+    total = len(names)
+    workers = min(max_workers or os.cpu_count() or 1, total)
+    if workers > 1:
+        pdfs = [docs_path / name for name in names if name.lower().endswith(".pdf") and (docs_path / name).exists()]
+        if len(pdfs) < 2 or sum(path.stat().st_size for path in pdfs) < PARALLEL_MIN_PDF_BYTES:
+            workers = 1
+
+    def _done(name: str, future_result: Callable):
+        try:
+            results[name] = future_result()
+            logger.info(f"Loaded {name} ({len(results[name][0])} {'chunks' if chunk_size else 'documents'})")
+        except Exception as e:
+            errors[name] = str(e)
+            logger.error(f"Error loading {name}: {e}")
+        if progress:
+            progress(len(results) + len(errors), total, name)
+
+    if workers <= 1:
+        for name in names:
+            _done(name, lambda name=name: _process_file(str(docs_path), name, chunk_size, chunk_overlap))
+        return results, errors
+
+    # 'spawn' evita heredar por fork los hilos y locks de Streamlit
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(_process_file, str(docs_path), name, chunk_size, chunk_overlap): name
+            for name in names
+        }
+        for future in as_completed(futures):
+            _done(futures[future], future.result)
+    return results, errors
@@ -0,0 +1,318 @@
+# src/utils/embeddings.py
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+import hashlib
+import importlib.util
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import streamlit as st
+from config.config import (
+    EMBEDDINGS_PROVIDER, EMBEDDINGS_MODEL, EMBEDDINGS_DIMENSIONS, EMBEDDINGS_BATCH_SIZE,
+    EMBEDDINGS_CACHE_ENABLED, EMBEDDINGS_MAX_CONCURRENCY, CACHE_DIR, OLLAMA_BASE_URL
+)
+
+logger = logging.getLogger(__name__)
+
+# Modelo por defecto de cada backend cuando EMBEDDINGS_MODEL está vacío
+DEFAULT_EMBEDDING_MODELS = {
+    "openai": "text-embedding-3-small",
+    "ollama": "nomic-embed-text",
+    "local": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+}
+
+# Máximo de textos por petición que acepta cada backend
+PROVIDER_BATCH_LIMITS = {
+    "openai": 2048
+}
+
+def normalize_text(text: str) -> str:
+    """Normalize a chunk for the cache key: Unicode NFC and collapsed whitespace"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+class EmbeddingCache:
+    """
+    Disk-backed store of document embeddings keyed by (model, normalized chunk text hash)
+
+    Shared by every session in the process. Vectors are stored as float32 in SQLite,
+    the precision FAISS indexes them with anyway.
+    """
+
+    _default: Optional["EmbeddingCache"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn.commit()
+
+    @classmethod
+    def default(cls) -> "EmbeddingCache":
+        """Process-wide cache under CACHE_DIR"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(Path(CACHE_DIR) / "embeddings.sqlite")
+            return cls._default
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        raw = f"{model}\0{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(keys)
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()]
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves document embeddings from the EmbeddingCache and
+    sends only the missing chunks to the backend, in batches of batch_size with up
+    to max_concurrency batches in flight (never more than EMBEDDINGS_MAX_CONCURRENCY
+    across the process)
+
+    It also carries the identity of the model (provider, model and dimensions) used in
+    the index manifest and the cache keys, so switching backends never mixes vectors.
+    """
+
+    # Pool compartido para las peticiones de embeddings; separado del de StageRunner
+    # para que una reconstrucción del índice no compita con las etapas de las preguntas
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, inner: Embeddings, provider: str, model: str,
+                 batch_size: int = EMBEDDINGS_BATCH_SIZE, dimensions: Optional[int] = None,
+                 cache: Optional[EmbeddingCache] = None, max_concurrency: int = EMBEDDINGS_MAX_CONCURRENCY):
+        self.inner = inner
+        self.provider = provider
+        self.model = f"{provider}/{model}"
+        self.batch_size = max(1, min(batch_size, PROVIDER_BATCH_LIMITS.get(provider, batch_size)))
+        self.dimensions = dimensions
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max(1, EMBEDDINGS_MAX_CONCURRENCY),
+                    thread_name_prefix="embeddings"
+                )
+            return cls._executor
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+
+    def _embed_missing(self, texts: List[str]) -> List[List[float]]:
+        batches = self._batches(texts)
+        if self.max_concurrency == 1 or len(batches) == 1:
+            results = [self.inner.embed_documents(batch) for batch in batches]
+        else:
+            # Como mucho max_concurrency lotes de esta llamada en vuelo; el pool, de
+            # EMBEDDINGS_MAX_CONCURRENCY hilos, limita además el total del proceso
+            in_flight = threading.BoundedSemaphore(self.max_concurrency)
+            futures = []
+            for batch in batches:
+                in_flight.acquire()
+                future = self._get_executor().submit(self.inner.embed_documents, batch)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+            results = [future.result() for future in futures]
+        return [vector for batch in results for vector in batch]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        dimension_tag = f"@{self.dimensions}" if self.dimensions else ""
+        keys = [EmbeddingCache.make_key(self.model + dimension_tag, text) for text in texts]
+        vectors = self.cache.get_many(set(keys)) if self.cache is not None else {}
+
+        # Un mismo chunk repetido solo se envía una vez
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            embedded = dict(zip(missing.keys(), self._embed_missing(list(missing.values()))))
+            if self.cache is not None:
+                self.cache.put_many(embedded)
+            vectors.update(embedded)
+
+        logger.info(f"Embedded {len(texts)} chunks with {self.model}: {len(missing)} sent, {len(texts) - len(missing)} reused")
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+class LocalEmbeddings(Embeddings):
+    """Sentence-transformers model running on CPU inside the app process"""
+
+    # El modelo se carga una vez por proceso y lo comparten todas las sesiones
+    _models: Dict[str, object] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, model_name: str, batch_size: int = EMBEDDINGS_BATCH_SIZE,
+                 dimensions: Optional[int] = None, device: str = "cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.dimensions = dimensions
+        self.device = device
+
+    def _get_model(self):
+        key = f"{self.model_name}|{self.device}|{self.dimensions}"
+        with LocalEmbeddings._lock:
+            if key not in LocalEmbeddings._models:
+                from sentence_transformers import SentenceTransformer
+                logger.info(f"Loading local embedding model '{self.model_name}' on {self.device}")
+                LocalEmbeddings._models[key] = SentenceTransformer(
+                    self.model_name, device=self.device, truncate_dim=self.dimensions
+                )
+            return LocalEmbeddings._models[key]
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._get_model().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+class EmbeddingsProvider:
+    """Provider class for the embeddings backend used by RAG"""
+
+    # Backends registrados en tiempo de ejecución, p.ej. embeddings simulados
+    _factories: Dict[str, Callable[..., Embeddings]] = {}
+
+    @staticmethod
+    def register_provider(name: str, factory: Callable[..., Embeddings]) -> None:
+        """Register a backend whose embeddings are built by factory(model_name=..., dimensions=..., **kwargs)"""
+        EmbeddingsProvider._factories[name] = factory
+
+    @staticmethod
+    def local_available() -> bool:
+        """Check if the optional sentence-transformers package is installed"""
+        return importlib.util.find_spec("sentence_transformers") is not None
+
+    @staticmethod
+    def resolve_provider(provider: Optional[str] = None, api_key: Optional[str] = None) -> Optional[str]:
+        """
+        Resolve 'auto' to a concrete backend: OpenAI when there is an API key, otherwise
+        the local model if sentence-transformers is installed, otherwise Ollama if it is running
+        """
+        provider = provider or EMBEDDINGS_PROVIDER
+        if provider != "auto":
+            return provider
+        if api_key or st.session_state.get('OPENAI_API_KEY'):
+            return "openai"
+        if EmbeddingsProvider.local_available():
+            return "local"
+        from .ollama_manager import OllamaManager
+        if OllamaManager.is_available():
+            return "ollama"
+        return None
+
+    @staticmethod
+    def get_embeddings(provider: Optional[str] = None, model_name: Optional[str] = None,
+                       api_key: Optional[str] = None, dimensions: Optional[int] = EMBEDDINGS_DIMENSIONS,
+                       batch_size: int = EMBEDDINGS_BATCH_SIZE, use_cache: bool = EMBEDDINGS_CACHE_ENABLED,
+                       **kwargs) -> Embeddings:
+        """
+        Get the embeddings of the configured backend, batched
+
+        Args:
+            provider (Optional[str]): 'openai', 'ollama', 'local', 'auto' or a registered backend
+            model_name (Optional[str]): Model name, the backend default when empty
+            api_key (Optional[str]): OpenAI API key, read from session state when omitted
+            dimensions (Optional[int]): Output dimensions, the model default when None
+            batch_size (int): Texts per backend request
+            use_cache (bool): Serve repeated chunks from the disk cache
+        """
+        try:
+            resolved = EmbeddingsProvider.resolve_provider(provider, api_key)
+            if resolved is None:
+                raise ValueError(
+                    "No embeddings backend available: set an OpenAI API key, "
+                    "install sentence-transformers or start Ollama"
+                )
+            model = model_name or EMBEDDINGS_MODEL or DEFAULT_EMBEDDING_MODELS.get(resolved, "")
+
+            if resolved in EmbeddingsProvider._factories:
+                inner = EmbeddingsProvider._factories[resolved](model_name=model, dimensions=dimensions, **kwargs)
+
+            elif resolved == "openai":
+                from langchain_openai import OpenAIEmbeddings
+                api_key = api_key or st.session_state.get('OPENAI_API_KEY')
+                if not api_key:
+                    raise ValueError("OpenAI API key not found in session state")
+                inner = OpenAIEmbeddings(
+                    model=model,
+                    dimensions=dimensions,
+                    chunk_size=batch_size,
+                    openai_api_key=api_key
+                )
+
+            elif resolved == "ollama":
+                from langchain_ollama import OllamaEmbeddings
+                inner = OllamaEmbeddings(
+                    model=model,
+                    dimensions=dimensions,
+                    base_url=kwargs.get('base_url', OLLAMA_BASE_URL)
+                )
+
+            elif resolved == "local":
+                if not EmbeddingsProvider.local_available():
+                    raise ImportError("Local embeddings need the sentence-transformers package")
+                inner = LocalEmbeddings(model, batch_size=batch_size, dimensions=dimensions)
+
+            else:
+                raise ValueError(f"Unsupported embeddings provider: {resolved}")
+
+            return BatchedEmbeddings(
+                inner, resolved, model,
+                batch_size=batch_size,
+                dimensions=dimensions,
+                cache=EmbeddingCache.default() if use_cache else None,
+                # El modelo local ya usa todos los núcleos en cada lote
+                max_concurrency=1 if resolved == "local" else EMBEDDINGS_MAX_CONCURRENCY
+            )
+
+        except Exception as e:
+            logger.error(f"Error initializing embeddings provider: {str(e)}")
+            raise
@@ -0,0 +1,139 @@
+# src/utils/hybrid_retriever.py
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+import re
+import unicodedata
+from langchain_core.documents import Document
+from config.config import RAG_RETRIEVAL_MODE, RAG_RRF_K
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:_[a-z0-9]+)*")
+
+def _whole_tokens(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN_PATTERN.findall(text)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase, accent-free tokens that keep identifiers whole
+
+    'incidentes_2024_01' yields the full name plus its parts, so exact table names,
+    column codes and RUC numbers match as a single rare term.
+    """
+    tokens = []
+    for token in _whole_tokens(text):
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(part for part in token.split("_") if part)
+    return tokens
+
+class BM25Index:
+    """In-memory inverted index scored with Okapi BM25"""
+
+    def __init__(self, documents: List[Tuple[str, str]], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            documents (List[Tuple[str, str]]): (document ID, text) pairs
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for position, (doc_id, text) in enumerate(documents):
+            counts = Counter(tokenize(text))
+            self.doc_ids.append(doc_id)
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((position, frequency))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        total = len(self.doc_ids)
+        self.idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def matching_documents(self, terms: List[str]) -> Dict[str, int]:
+        """Document ID -> how many of the terms it contains"""
+        matches: Dict[str, int] = {}
+        for term in set(terms):
+            for position, _ in self.postings.get(term, []):
+                doc_id = self.doc_ids[position]
+                matches[doc_id] = matches.get(doc_id, 0) + 1
+        return matches
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top k (document ID, score) pairs for the query terms"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / (self.average_length or 1))
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[position], score) for position, score in ranked]
+
+def identifier_terms(text: str) -> List[str]:
+    """Whole tokens that look like identifiers (table names, column codes, RUC numbers): with digits or '_'"""
+    return [
+        token for token in _whole_tokens(text)
+        if len(token) >= 3 and (any(char.isdigit() for char in token) or "_" in token)
+    ]
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = RAG_RRF_K) -> List[str]:
+    """Fuse ranked ID lists: each list adds 1 / (rrf_k + rank) to the IDs it contains"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+
+class HybridRetriever:
+    """
+    BM25 inverted index kept next to the FAISS store, fused with reciprocal rank fusion
+
+    Modes: 'hybrid' fuses both rankings, 'vector' is plain similarity search and
+    'lexical' uses BM25 only, with no embedding call at query time. In hybrid mode the
+    chunks containing identifiers of the question go first: rank fusion alone lets
+    chunks that are merely similar in both rankings outrank the exact match.
+
+    The index is built once per store and never mutated, so it can be searched from any thread.
+    """
+
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+        self.documents: Dict[str, Document] = {}
+        docstore = getattr(vector_store, "docstore", None)
+        for doc_id in getattr(vector_store, "index_to_docstore_id", {}).values():
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                self.documents[doc_id] = doc
+        self.bm25 = BM25Index([(doc_id, doc.page_content) for doc_id, doc in self.documents.items()])
+        logger.info(f"BM25 index built with {len(self.documents)} chunks and {len(self.bm25.postings)} terms")
+
+    def search(self, question: str, k: int, mode: Optional[str] = None) -> List[Document]:
+        mode = mode or RAG_RETRIEVAL_MODE
+        # Sin docstore (p.ej. los sustitutos del arnés de regresión) solo queda la búsqueda del store
+        if mode == "vector" or not self.documents:
+            return self.vector_store.similarity_search(question, k=k)
+
+        fetch_k = max(k * 4, 20)
+        lexical = [doc_id for doc_id, _ in self.bm25.search(question, fetch_k)]
+        if mode == "lexical":
+            return [self.documents[doc_id] for doc_id in lexical[:k]]
+
+        vector = [doc.id for doc in self.vector_store.similarity_search(question, k=fetch_k) if doc.id in self.documents]
+        fused = reciprocal_rank_fusion([vector, lexical])
+        matches = self.bm25.matching_documents(identifier_terms(question))
+        if matches:
+            seen = set(fused)
+            candidates = fused + [doc_id for doc_id in matches if doc_id not in seen]
+            order = {doc_id: rank for rank, doc_id in enumerate(candidates)}
+            fused = sorted(candidates, key=lambda doc_id: (-matches.get(doc_id, 0), order[doc_id]))
+        return [self.documents[doc_id] for doc_id in fused[:k]]
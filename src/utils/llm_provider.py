@@ -1,23 +1,38 @@
 # src/utils/llm_provider.py
-from typing import Optional
+from typing import Callable, Dict, Optional
 from langchain_openai import ChatOpenAI
 from langchain_ollama import OllamaLLM
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import RunnableBinding
 import streamlit as st
 import logging
-from config.config import OPENAI_MODELS, DEFAULT_MODEL
+from config.config import (
+    OPENAI_MODELS, DEFAULT_MODEL, OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX, OLLAMA_NUM_THREAD
+)
+from .ollama_manager import OllamaManager, OllamaLatencyCallback
 
 logger = logging.getLogger(__name__)
 
 class LLMProvider:
     """Provider class for Language Model selection and configuration"""
     
+    # Proveedores registrados en tiempo de ejecución, p.ej. el LLM simulado del benchmark
+    _factories: Dict[str, Callable[..., BaseChatModel]] = {}
+    
+    @staticmethod
+    def register_provider(name: str, factory: Callable[..., BaseChatModel]) -> None:
+        """Register a provider whose models are built by factory(model_name=..., **kwargs)"""
+        LLMProvider._factories[name] = factory
+    
     @staticmethod
     def get_llm(provider: str = "openai", model_name: Optional[str] = None, **kwargs) -> BaseChatModel:
         """
         Get the specified language model instance
         """
         try:
+            if provider in LLMProvider._factories:
+                return LLMProvider._factories[provider](model_name=model_name, **kwargs)
+            
             if provider == "openai":
                 api_key = st.session_state.get('OPENAI_API_KEY')
                 if not api_key:
@@ -35,10 +50,15 @@ class LLMProvider:
                 )
             
             elif provider == "ollama":
+                model = model_name or "llama2"
                 return OllamaLLM(
-                    model=model_name or "llama2",
+                    model=model,
                     temperature=kwargs.get('temperature', 0.7),
-                    base_url=kwargs.get('base_url', "http://localhost:11434")
+                    base_url=kwargs.get('base_url', OLLAMA_BASE_URL),
+                    keep_alive=OLLAMA_KEEP_ALIVE,
+                    num_ctx=kwargs.get('num_ctx', OLLAMA_NUM_CTX),
+                    num_thread=kwargs.get('num_thread', OLLAMA_NUM_THREAD),
+                    callbacks=[OllamaLatencyCallback(model)]
                 )
             
             else:
@@ -48,19 +68,34 @@ class LLMProvider:
             logger.error(f"Error initializing LLM provider: {str(e)}")
             raise
 
+    @staticmethod
+    def bind_json_schema(llm, name: str, schema: dict):
+        """
+        Constrain the model output to a JSON schema when the provider supports it
+        
+        OpenAI chat models get a strict json_schema response format and Ollama
+        models the schema as 'format'; other models are returned unchanged and
+        rely on the prompt instructions. A model wrapped by bind/with_config is
+        unwrapped, bound and wrapped again with the same kwargs and config.
+        """
+        if isinstance(llm, RunnableBinding):
+            bound = LLMProvider.bind_json_schema(llm.bound, name, schema)
+            if bound is llm.bound:
+                return llm
+            return RunnableBinding(bound=bound, kwargs=llm.kwargs, config=llm.config)
+        if isinstance(llm, ChatOpenAI):
+            return llm.bind(response_format={
+                "type": "json_schema",
+                "json_schema": {"name": name, "schema": schema, "strict": True}
+            })
+        if isinstance(llm, OllamaLLM):
+            return llm.bind(format=schema)
+        return llm
+
     @staticmethod
     def check_ollama_availability() -> bool:
-        """Check if Ollama is running and available"""
-        try:
-            import requests
-            try:
-                response = requests.get("http://localhost:11434/api/version", timeout=2)
-                return response.status_code == 200
-            except requests.RequestException:
-                return False
-        except ImportError:
-            logger.warning("Requests library not found")
-            return False
+        """Check if Ollama is running and available (cached, refreshed in the background)"""
+        return OllamaManager.is_available()
 
     @staticmethod
     def list_available_models(provider: str) -> list:
@@ -71,7 +106,7 @@ class LLMProvider:
                 key=lambda x: OPENAI_MODELS[x]['priority']
             )
         elif provider == "ollama":
-            return ["llama3:8b-instruct-q8_0", "mistral", "codellama"]
+            return OllamaManager.list_models()
         return []
 
     @staticmethod
@@ -0,0 +1,191 @@
+# src/utils/ollama_manager.py
+from typing import Any, Dict, List, Optional
+import logging
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from config.config import (
+    OLLAMA_BASE_URL, OLLAMA_HEALTH_TTL, OLLAMA_KEEP_ALIVE, OLLAMA_PRELOAD_MODELS
+)
+
+logger = logging.getLogger(__name__)
+
+# Modelos mostrados si Ollama aún no respondió a /api/tags
+FALLBACK_MODELS = ["llama3:8b-instruct-q8_0", "mistral", "codellama"]
+# Una llamada cuyo load_duration supera este umbral tuvo que cargar el modelo (cold)
+COLD_LOAD_THRESHOLD_SECONDS = 0.5
+
+class OllamaLatencyCallback(BaseCallbackHandler):
+    """Records Ollama call latency, split into model load time and generation time"""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        try:
+            info = response.generations[0][0].generation_info or {}
+            if "total_duration" in info:
+                OllamaManager.record_latency(
+                    self.model,
+                    info["total_duration"] / 1e9,
+                    info.get("load_duration", 0) / 1e9
+                )
+        except Exception as e:
+            logger.debug(f"Unable to record Ollama latency: {str(e)}")
+
+class OllamaManager:
+    """Process-wide Ollama state: cached health and model list, model warm-up and latency stats"""
+
+    _lock = threading.Lock()
+    _status: Dict[str, Any] = {"available": None, "models": [], "checked_at": 0.0}
+    _refreshing = False
+    _warming: set = set()
+    _loads: Dict[str, Dict[str, Any]] = {}
+    _latency: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    @staticmethod
+    def _get(path: str, timeout: float = 2) -> Optional[Dict[str, Any]]:
+        """GET an Ollama API endpoint, returning None when the server is unreachable"""
+        import requests
+        try:
+            response = requests.get(f"{OLLAMA_BASE_URL}{path}", timeout=timeout)
+            return response.json() if response.status_code == 200 else None
+        except requests.RequestException:
+            return None
+
+    @classmethod
+    def refresh(cls) -> Dict[str, Any]:
+        """Query the Ollama health and installed models and update the cache"""
+        try:
+            version = cls._get("/api/version")
+            tags = cls._get("/api/tags") if version is not None else None
+            status = {
+                "available": version is not None,
+                "version": (version or {}).get("version"),
+                "models": sorted(model["name"] for model in (tags or {}).get("models", [])),
+                "checked_at": time.time()
+            }
+        except ImportError:
+            logger.warning("Requests library not found")
+            status = {"available": False, "models": [], "checked_at": time.time()}
+
+        with cls._lock:
+            cls._status = status
+            cls._refreshing = False
+        return status
+
+    @classmethod
+    def get_status(cls) -> Dict[str, Any]:
+        """
+        Get the cached Ollama status
+
+        Only the first call waits for the HTTP check; afterwards a stale status is
+        returned as is while a background thread refreshes it.
+        """
+        with cls._lock:
+            status = cls._status
+            stale = time.time() - status["checked_at"] >= OLLAMA_HEALTH_TTL
+            start_refresh = stale and status["available"] is not None and not cls._refreshing
+            if start_refresh:
+                cls._refreshing = True
+
+        if status["available"] is None:
+            return cls.refresh()
+        if start_refresh:
+            threading.Thread(target=cls.refresh, name="ollama-health", daemon=True).start()
+        return status
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Check if Ollama is running, using the cached status"""
+        return bool(cls.get_status()["available"])
+
+    @classmethod
+    def list_models(cls) -> List[str]:
+        """List the models installed in Ollama, or the fallback list while it is unreachable"""
+        models = cls.get_status().get("models")
+        return models or (OLLAMA_PRELOAD_MODELS or FALLBACK_MODELS)
+
+    @classmethod
+    def preload(cls, model: str) -> Optional[Dict[str, Any]]:
+        """Load a model into memory and keep it loaded for OLLAMA_KEEP_ALIVE"""
+        import requests
+        start = time.perf_counter()
+        try:
+            # Un prompt vacío solo carga el modelo
+            response = requests.post(
+                f"{OLLAMA_BASE_URL}/api/generate",
+                json={"model": model, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=300
+            )
+            response.raise_for_status()
+            load = {
+                "load_seconds": round(response.json().get("load_duration", 0) / 1e9, 3),
+                "wall_seconds": round(time.perf_counter() - start, 3),
+                "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            with cls._lock:
+                cls._loads[model] = load
+            logger.info(f"Preloaded Ollama model '{model}' in {load['wall_seconds']:.3f}s")
+            return load
+        except Exception as e:
+            logger.error(f"Error preloading Ollama model '{model}': {str(e)}")
+            return None
+
+    @classmethod
+    def warm_up(cls, models: Optional[List[str]] = None) -> None:
+        """Preload models in the background (OLLAMA_PRELOAD_MODELS by default), once per model until one load succeeds"""
+        models = models if models is not None else OLLAMA_PRELOAD_MODELS
+        with cls._lock:
+            pending = [model for model in models if model and model not in cls._warming]
+            cls._warming.update(pending)
+        if not pending:
+            return
+
+        def _warm():
+            if not cls.is_available():
+                logger.warning("Ollama not available, skipping model warm-up")
+                with cls._lock:
+                    cls._warming.difference_update(pending)
+                return
+            for model in pending:
+                if cls.preload(model) is None:
+                    # Sin cargar: una llamada posterior a warm_up lo vuelve a intentar
+                    with cls._lock:
+                        cls._warming.discard(model)
+
+        threading.Thread(target=_warm, name="ollama-warmup", daemon=True).start()
+
+    @classmethod
+    def record_latency(cls, model: str, total_seconds: float, load_seconds: float) -> None:
+        """Accumulate call latency per model, separating cold calls that had to load the model"""
+        kind = "cold" if load_seconds >= COLD_LOAD_THRESHOLD_SECONDS else "warm"
+        with cls._lock:
+            stats = cls._latency.setdefault(model, {}).setdefault(
+                kind, {"calls": 0, "total_seconds": 0.0, "load_seconds": 0.0}
+            )
+            stats["calls"] += 1
+            stats["total_seconds"] += total_seconds
+            stats["load_seconds"] += load_seconds
+        if kind == "cold":
+            logger.warning(f"Ollama model '{model}' was not loaded: {load_seconds:.3f}s of {total_seconds:.3f}s spent loading")
+
+    @classmethod
+    def get_latency_report(cls) -> Dict[str, Dict[str, Any]]:
+        """Get average latency per model for cold and warm calls, with and without load time"""
+        report = {}
+        with cls._lock:
+            for model, kinds in cls._latency.items():
+                report[model] = {
+                    kind: {
+                        "calls": int(stats["calls"]),
+                        "avg_seconds": round(stats["total_seconds"] / stats["calls"], 3),
+                        "avg_seconds_without_load": round(
+                            (stats["total_seconds"] - stats["load_seconds"]) / stats["calls"], 3
+                        )
+                    }
+                    for kind, stats in kinds.items()
+                }
+                if model in cls._loads:
+                    report[model]["preload"] = cls._loads[model]
+        return report
@@ -1,25 +1,37 @@
 # src/utils/rag_utils.py
-from langchain_openai import OpenAIEmbeddings  # Actualizado
 from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, DirectoryLoader
-from typing import List, Dict, Optional
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+from typing import Callable, List, Dict, Optional, Tuple
 from pathlib import Path
+import hashlib
+import json
 import logging
 import os
+import faiss
+from .document_loader import (
+    list_document_files, process_files, relative_source, split_documents
+)
+from .embeddings import EmbeddingsProvider
+from config.config import RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP, RAG_INDEX_DIR, RAG_LOAD_WORKERS
 
 logger = logging.getLogger(__name__)
 
-def initialize_embeddings(api_key: str):
-    """Initialize OpenAI embeddings"""
+INDEX_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+
+def initialize_embeddings(api_key: Optional[str] = None, provider: Optional[str] = None):
+    """Initialize the embeddings of the configured backend (EMBEDDINGS_PROVIDER)"""
     try:
-        return OpenAIEmbeddings(openai_api_key=api_key)
+        return EmbeddingsProvider.get_embeddings(provider=provider, api_key=api_key)
     except Exception as e:
         logger.error(f"Error initializing embeddings: {e}")
         raise
 
-def load_documents(docs_path: Path) -> List:
-    """Load documents from various sources"""
+def load_documents(docs_path: Path, max_workers: Optional[int] = RAG_LOAD_WORKERS) -> List:
+    """Load documents from various sources, one file per worker process"""
     documents = []
     
     # Log the absolute path being checked
@@ -32,75 +44,297 @@ def load_documents(docs_path: Path) -> List:
         docs_path.mkdir(parents=True, exist_ok=True)
         return documents
         
-    # Log existing files in directory
-    files = list(docs_path.glob('**/*'))
-    logger.info(f"Files found in docs directory: {[str(f) for f in files]}")
-
-    # Load PDFs
-    pdf_loader = DirectoryLoader(str(docs_path), glob="**/*.pdf", loader_cls=PyPDFLoader)
-    # Load text files
-    text_loader = DirectoryLoader(str(docs_path), glob="**/*.txt", loader_cls=TextLoader)
-    # Load markdown files
-    md_loader = DirectoryLoader(str(docs_path), glob="**/*.md", loader_cls=TextLoader)
+    names = list_document_files(docs_path)
+    loaded, errors = process_files(docs_path, names, max_workers=max_workers)
+    # Mismo orden que la lista de ficheros, independientemente de cuál termine antes
+    for name in names:
+        if name in loaded:
+            documents.extend(loaded[name][0])
     
+    if not documents:
+        logger.warning("No documents were successfully loaded")
+    else:
+        logger.info(f"Successfully loaded {len(documents)} documents from {len(loaded)} files ({len(errors)} failed)")
+    return documents
+
+def chunk_documents(documents: List, chunk_size: int = RAG_CHUNK_SIZE, chunk_overlap: int = RAG_CHUNK_OVERLAP,
+                    docs_path: Optional[Path] = None) -> Tuple[List[Document], List[str]]:
+    """Split documents into chunks with stable IDs (see document_loader.split_documents)"""
+    return split_documents(documents, chunk_size, chunk_overlap, docs_path)
+
+def load_and_chunk_files(docs_path: Path, names: List[str], chunk_size: int = RAG_CHUNK_SIZE,
+                         chunk_overlap: int = RAG_CHUNK_OVERLAP, max_workers: Optional[int] = RAG_LOAD_WORKERS,
+                         progress: Optional[Callable[[int, int, str], None]] = None
+                         ) -> Tuple[Dict[str, Tuple[List[Document], List[str]]], Dict[str, str]]:
+    """Load and chunk files across the loading pool; see document_loader.process_files"""
+    return process_files(docs_path, names, chunk_size, chunk_overlap, max_workers, progress)
+
+def _chunk_ids_by_file(vector_store: FAISS, docs_path: Path) -> Dict[str, List[str]]:
+    """Group the IDs of the indexed chunks by source file"""
+    by_file: Dict[str, List[str]] = {}
+    for doc_id in vector_store.index_to_docstore_id.values():
+        doc = vector_store.docstore.search(doc_id)
+        by_file.setdefault(relative_source(doc, docs_path), []).append(doc_id)
+    return by_file
+
+def update_vector_store(vector_store: FAISS, docs_path: Path, indexed_files: Dict[str, str],
+                        current_files: Dict[str, str], chunk_size: int = RAG_CHUNK_SIZE,
+                        chunk_overlap: int = RAG_CHUNK_OVERLAP,
+                        progress: Optional[Callable[[int, int, str], None]] = None
+                        ) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Bring the vector store in line with the documents, touching only what changed
+
+    Chunks of removed files are deleted. Changed and new files are re-chunked: chunks
+    whose ID disappeared are deleted and only chunks with new IDs are embedded.
+
+    Args:
+        vector_store (FAISS): Store to update in place (must not be memory-mapped)
+        docs_path (Path): Documents directory
+        indexed_files (Dict[str, str]): Relative path -> content hash the store was built from
+        current_files (Dict[str, str]): Relative path -> content hash on disk now
+        progress (Optional[Callable]): Called as progress(done, total, name) per loaded file
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, str]]: Relative path -> content hash now indexed,
+        and relative path -> error message of the files that failed to load. A failed
+        file keeps its previous chunks and hash, so the next update loads it again.
+    """
+    by_file = _chunk_ids_by_file(vector_store, docs_path)
+    updated_files = {name: digest for name, digest in indexed_files.items() if name in current_files}
+    stale_ids: List[str] = []
+    new_chunks: List[Document] = []
+    new_ids: List[str] = []
+
+    for name in indexed_files:
+        if name not in current_files:
+            stale_ids.extend(by_file.get(name, []))
+
+    changed = [name for name, digest in current_files.items() if indexed_files.get(name) != digest]
+    loaded, errors = load_and_chunk_files(docs_path, changed, chunk_size, chunk_overlap, progress=progress)
+    if errors:
+        logger.warning(f"Keeping the previous chunks of the files that failed to load: {', '.join(sorted(errors))}")
+
+    for name in changed:
+        if name not in loaded:
+            continue
+        chunks, ids = loaded[name]
+        old_ids = set(by_file.get(name, []))
+        current_ids = set(ids)
+        stale_ids.extend(doc_id for doc_id in old_ids if doc_id not in current_ids)
+        for chunk, doc_id in zip(chunks, ids):
+            if doc_id not in old_ids:
+                new_chunks.append(chunk)
+                new_ids.append(doc_id)
+        updated_files[name] = current_files[name]
+
+    if stale_ids:
+        vector_store.delete(stale_ids)
+    if new_chunks:
+        vector_store.add_documents(new_chunks, ids=new_ids)
+    logger.info(f"Vector store updated: {len(stale_ids)} chunks removed, {len(new_ids)} chunks embedded")
+    return updated_files, errors
+
+def get_embedding_model_name(embeddings) -> str:
+    """Identify the embedding model so an index built with another one is not reused"""
+    name = type(embeddings).__name__
+    model = getattr(embeddings, 'model', None) or getattr(embeddings, 'model_name', None)
+    if model:
+        name = f"{name}:{model}"
+    dimensions = getattr(embeddings, 'dimensions', None)
+    return f"{name}@{dimensions}" if dimensions else name
+
+def hash_document_files(docs_path: Path) -> Dict[str, str]:
+    """Relative path -> SHA-256 of the contents of every loadable document"""
+    return {
+        name: hashlib.sha256((docs_path / name).read_bytes()).hexdigest()
+        for name in list_document_files(docs_path)
+    }
+
+def build_manifest(docs_path: Path, embeddings, chunk_size: int = RAG_CHUNK_SIZE,
+                   chunk_overlap: int = RAG_CHUNK_OVERLAP) -> Dict:
+    """Describe everything the index depends on: file contents, chunking and embedding model"""
+    return {
+        "format": INDEX_FORMAT_VERSION,
+        "embedding_model": get_embedding_model_name(embeddings),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "files": hash_document_files(docs_path)
+    }
+
+def _settings_mismatch(stored: Dict, current: Dict) -> Optional[str]:
+    """Reason why a stored index cannot be reused even partially, or None"""
+    for key in ("format", "embedding_model", "chunk_size", "chunk_overlap"):
+        if stored.get(key) != current[key]:
+            return f"{key} changed ({stored.get(key)} -> {current[key]})"
+    return None
+
+def _changed_files(stored: Dict, current: Dict) -> List[str]:
+    """Files added, removed or modified since the stored manifest"""
+    stored_files = stored.get("files", {})
+    return sorted(
+        name for name in set(stored_files) | set(current["files"])
+        if stored_files.get(name) != current["files"].get(name)
+    )
+
+def _read_manifest(index_dir: Path) -> Optional[Dict]:
+    manifest_path = index_dir / MANIFEST_FILE
+    if not manifest_path.exists():
+        logger.info(f"No saved vector store in {index_dir}")
+        return None
     try:
-        # Load each type separately with error handling
-        try:
-            pdf_docs = pdf_loader.load()
-            logger.info(f"Loaded {len(pdf_docs)} PDF documents")
-            documents.extend(pdf_docs)
-        except Exception as e:
-            logger.error(f"Error loading PDFs: {e}")
-            
-        try:
-            txt_docs = text_loader.load()
-            logger.info(f"Loaded {len(txt_docs)} text documents")
-            documents.extend(txt_docs)
-        except Exception as e:
-            logger.error(f"Error loading text files: {e}")
-            
-        try:
-            md_docs = md_loader.load()
-            logger.info(f"Loaded {len(md_docs)} markdown documents")
-            documents.extend(md_docs)
-        except Exception as e:
-            logger.error(f"Error loading markdown files: {e}")
-        
-        if not documents:
-            logger.warning("No documents were successfully loaded")
-        else:
-            logger.info(f"Successfully loaded total of {len(documents)} documents")
-            for doc in documents:
-                logger.info(f"Loaded: {doc.metadata.get('source', 'Unknown source')}")
-            
-        return documents
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
     except Exception as e:
-        logger.error(f"Error loading documents: {e}")
-        return documents
+        logger.error(f"Error reading vector store manifest: {e}")
+        return None
+
+def read_manifest(index_dir: Optional[Path] = None) -> Optional[Dict]:
+    """Manifest of the saved index, or None if there is none"""
+    return _read_manifest(Path(index_dir or RAG_INDEX_DIR))
+
+def save_vector_store(vector_store: FAISS, index_dir: Path, manifest: Dict):
+    """Persist the index, its chunks and the manifest; the manifest is written last"""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = index_dir / MANIFEST_FILE
+    # Sin manifiesto el índice se considera incompleto hasta terminar de escribirlo
+    manifest_path.unlink(missing_ok=True)
 
-def create_vector_store(documents: List, embeddings) -> Optional[FAISS]:
-    """Create FAISS vector store from documents"""
+    chunks = []
+    for position in range(vector_store.index.ntotal):
+        doc_id = vector_store.index_to_docstore_id[position]
+        doc = vector_store.docstore.search(doc_id)
+        chunks.append({"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata})
+
+    # Ficheros nuevos y os.replace: un índice publicado puede tener el anterior mapeado
+    # en memoria, y sobrescribirlo en el sitio se lo truncaría mientras se consulta
+    index_tmp = index_dir / f"{INDEX_FILE}.tmp"
+    faiss.write_index(vector_store.index, str(index_tmp))
+    os.replace(index_tmp, index_dir / INDEX_FILE)
+    chunks_tmp = index_dir / f"{CHUNKS_FILE}.tmp"
+    chunks_tmp.write_text(json.dumps(chunks, ensure_ascii=False), encoding="utf-8")
+    os.replace(chunks_tmp, index_dir / CHUNKS_FILE)
+
+    tmp_path = manifest_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, manifest_path)
+    logger.info(f"Vector store saved to {index_dir} ({len(chunks)} chunks)")
+
+def _read_index(index_dir: Path, embeddings, mmap: bool = True) -> Optional[FAISS]:
+    """Read a saved index and its chunks; memory-mapped indexes are read-only"""
     try:
-        if not documents:
-            logger.warning("No documents provided for vector store creation")
-            return None
-            
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            is_separator_regex=False
-        )
-        chunks = text_splitter.split_documents(documents)
-        
-        if not chunks:
-            logger.warning("No chunks created from documents")
+        index_path = str(index_dir / INDEX_FILE)
+        index = None
+        if mmap:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+            except RuntimeError:
+                # No todos los tipos de índice admiten mmap
+                pass
+        if index is None:
+            index = faiss.read_index(index_path)
+
+        chunks = json.loads((index_dir / CHUNKS_FILE).read_text(encoding="utf-8"))
+        if len(chunks) != index.ntotal:
+            logger.warning(f"Saved vector store is inconsistent: {len(chunks)} chunks for {index.ntotal} vectors")
             return None
-            
-        vector_store = FAISS.from_documents(chunks, embeddings)
-        logger.info("Vector store created successfully")
-        return vector_store
-        
+
+        docstore = InMemoryDocstore({
+            chunk["id"]: Document(id=chunk["id"], page_content=chunk["page_content"], metadata=chunk["metadata"])
+            for chunk in chunks
+        })
+        index_to_docstore_id = {position: chunk["id"] for position, chunk in enumerate(chunks)}
+        logger.info(f"Loaded saved vector store from {index_dir} ({index.ntotal} chunks)")
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+    except Exception as e:
+        logger.error(f"Error loading saved vector store: {e}")
+        return None
+
+def _save(vector_store: FAISS, index_dir: Path, manifest: Dict):
+    try:
+        save_vector_store(vector_store, index_dir, manifest)
+    except Exception as e:
+        # Sin persistencia el índice sigue sirviendo para esta sesión
+        logger.error(f"Error saving vector store: {e}")
+
+def _build_vector_store(docs_path: Path, manifest: Dict, embeddings,
+                        progress: Optional[Callable[[int, int, str], None]] = None
+                        ) -> Tuple[Optional[FAISS], Dict[str, str]]:
+    """Build the index from scratch, loading and chunking the files across the loading pool; also returns the load errors"""
+    names = list(manifest["files"])
+    loaded, errors = load_and_chunk_files(
+        docs_path, names, manifest["chunk_size"], manifest["chunk_overlap"], progress=progress
+    )
+    # Los ficheros que fallan quedan fuera del manifiesto para reintentarlos en la próxima carga
+    manifest["files"] = {name: digest for name, digest in manifest["files"].items() if name in loaded}
+    if errors:
+        logger.warning(f"Files left out of the vector store: {', '.join(sorted(errors))}")
+
+    chunks: List[Document] = []
+    ids: List[str] = []
+    for name in names:
+        if name in loaded:
+            chunks.extend(loaded[name][0])
+            ids.extend(loaded[name][1])
+    if not chunks:
+        logger.warning("No chunks created from documents")
+        return None, errors
+    try:
+        vector_store = FAISS.from_documents(chunks, embeddings, ids=ids)
+        logger.info(f"Vector store created successfully ({len(chunks)} chunks from {len(loaded)} files)")
+        return vector_store, errors
     except Exception as e:
         logger.error(f"Error creating vector store: {e}")
-        return None
\ No newline at end of file
+        return None, errors
+
+def load_or_create_vector_store(docs_path: Path, embeddings, index_dir: Optional[Path] = None,
+                                progress: Optional[Callable[[int, int, str], None]] = None
+                                ) -> Tuple[Optional[FAISS], List[str], Dict[str, str]]:
+    """
+    Load the persisted index when it matches the documents, chunking and embedding model.
+    When only documents changed it is updated incrementally, otherwise rebuilt; either way
+    the result is persisted again. progress(done, total, name) is called per loaded file
+
+    Returns:
+        Tuple[Optional[FAISS], List[str], Dict[str, str]]: The vector store, the indexed
+        document paths and relative path -> error message of the files that failed to
+        load. The saved manifest doesn't record their current hash, so the next call
+        loads them again.
+    """
+    index_dir = Path(index_dir or RAG_INDEX_DIR)
+    if not docs_path.exists():
+        logger.warning(f"Documents directory {docs_path.absolute()} does not exist")
+        docs_path.mkdir(parents=True, exist_ok=True)
+        return None, [], {}
+
+    manifest = build_manifest(docs_path, embeddings)
+    if not manifest["files"]:
+        logger.warning("No documents found, vector store not created")
+        return None, [], {}
+
+    stored = _read_manifest(index_dir)
+    if stored is not None and _settings_mismatch(stored, manifest) is None:
+        changed = _changed_files(stored, manifest)
+        if not changed:
+            vector_store = _read_index(index_dir, embeddings)
+            if vector_store is not None:
+                return vector_store, [str(docs_path / name) for name in manifest["files"]], {}
+        else:
+            logger.info(f"Documents changed since the saved vector store: {', '.join(changed)}")
+            vector_store = _read_index(index_dir, embeddings, mmap=False)
+            if vector_store is not None:
+                manifest["files"], errors = update_vector_store(
+                    vector_store, docs_path, stored.get("files", {}), manifest["files"],
+                    manifest["chunk_size"], manifest["chunk_overlap"], progress
+                )
+                if vector_store.index.ntotal == 0:
+                    logger.warning("No chunks left in the vector store")
+                    return None, [], errors
+                _save(vector_store, index_dir, manifest)
+                return vector_store, [str(docs_path / name) for name in manifest["files"]], errors
+    elif stored is not None:
+        logger.info(f"Saved vector store is stale: {_settings_mismatch(stored, manifest)}")
+
+    vector_store, errors = _build_vector_store(docs_path, manifest, embeddings, progress)
+    if vector_store is not None:
+        _save(vector_store, index_dir, manifest)
+    return vector_store, [str(docs_path / name) for name in manifest["files"]], errors
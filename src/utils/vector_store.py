@@ -0,0 +1,164 @@
+# src/utils/vector_store.py
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Tuple
+from pathlib import Path
+import logging
+import re
+import threading
+import unicodedata
+from langchain_community.vectorstores import FAISS
+from .chatbot.tracing import Trace
+from .hybrid_retriever import HybridRetriever
+from .rag_utils import load_or_create_vector_store
+from config.config import RAG_RETRIEVAL_CACHE_SIZE, RAG_RETRIEVAL_MODE
+
+logger = logging.getLogger(__name__)
+
+def normalize_question(question: str) -> str:
+    """Cache key form of a question: NFC, lowercase, collapsed whitespace, no surrounding punctuation"""
+    question = re.sub(r"\s+", " ", unicodedata.normalize("NFC", question).lower())
+    return question.strip(" ¿?¡!.,;:")
+
+class RetrievalCache:
+    """
+    Process-wide LRU cache of retrieved chunk IDs
+
+    Keys carry the index version, so entries of a swapped-out index can never be served;
+    they are also dropped on swap to free the space.
+    """
+
+    _lock = threading.Lock()
+    _entries: "OrderedDict[Hashable, List[str]]" = OrderedDict()
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, key: Hashable) -> Optional[List[str]]:
+        with cls._lock:
+            ids = cls._entries.get(key)
+            if ids is None:
+                cls.misses += 1
+                return None
+            cls._entries.move_to_end(key)
+            cls.hits += 1
+            return ids
+
+    @classmethod
+    def put(cls, key: Hashable, ids: List[str], max_size: int = RAG_RETRIEVAL_CACHE_SIZE):
+        if max_size <= 0:
+            return
+        with cls._lock:
+            cls._entries[key] = ids
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > max_size:
+                cls._entries.popitem(last=False)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            return {"entries": len(cls._entries), "hits": cls.hits, "misses": cls.misses}
+
+class SharedVectorStore:
+    """
+    Process-wide vector store shared by every Streamlit session
+
+    Readers take a snapshot of the current store and search it without locking.
+    A rebuild never mutates the published store: it builds a new one and swaps the
+    reference, so searches in flight keep using the previous index until they finish.
+    The BM25 index of the hybrid retriever is built at swap time, off the request path.
+    """
+
+    _lock = threading.Lock()
+    _build_lock = threading.Lock()
+    _store: Optional[FAISS] = None
+    _retriever: Optional[HybridRetriever] = None
+    _sources: List[str] = []
+    _version: int = 0
+
+    @classmethod
+    def snapshot(cls) -> Tuple[Optional[FAISS], List[str], int]:
+        """Current store, indexed document paths and index version"""
+        with cls._lock:
+            return cls._store, cls._sources, cls._version
+
+    @classmethod
+    def get(cls) -> Optional[FAISS]:
+        return cls._store
+
+    @classmethod
+    def version(cls) -> int:
+        return cls._version
+
+    @classmethod
+    def swap(cls, store: Optional[FAISS], sources: Optional[List[str]] = None) -> int:
+        """Publish a new store; returns the new index version"""
+        retriever = HybridRetriever(store) if store is not None else None
+        with cls._lock:
+            cls._store = store
+            cls._retriever = retriever
+            cls._sources = list(sources or [])
+            cls._version += 1
+            RetrievalCache.clear()
+            logger.info(f"Shared vector store swapped (version {cls._version}, {len(cls._sources)} documents)")
+            return cls._version
+
+    @classmethod
+    def ensure_loaded(cls, embeddings_factory: Callable, docs_path: Path,
+                      progress: Optional[Callable[[int, int, str], None]] = None) -> Tuple[Optional[FAISS], List[str]]:
+        """
+        Load or build the store once per process; concurrent sessions wait for the
+        first build instead of building their own copy
+
+        Args:
+            embeddings_factory (Callable): Returns the embeddings, only called when a build is needed
+            docs_path (Path): Documents directory
+            progress (Optional[Callable]): Called as progress(done, total, name) per file loaded by a build
+        """
+        store, sources, _ = cls.snapshot()
+        if store is not None:
+            return store, sources
+        with cls._build_lock:
+            store, sources, _ = cls.snapshot()
+            if store is not None:
+                return store, sources
+            store, sources, _ = load_or_create_vector_store(docs_path, embeddings_factory(), progress=progress)
+            if store is not None:
+                cls.swap(store, sources)
+            return store, sources
+
+    @classmethod
+    def similarity_search(cls, question: str, k: int = 3, mode: Optional[str] = None) -> List:
+        """
+        Search the current store snapshot ('hybrid', 'vector' or 'lexical', RAG_RETRIEVAL_MODE by default)
+
+        Results are cached by (normalized question, index version, k, mode), so a repeated
+        question from any session skips the query embedding and the search.
+        """
+        with cls._lock:
+            retriever, version = cls._retriever, cls._version
+        if retriever is None:
+            return []
+
+        mode = mode or RAG_RETRIEVAL_MODE
+        key = (normalize_question(question), version, k, mode)
+        ids = RetrievalCache.get(key)
+        # Los sustitutos sin docstore no tienen IDs con los que recuperar los chunks
+        if ids is not None and all(doc_id in retriever.documents for doc_id in ids):
+            Trace.annotate(**{"retrieval.cache_hit": True})
+            return [retriever.documents[doc_id] for doc_id in ids]
+
+        documents = retriever.search(question, k, mode)
+        if retriever.documents and all(doc.id in retriever.documents for doc in documents):
+            RetrievalCache.put(key, [doc.id for doc in documents])
+        Trace.annotate(**{"retrieval.cache_hit": False})
+        return documents
+
+    @classmethod
+    def clear(cls):
+        """Drop the shared store (next ensure_loaded builds it again)"""
+        cls.swap(None, [])